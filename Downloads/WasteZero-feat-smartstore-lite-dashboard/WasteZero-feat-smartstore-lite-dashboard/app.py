@@ -1,42 +1,106 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
 
 # Import utility functions
-from utils.waste_prediction import load_data as load_wp_data, preprocess_for_waste_prediction, predict_expiring_products
-from utils.schedule_optimization import load_sales_data, infer_footfall_from_sales, recommend_lighting_ac_schedule
-from utils.greenscore import calculate_predicted_waste_value, estimate_energy_savings, calculate_greenscore, BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW
+from utils.data_loader import clear_loaded_frames, load_inventory, load_sales
+from utils.expiry_index import build_expiry_index, expiring_within, refresh_expiry_index
+from utils.waste_prediction import load_data as load_wp_data, load_stock_days_table, preprocess_for_waste_prediction, predict_expiring_products, sweep_waste_thresholds, calculate_automatic_thresholds, top_at_risk_products, page_at_risk_products, SCORER_HEURISTIC, SCORER_MODEL
+from utils.waste_model import load_waste_model
+from utils.sales_cube import build_sales_cube
+from utils.schedule_optimization import infer_footfall_matrix, schedule_codes, optimize_schedule_codes, render_schedule, smooth_footfall, slots_per_day, SLOT_MINUTES_OPTIONS, WEEKDAY_NAMES
+from utils.greenscore import calculate_predicted_waste_value, estimate_energy_savings, calculate_greenscore, max_possible_daily_energy_savings, greenscore_sensitivity_surface
+from utils.greenscore_history import refresh_greenscore_history, greenscore_trend, DEFAULT_STORE_ID, DEFAULT_TREND_WINDOW_DAYS
+from utils.sales_aggregates import load_sales_store, refresh_sales_store, store_footfall_by_date_hour, store_to_aggregates
+from utils.staffing import load_schedule_data, derive_store_hours, staffing_counts, staffing_efficiency_by_slot, recommend_shift_starts
 from utils.supplier_analytics import load_supplier_data, analyze_supplier_performance, get_supplier_recommendations, get_supplier_summary_stats
-from utils.seasonal_analytics import analyze_seasonal_trends, forecast_seasonal_demand, get_seasonal_recommendations, calculate_seasonal_efficiency_score
+from utils.replenishment import refresh_replenishment_plan, products_to_reorder
+from utils.order_consolidation import consolidate_supplier_orders, DEFAULT_HORIZON_DAYS as CONSOLIDATION_HORIZON_DAYS
+from utils.supply_simulation import simulate_supply_risk, summarize_simulation_by_supplier, DEFAULT_HORIZON_DAYS
+from utils.seasonal_analytics import build_seasonal_context, analyze_seasonal_trends, forecast_seasonal_demand, get_seasonal_recommendations, calculate_seasonal_efficiency_score
 
 # Configuration (could be moved to a config file)
-STORE_OPEN_HOUR = 8  # Default, consider inferring from employee_schedules.csv if more dynamic needed
-STORE_CLOSE_HOUR = 22 # Default
+DEFAULT_STORE_OPEN_HOUR = 8  # Used when employee_schedules.csv is missing; otherwise inferred from staffed hours
+DEFAULT_STORE_CLOSE_HOUR = 22 # Default
 EXPIRY_THRESHOLD_DAYS = 30 # For waste prediction
 STOCK_THRESHOLD_FACTOR = 1.5 # For waste prediction heuristic
 ENERGY_OFF_PEAK_REDUCTION_PCT = 50 # For energy saving calculations
+FOOTFALL_SMOOTHING_OPTIONS = [0, 30, 60, 90, 120] # Minutes of centered footfall smoothing (0 = none)
+GREENSCORE_SENSITIVITY_REDUCTION_PCTS = list(range(10, 100, 10)) # Rows of the GreenScore sensitivity table
+GREENSCORE_SENSITIVITY_WASTE_WEIGHTS = [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8] # Columns of the GreenScore sensitivity table
+AT_RISK_PAGE_SIZE = 50 # Rows per page in the at-risk products table
+THRESHOLD_SWEEP_SCALES = [0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0] # Multiples of the automatic thresholds
+THRESHOLD_SWEEP_FACTORS = [1.0, 1.25, 1.5, 2.0, 3.0] # Candidate stock threshold factors
+SUPPLY_SIMULATION_TRIALS = 2000 # Monte Carlo trials per product in the delivery simulation
 
 # --- Data Loading and Caching ---
 @st.cache_data(ttl=600) # Cache for 10 minutes
 def load_all_data():
-    inventory_df, sales_df_for_wp = load_wp_data(inventory_path="data/inventory.csv", sales_path="data/sales.csv")
-    sales_df_for_so = load_sales_data(sales_path="data/sales.csv") # For schedule optimization
+    # Each CSV is parsed once; the same typed sales frame feeds every module.
+    inventory_df, sales_df = load_wp_data(inventory_path="data/inventory.csv", sales_path="data/sales.csv")
     suppliers_df = load_supplier_data(suppliers_path="data/suppliers.csv")
 
-    # We could also load employee_schedules_df here if needed for dynamic open/close hours
-    # For now, using fixed values.
-
-    if inventory_df is None or sales_df_for_wp is None or sales_df_for_so is None:
+    if inventory_df is None or sales_df is None:
         st.error("Failed to load one or more data files. Please ensure 'data/inventory.csv' and 'data/sales.csv' exist in the data directory.")
         return None, None, None, None, None
 
+    # Footfall and seasonal aggregates only fold in sales rows appended since the last refresh;
+    # a store built from scratch is seeded from the sales frame above, not a second CSV parse
+    sales_aggregates = store_to_aggregates(refresh_sales_store(sales_path="data/sales.csv", sales_df=sales_df))
+
     # Calculate total inventory value (used in GreenScore)
-    # Ensure 'cost_price' and 'quantity_in_stock' are numeric
-    inventory_df['cost_price'] = pd.to_numeric(inventory_df['cost_price'], errors='coerce').fillna(0)
-    inventory_df['quantity_in_stock'] = pd.to_numeric(inventory_df['quantity_in_stock'], errors='coerce').fillna(0)
+    # 'cost_price' and 'quantity_in_stock' are typed as numeric by the loader
     total_inventory_value = (inventory_df['cost_price'] * inventory_df['quantity_in_stock']).sum()
 
-    return inventory_df, sales_df_for_wp, sales_df_for_so, suppliers_df, total_inventory_value
+    return inventory_df, sales_df, suppliers_df, sales_aggregates, total_inventory_value
+
+# Store hours for the energy schedule: the typical first and last staffed hour in the shift roster
+@st.cache_data(ttl=600)
+def load_store_hours():
+    store_hours = derive_store_hours(load_schedule_data("data/employee_schedules.csv"))
+    if store_hours is None:
+        return DEFAULT_STORE_OPEN_HOUR, DEFAULT_STORE_CLOSE_HOUR
+    return int(round(store_hours[0])), int(round(store_hours[1]))
+
+# The expiry index is kept as a shared resource (not copied on every rerun like cache_data values),
+# built once and then updated in place when the inventory file changes
+@st.cache_resource
+def load_expiry_index():
+    return build_expiry_index(load_inventory("data/inventory.csv"))
+
+# Sub-hourly footfall needs raw timestamps (the incremental store keeps hourly counts only)
+@st.cache_data(ttl=600)
+def load_footfall_matrix(slot_minutes, by='weekday'):
+    return infer_footfall_matrix(load_sales("data/sales.csv"), by=by, slot_minutes=slot_minutes)
+
+# Sales cube for the trained model's velocity features, built from the persisted daily aggregates
+@st.cache_resource(ttl=600)
+def load_sales_cube():
+    return build_sales_cube(load_sales_store("data/sales.csv")['daily'])
+
+# Daily GreenScore history: only days not recorded yet are scored, earlier days are read back from disk
+@st.cache_data(ttl=600)
+def load_greenscore_history(expiry_thresholds, store_open_hour, store_close_hour, off_peak_reduction_pct):
+    sales_store = load_sales_store("data/sales.csv")
+    return refresh_greenscore_history(load_inventory("data/inventory.csv"), load_sales_cube(),
+                                      store_footfall_by_date_hour(sales_store), store_id=DEFAULT_STORE_ID,
+                                      expiry_threshold_days=expiry_thresholds, store_open_hour=store_open_hour,
+                                      store_close_hour=store_close_hour, off_peak_reduction_pct=off_peak_reduction_pct)
+
+# Monte Carlo delivery simulation; the fixed seed keeps results stable across reruns
+@st.cache_data(ttl=600)
+def load_supply_simulation(processed_inventory, suppliers_df):
+    return simulate_supply_risk(processed_inventory, suppliers_df, num_trials=SUPPLY_SIMULATION_TRIALS)
+
+# Nightly-style reorder plan; only products whose velocity, stock or lead time changed are recomputed
+@st.cache_data(ttl=600)
+def load_reorder_plan(processed_inventory, suppliers_df):
+    return refresh_replenishment_plan(processed_inventory, suppliers_df, cube=load_sales_cube())
+
+# Seasonal tables are built once per data version (the cached aggregates) and shared by every seasonal view
+@st.cache_data(ttl=600)
+def load_seasonal_context():
+    inventory_df, _, _, sales_aggregates, _ = load_all_data()
+    return build_seasonal_context(inventory_df, aggregates=sales_aggregates)
 
 # --- Main App Logic ---
 st.set_page_config(page_title="SmartStore Lite", layout="wide", initial_sidebar_state="expanded")
@@ -44,7 +108,8 @@ st.title("🛍️ SmartStore Lite Dashboard")
 st.markdown("Helping retail stores reduce energy and inventory waste with simulated data.")
 
 # Load data
-inventory_df, sales_df_wp, sales_df_so, suppliers_df, total_inventory_value = load_all_data()
+inventory_df, sales_df, suppliers_df, sales_aggregates, total_inventory_value = load_all_data()
+store_open_hour, store_close_hour = load_store_hours()
 
 if inventory_df is not None:
     # --- Sidebar for Controls (Optional) ---
@@ -53,85 +118,58 @@ if inventory_df is not None:
     # Automatic intelligent thresholds based on product characteristics
     st.sidebar.subheader("🤖 Automatic Thresholds")
     
-    # Calculate automatic thresholds based on current data
-    def calculate_automatic_thresholds(inventory_df):
-        """Calculate intelligent thresholds based on product characteristics"""
-        if inventory_df is None or inventory_df.empty:
-            return {
-                'Shelf Life': 7,
-                'Expiration Date': 7,
-                'Warranty Period': 90,
-                'Fashion Season': 90,
-                'Quality Period': 180,
-                'Obsolescence': 180,
-                'Wear Period': 180
-            }
-        
-        # Analyze current inventory to determine optimal thresholds
-        current_date = datetime.now()
-        inventory_df['expiry_date'] = pd.to_datetime(inventory_df['expiry_date'])
-        inventory_df['days_to_expiry'] = (inventory_df['expiry_date'] - current_date).dt.days
-        
-        # Calculate thresholds based on actual data patterns
-        thresholds = {}
-        
-        # Critical items: Use actual expiry patterns
-        critical_items = inventory_df[inventory_df['category'].isin(['Groceries', 'Beauty & Health'])]
-        if not critical_items.empty:
-            # Use 75th percentile of days to expiry for critical items
-            critical_days = critical_items['days_to_expiry'].quantile(0.75)
-            thresholds['Shelf Life'] = max(3, min(14, int(critical_days)))
-            thresholds['Expiration Date'] = max(3, min(14, int(critical_days)))
-        else:
-            thresholds['Shelf Life'] = 7
-            thresholds['Expiration Date'] = 7
-        
-        # Moderate items: Use warranty/fashion patterns
-        moderate_items = inventory_df[inventory_df['category'].isin(['Electronics', 'Clothing'])]
-        if not moderate_items.empty:
-            moderate_days = moderate_items['days_to_expiry'].quantile(0.75)
-            thresholds['Warranty Period'] = max(30, min(180, int(moderate_days)))
-            thresholds['Fashion Season'] = max(30, min(180, int(moderate_days)))
-        else:
-            thresholds['Warranty Period'] = 90
-            thresholds['Fashion Season'] = 90
-        
-        # Low priority items: Use quality/obsolescence patterns
-        low_priority_items = inventory_df[inventory_df['category'].isin(['Home Goods', 'Books', 'Sports & Outdoors'])]
-        if not low_priority_items.empty:
-            low_priority_days = low_priority_items['days_to_expiry'].quantile(0.75)
-            thresholds['Quality Period'] = max(90, min(365, int(low_priority_days)))
-            thresholds['Obsolescence'] = max(90, min(365, int(low_priority_days)))
-            thresholds['Wear Period'] = max(90, min(365, int(low_priority_days)))
-        else:
-            thresholds['Quality Period'] = 180
-            thresholds['Obsolescence'] = 180
-            thresholds['Wear Period'] = 180
-        
-        return thresholds
-    
     # Calculate automatic thresholds
-    automatic_thresholds = calculate_automatic_thresholds(inventory_df)
+    expiry_index = refresh_expiry_index(load_expiry_index(), load_inventory("data/inventory.csv"))
+    automatic_thresholds = calculate_automatic_thresholds(inventory_df, expiry_index=expiry_index)
     
     # Display current automatic thresholds
     st.sidebar.info("🎯 **Current Automatic Thresholds:**")
     for expiry_type, threshold in automatic_thresholds.items():
         st.sidebar.text(f"• {expiry_type}: {threshold} days")
+
+    # The trained model is offered once model/train_model.py has produced a usable artifact
+    scorer_options = {"Heuristic": SCORER_HEURISTIC}
+    try:
+        load_waste_model()
+        scorer_options["Trained model"] = SCORER_MODEL
+    except (OSError, ValueError):
+        pass
+    waste_scorer = scorer_options[st.sidebar.radio("Waste scorer", list(scorer_options),
+                                                   help="Trained model: run `python model/train_model.py` to enable.")]
+
+    st.sidebar.subheader("🧪 Threshold Sweep")
+    sweep_scale_range = st.sidebar.select_slider("Threshold scale range", options=THRESHOLD_SWEEP_SCALES, value=(0.5, 2.0),
+                                                 help="Multiples of the automatic thresholds to compare in the sweep table.")
+    sweep_factors = st.sidebar.multiselect("Stock threshold factors", THRESHOLD_SWEEP_FACTORS, default=[1.0, 1.5, 2.0])
     
     st.sidebar.markdown("---")
     st.sidebar.subheader("⚡ Energy Settings")
     energy_reduction_pct = st.sidebar.slider("Energy: Off-Peak Reduction %", 10, 90, ENERGY_OFF_PEAK_REDUCTION_PCT, 10,
                                              help="Assumed % reduction in energy use during off-peak or low-footfall hours.")
+    schedule_slot_minutes = st.sidebar.select_slider("Schedule resolution (minutes)", options=list(SLOT_MINUTES_OPTIONS), value=60,
+                                                     help="Finer slots can switch power down at opening, closing and mid-day lulls.")
+    smoothing_minutes = st.sidebar.select_slider("Footfall smoothing window (minutes)", options=FOOTFALL_SMOOTHING_OPTIONS, value=0,
+                                                 help="Centered moving average applied before thresholding, so single slots do not flip the setting.")
+    smoothing_slots = max(1, smoothing_minutes // schedule_slot_minutes)
+    use_schedule_optimizer = st.sidebar.checkbox("Avoid frequent switching (optimizer)", value=False,
+                                                 help="Chooses the cheapest setting sequence including a cost per setting change, while keeping busy slots at full power.")
+    switching_penalty_hours = st.sidebar.slider("Switching cost (full-power hours)", 0.0, 3.0, 0.5, 0.25,
+                                                disabled=not use_schedule_optimizer)
 
     # --- 1. Waste Prediction ---
     st.header("🍎 Waste Prediction")
     st.markdown("Predicts products likely to expire based on sales trends and inventory levels.")
 
     with st.spinner("Analyzing inventory and sales for waste prediction..."):
-        processed_inventory = preprocess_for_waste_prediction(inventory_df.copy(), sales_df_wp.copy())
+        # Optional data/stock_days.csv overrides the per-category stock-days estimates
+        processed_inventory = preprocess_for_waste_prediction(inventory_df.copy(), sales_df,
+                                                              stock_days_table=load_stock_days_table("data/stock_days.csv"))
         at_risk_products = predict_expiring_products(processed_inventory,
                                                      expiry_threshold_days=automatic_thresholds,
-                                                     stock_threshold_factor=STOCK_THRESHOLD_FACTOR)
+                                                     stock_threshold_factor=STOCK_THRESHOLD_FACTOR,
+                                                     sort_results=False, # Only the displayed rows get ordered
+                                                     scorer=waste_scorer,
+                                                     sales_cube=load_sales_cube() if waste_scorer == SCORER_MODEL else None)
 
     if not at_risk_products.empty:
         # Create summary of automatic thresholds for display
@@ -154,7 +192,27 @@ if inventory_df is not None:
             display_columns.insert(2, 'expiry_type')
             column_names['expiry_type'] = 'Expiry Type'
         
-        st.dataframe(at_risk_products[display_columns].rename(columns=column_names), height=300)
+        # Cursor-based pagination: each page is a partial selection, the full frame is never sorted
+        if 'at_risk_page_cursors' not in st.session_state:
+            st.session_state.at_risk_page_cursors = [None]
+        page_cursors = st.session_state.at_risk_page_cursors
+        at_risk_page, next_page_cursor = page_at_risk_products(at_risk_products, AT_RISK_PAGE_SIZE, page_cursors[-1])
+        if at_risk_page.empty and len(page_cursors) > 1: # Data changed under the cursor
+            page_cursors[:] = [None]
+            at_risk_page, next_page_cursor = page_at_risk_products(at_risk_products, AT_RISK_PAGE_SIZE)
+        st.dataframe(at_risk_page[display_columns].rename(columns=column_names), height=300)
+
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("◀ Previous", disabled=len(page_cursors) == 1):
+                page_cursors.pop()
+                st.rerun()
+        with col_page:
+            st.caption(f"Page {len(page_cursors)} of {max(1, -(-len(at_risk_products) // AT_RISK_PAGE_SIZE))}")
+        with col_next:
+            if st.button("Next ▶", disabled=next_page_cursor is None):
+                page_cursors.append(next_page_cursor)
+                st.rerun()
 
         # For GreenScore calculation
         predicted_waste_value, total_items_at_risk = calculate_predicted_waste_value(at_risk_products)
@@ -165,24 +223,24 @@ if inventory_df is not None:
         st.markdown("### 🚨 **EMERGENCY ALERTS** 🚨")
         
         # Find products expiring within 7 days
-        critical_7_days = at_risk_products[at_risk_products['days_to_expiry'] <= 7]
+        critical_7_days = at_risk_products[at_risk_products['product_id'].isin(expiring_within(expiry_index, 7))]
         if not critical_7_days.empty:
             st.error(f"**URGENT**: {len(critical_7_days)} products expiring within 7 days!")
-            for _, product in critical_7_days.head(3).iterrows():
+            for _, product in top_at_risk_products(critical_7_days, 3).iterrows():
                 st.error(f"🔥 {product['product_name']} - Expires in {product['days_to_expiry']} days (Risk: {product['risk_score']:.0f})")
         
         # Find products with very high stock levels
         high_stock_risk = at_risk_products[at_risk_products['estimated_days_stock_left'] > 365]
         if not high_stock_risk.empty:
             st.warning(f"**OVERSTOCK ALERT**: {len(high_stock_risk)} products with excessive stock levels!")
-            for _, product in high_stock_risk.head(3).iterrows():
+            for _, product in top_at_risk_products(high_stock_risk, 3).iterrows():
                 st.warning(f"📦 {product['product_name']} - {product['estimated_days_stock_left']:.0f} days of stock left")
         
         # Find products with zero sales
         zero_sales = at_risk_products[at_risk_products['avg_daily_sales_last_30d'] == 0]
         if not zero_sales.empty:
             st.info(f"**NO SALES ALERT**: {len(zero_sales)} products with zero sales in 30 days!")
-            for _, product in zero_sales.head(3).iterrows():
+            for _, product in top_at_risk_products(zero_sales, 3).iterrows():
                 st.info(f"📊 {product['product_name']} - No sales, {product['quantity_in_stock']} units in stock")
     else:
         st.success("No products currently identified as high risk of wastage with the selected criteria. Good job!", icon="✅")
@@ -195,6 +253,20 @@ if inventory_df is not None:
     - **Low Priority (Home Goods, Books, Sports)**: Quality/obsolescence periods with minimal priority
     Products are flagged based on expiry type, days remaining, and sales velocity. Adjust the 'Days to Expiry Threshold' in the sidebar to fine-tune._</small>
     """, unsafe_allow_html=True)
+
+    with st.expander("🧪 Threshold Sweep: predicted waste value by threshold scale and stock factor"):
+        sweep_scales = [scale for scale in THRESHOLD_SWEEP_SCALES if sweep_scale_range[0] <= scale <= sweep_scale_range[1]]
+        if sweep_factors and sweep_scales:
+            # Every (scale, factor) combination is evaluated in one vectorized call
+            sweep_configs = [{expiry_type: threshold * scale for expiry_type, threshold in automatic_thresholds.items()}
+                             for scale in sweep_scales]
+            sweep = sweep_waste_thresholds(processed_inventory, sweep_configs, sweep_factors)
+            sweep_summary = sweep['summary'].assign(threshold_scale=[scale for scale in sweep_scales for _ in sweep_factors])
+            st.dataframe(sweep_summary.pivot(index='threshold_scale', columns='stock_threshold_factor',
+                                             values='predicted_waste_value').round(2))
+            st.markdown("<small>_Rows: multiple of the automatic thresholds. Columns: stock threshold factor. Values: predicted waste value ($)._</small>", unsafe_allow_html=True)
+        else:
+            st.info("Select at least one threshold scale and stock threshold factor in the sidebar.")
     st.divider()
 
     # --- 2. Energy Optimization ---
@@ -202,7 +274,8 @@ if inventory_df is not None:
     st.markdown("Recommends optimized lighting/AC schedules based on footfall patterns inferred from sales timestamps.")
 
     with st.spinner("Analyzing sales for footfall patterns..."):
-        footfall_by_hour = infer_footfall_from_sales(sales_df_so)
+        footfall_by_hour = sales_aggregates['footfall_by_hour']
+        footfall_by_weekday_hour = sales_aggregates['footfall_by_weekday_hour']
 
     col1, col2 = st.columns(2)
     with col1:
@@ -210,16 +283,36 @@ if inventory_df is not None:
         if not footfall_by_hour.empty:
             st.bar_chart(footfall_by_hour)
             st.markdown("<small>_**Note:** Footfall is estimated based on the number of sales transactions per hour._</small>", unsafe_allow_html=True)
+            with st.expander("Footfall by weekday and hour"):
+                st.dataframe(footfall_by_weekday_hour)
         else:
             st.warning("No sales data available to infer footfall.")
 
     with col2:
         st.subheader("📅 Recommended Energy Schedule")
         if not footfall_by_hour.empty:
-            schedule_recs = recommend_lighting_ac_schedule(footfall_by_hour,
-                                                           store_open_hour=STORE_OPEN_HOUR,
-                                                           store_close_hour=STORE_CLOSE_HOUR,
-                                                           off_peak_reduction_pct=energy_reduction_pct)
+            schedule_day = st.selectbox("Schedule for", ["All days"] + WEEKDAY_NAMES,
+                                        help="Weekday schedules are thresholded against that weekday's own footfall peak.")
+            if schedule_slot_minutes == 60:
+                schedule_matrix = footfall_by_weekday_hour
+            else:
+                schedule_matrix = load_footfall_matrix(schedule_slot_minutes)
+            schedule_footfall = schedule_matrix.sum() if schedule_day == "All days" else schedule_matrix.loc[schedule_day]
+            schedule_footfall = schedule_footfall.reindex(range(slots_per_day(schedule_slot_minutes)), fill_value=0).to_numpy()
+            schedule_footfall = smooth_footfall(schedule_footfall, smoothing_slots) if smoothing_slots > 1 else schedule_footfall
+            # Settings are kept as int8 codes; strings are only built for the table below
+            if use_schedule_optimizer:
+                schedule_setting_codes = optimize_schedule_codes(schedule_footfall,
+                                                                 store_open_hour=store_open_hour,
+                                                                 store_close_hour=store_close_hour,
+                                                                 off_peak_reduction_pct=energy_reduction_pct,
+                                                                 switching_penalty_hours=switching_penalty_hours)
+            else:
+                schedule_setting_codes = schedule_codes(schedule_footfall,
+                                                        store_open_hour=store_open_hour,
+                                                        store_close_hour=store_close_hour)
+            schedule_recs = render_schedule(schedule_setting_codes, schedule_footfall,
+                                            off_peak_reduction_pct=energy_reduction_pct)
             # Create styled dataframe with better visibility
             def style_settings(val):
                 if val == 'Full Power':
@@ -233,40 +326,53 @@ if inventory_df is not None:
             
             styled_df = schedule_recs.style.map(style_settings, subset=['setting'])
             st.dataframe(styled_df, height=350)
-            st.markdown(f"<small>_**Recommendation Logic:** 'Full Power' during peak hours, 'Reduced Power ({energy_reduction_pct}% savings)' during low footfall operating hours, and 'Minimal/Off' outside store hours ({STORE_OPEN_HOUR:02}:00 - {STORE_CLOSE_HOUR:02}:00)._</small>", unsafe_allow_html=True)
+            st.markdown(f"<small>_**Recommendation Logic:** 'Full Power' during peak hours, 'Reduced Power ({energy_reduction_pct}% savings)' during low footfall operating hours, and 'Minimal/Off' outside store hours ({store_open_hour:02}:00 - {store_close_hour:02}:00)._</small>", unsafe_allow_html=True)
 
             # For GreenScore
-            daily_energy_saved_kwh, daily_cost_saved = estimate_energy_savings(schedule_recs, off_peak_reduction_pct=energy_reduction_pct)
+            daily_energy_saved_kwh, daily_cost_saved = estimate_energy_savings(schedule_setting_codes, off_peak_reduction_pct=energy_reduction_pct)
             st.info(f"**Estimated Daily Savings:** {daily_energy_saved_kwh:.2f} kWh (approx. ${daily_cost_saved:.2f})", icon="💰")
         else:
             st.warning("Cannot generate schedule recommendations without footfall data.")
             daily_energy_saved_kwh = 0.0 # For GreenScore
+            schedule_setting_codes = None
+    st.divider()
+
+    # --- Staffing Efficiency ---
+    st.header("👥 Staffing Efficiency")
+    st.markdown("Compares staffed headcount from the shift roster with footfall, and suggests shift start times that follow demand.")
+    schedules_df = load_schedule_data("data/employee_schedules.csv")
+    if schedules_df is not None and not schedules_df.empty:
+        with st.spinner("Matching the shift roster to footfall..."):
+            footfall_by_date = load_footfall_matrix(schedule_slot_minutes, by='date')
+            staffing = staffing_counts(schedules_df, slot_minutes=schedule_slot_minutes)
+            slot_efficiency = staffing_efficiency_by_slot(staffing, footfall_by_date)
+            shift_recommendations = recommend_shift_starts(schedules_df, footfall_by_date, slot_minutes=schedule_slot_minutes)
+
+        col_staff1, col_staff2 = st.columns(2)
+        with col_staff1:
+            st.subheader("Staff vs. Customers per Slot")
+            st.line_chart(slot_efficiency[['avg_staff', 'customers_per_staff']])
+            st.markdown("<small>_Average staffed headcount and customers per staff member for each slot of the day._</small>", unsafe_allow_html=True)
+        with col_staff2:
+            st.subheader("Suggested Shift Changes")
+            moved_shifts = shift_recommendations[shift_recommendations['start_change_minutes'] != 0]
+            st.metric("Shifts to move", f"{len(moved_shifts)} of {len(shift_recommendations)}")
+            st.dataframe(moved_shifts[['employee_id', 'date', 'shift_start_time', 'recommended_start_time', 'recommended_end_time']].rename(columns={
+                'employee_id': 'Employee', 'date': 'Date', 'shift_start_time': 'Current Start',
+                'recommended_start_time': 'Suggested Start', 'recommended_end_time': 'Suggested End'
+            }), height=250)
+    else:
+        st.info("No employee schedules found (data/employee_schedules.csv).")
     st.divider()
 
     # --- 3. GreenScore ---
     st.header("♻️ GreenScore")
     st.markdown("A sustainability score based on predicted waste and estimated energy savings.")
 
-    # Max possible energy savings for GreenScore normalization
-    # This is a simplified calculation: assumes max savings if store is 'Minimal/Off' outside operating hours
-    # and 'Reduced Power' during all operating hours.
-    # Standard consumption if always full power during operating hours (and minimal outside):
-    operating_hours = STORE_CLOSE_HOUR - STORE_OPEN_HOUR
-    standard_op_consumption = operating_hours * BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW
-    standard_non_op_consumption = (24 - operating_hours) * BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW * 0.1 # Minimal
-    total_standard_daily_consumption = standard_op_consumption + standard_non_op_consumption
-
-    # Ideal optimized: minimal outside op_hours, reduced during all op_hours
-    ideal_op_consumption = operating_hours * BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW * (1 - energy_reduction_pct/100)
-    # Non-op consumption is already minimal in standard calculation for this baseline
-    total_ideal_daily_consumption = ideal_op_consumption + standard_non_op_consumption
-
-    # This max_possible_daily_energy_savings_kwh represents savings compared to a baseline of
-    # 'Full Power' during all operating hours and 'Minimal/Off' outside operating hours.
-    max_possible_daily_energy_savings_kwh = total_standard_daily_consumption - total_ideal_daily_consumption
-    # Ensure it's not negative if ideal is somehow higher (e.g. reduction_pct is 0)
-    max_possible_daily_energy_savings_kwh = max(0, max_possible_daily_energy_savings_kwh)
-
+    # Max possible energy savings for GreenScore normalization: 'Reduced Power' during all operating hours
+    # instead of 'Full Power' ('Minimal/Off' outside operating hours in both cases)
+    max_possible_daily_energy_savings_kwh = float(max_possible_daily_energy_savings(store_open_hour, store_close_hour,
+                                                                                    energy_reduction_pct))
 
     greenscore_val, waste_score, energy_score = calculate_greenscore(
         predicted_waste_value,
@@ -309,6 +415,33 @@ if inventory_df is not None:
     A higher score indicates better sustainability practices in terms of minimizing waste and optimizing energy._</small>
     """, unsafe_allow_html=True)
 
+    # Every reduction % x waste weight combination is scored in one call, instead of one rerun per slider move
+    with st.expander("GreenScore sensitivity (off-peak reduction % x waste weight)"):
+        sensitivity = greenscore_sensitivity_surface(
+            predicted_waste_value, total_inventory_value, schedule_setting_codes,
+            GREENSCORE_SENSITIVITY_REDUCTION_PCTS, GREENSCORE_SENSITIVITY_WASTE_WEIGHTS,
+            store_open_hour=store_open_hour, store_close_hour=store_close_hour
+        )
+
+        def style_score(val):
+            color = "#c6efce" if val >= 75 else "#ffeb9c" if val >= 50 else "#ffc7ce"
+            return f'background-color: {color}; color: #000000'
+
+        st.dataframe(sensitivity.style.map(style_score).format("{:.1f}"))
+        st.markdown("<small>_Rows: assumed off-peak reduction %. Columns: weight of the waste score (the energy score gets the rest). The current schedule is held fixed._</small>", unsafe_allow_html=True)
+
+    with st.expander("GreenScore history"):
+        greenscore_history = load_greenscore_history(automatic_thresholds, store_open_hour, store_close_hour, energy_reduction_pct)
+        if not greenscore_history.empty:
+            history_trend = pd.DataFrame({
+                'Daily GreenScore': greenscore_trend(greenscore_history, [DEFAULT_STORE_ID], window_days=1)[DEFAULT_STORE_ID],
+                f'{DEFAULT_TREND_WINDOW_DAYS}-day average': greenscore_trend(greenscore_history, [DEFAULT_STORE_ID])[DEFAULT_STORE_ID]
+            })
+            st.line_chart(history_trend)
+            st.markdown("<small>_Each day is scored once from that day's flagged stock and footfall-based schedule, with the settings in effect when it was first recorded._</small>", unsafe_allow_html=True)
+        else:
+            st.info("Not enough sales history to score past days yet.")
+
     st.divider()
 
     # --- 4. Supplier Analytics ---
@@ -363,6 +496,57 @@ if inventory_df is not None:
                 for rec in supplier_recommendations:
                     priority_color = "🔴" if rec['priority'] == 'High' else "🟡" if rec['priority'] == 'Medium' else "🟢"
                     st.info(f"{priority_color} **{rec['issue']}**: {rec['recommendation']}")
+
+            with st.expander(f"🎲 Delivery & stock-out simulation (next {DEFAULT_HORIZON_DAYS} days)"):
+                with st.spinner("Simulating deliveries and demand..."):
+                    supply_simulation = load_supply_simulation(processed_inventory, suppliers_df)
+                    supply_summary = summarize_simulation_by_supplier(supply_simulation, suppliers_df)
+                if not supply_summary.empty:
+                    st.dataframe(supply_summary.rename(columns={
+                        'supplier_id': 'Supplier ID', 'supplier_name': 'Supplier', 'products': 'Products',
+                        'avg_stockout_probability': 'Avg Stock-out Probability',
+                        'avg_expiry_waste_probability': 'Avg Expiry Waste Probability',
+                        'expected_waste_value': 'Expected Waste Value'
+                    }).round(3), height=300)
+                    st.markdown(f"<small>_{SUPPLY_SIMULATION_TRIALS:,} trials per product: on-time, late or failed deliveries drawn from each supplier's reliability and lead time, against Poisson demand at the product's 30-day sales velocity. One order covering the horizon's expected demand is assumed to be on its way._</small>", unsafe_allow_html=True)
+                else:
+                    st.info("No products with a listed supplier to simulate.")
+
+            with st.expander("📦 Reorder plan"):
+                reorder_plan = load_reorder_plan(processed_inventory, suppliers_df)
+                reorders = products_to_reorder(reorder_plan)
+                if not reorders.empty:
+                    product_names = inventory_df.assign(product_id=inventory_df['product_id'].astype(str)).drop_duplicates('product_id').set_index('product_id')['product_name']
+                    reorders = reorders.assign(product_name=product_names.reindex(reorders.index).to_numpy())
+                    st.metric("Products to reorder", f"{len(reorders)} ({int(reorder_plan['capped_by_expiry'].sum())} capped by shelf life)")
+                    st.dataframe(reorders[['product_name', 'supplier_id', 'usable_stock', 'reorder_point', 'safety_stock', 'order_quantity', 'capped_by_expiry']].rename(columns={
+                        'product_name': 'Product', 'supplier_id': 'Supplier', 'usable_stock': 'Usable Stock',
+                        'reorder_point': 'Reorder Point', 'safety_stock': 'Safety Stock',
+                        'order_quantity': 'Order Quantity', 'capped_by_expiry': 'Capped by Shelf Life'
+                    }), height=300)
+                    st.markdown("<small>_Reorder when stock expected to sell before expiry falls to the reorder point (lead-time demand plus 95% service-level safety stock). Orders fill up to one review period beyond it, but never more than sells within one shelf life._</small>", unsafe_allow_html=True)
+                else:
+                    st.success("No products need reordering right now.")
+
+            with st.expander(f"🚚 Order consolidation (next {CONSOLIDATION_HORIZON_DAYS} days)"):
+                consolidation = consolidate_supplier_orders(load_reorder_plan(processed_inventory, suppliers_df), inventory_df)
+                consolidated_suppliers = consolidation['suppliers']
+                if not consolidated_suppliers.empty:
+                    col_con1, col_con2, col_con3 = st.columns(3)
+                    col_con1.metric("Deliveries", f"{consolidated_suppliers['deliveries_consolidated'].sum()}",
+                                    delta=f"{consolidated_suppliers['deliveries_consolidated'].sum() - consolidated_suppliers['deliveries_independent'].sum()}",
+                                    delta_color="inverse")
+                    col_con2.metric("Net Saving", f"${consolidated_suppliers['net_saving'].sum():,.2f}")
+                    col_con3.metric("Emissions Avoided", f"{consolidated_suppliers['emissions_saved_kg'].sum():,.0f} kg CO2e")
+                    st.dataframe(consolidated_suppliers[['supplier_id', 'lines', 'deliveries_independent', 'deliveries_consolidated',
+                                                         'delivery_cost_saved', 'early_order_cost', 'net_saving']].rename(columns={
+                        'supplier_id': 'Supplier', 'lines': 'Order Lines', 'deliveries_independent': 'Deliveries (per deadline day)',
+                        'deliveries_consolidated': 'Deliveries (consolidated)', 'delivery_cost_saved': 'Delivery Cost Saved',
+                        'early_order_cost': 'Early-Order Cost', 'net_saving': 'Net Saving'
+                    }).round(2), height=300)
+                    st.markdown("<small>_Each supplier's upcoming order lines are grouped onto the delivery days that minimize delivery cost plus the cost of ordering early (shelf life used up and holding cost)._</small>", unsafe_allow_html=True)
+                else:
+                    st.info("No order lines due in the planning window.")
     else:
         st.warning("Supplier data not available. Please ensure 'data/suppliers.csv' exists.")
 
@@ -373,10 +557,11 @@ if inventory_df is not None:
     st.markdown("Analyze seasonal trends and forecast future demand.")
 
     with st.spinner("Analyzing seasonal patterns..."):
-        seasonal_trends = analyze_seasonal_trends(sales_df_so, inventory_df)
-        seasonal_forecast = forecast_seasonal_demand(inventory_df, sales_df_so)
-        seasonal_recommendations = get_seasonal_recommendations(inventory_df, sales_df_so)
-        seasonal_efficiency = calculate_seasonal_efficiency_score(inventory_df, sales_df_so)
+        seasonal_context = load_seasonal_context()
+        seasonal_trends = analyze_seasonal_trends(sales_df, inventory_df, seasonal_context)
+        seasonal_forecast = forecast_seasonal_demand(inventory_df, sales_df, seasonal_context=seasonal_context)
+        seasonal_recommendations = get_seasonal_recommendations(inventory_df, sales_df, seasonal_context=seasonal_context)
+        seasonal_efficiency = calculate_seasonal_efficiency_score(inventory_df, sales_df, seasonal_context=seasonal_context)
 
     if seasonal_trends is not None:
         col1, col2 = st.columns(2)
@@ -442,13 +627,15 @@ if inventory_df is not None:
             st.metric("Avg Supplier Reliability", "N/A")
     
     with col3:
-        st.metric("Total Sales Records", len(sales_df_so))
+        st.metric("Total Sales Records", len(sales_df))
         st.metric("Seasonal Efficiency", f"{seasonal_efficiency:.1f}/100")
 
     st.divider()
     st.sidebar.markdown("---")
     if st.sidebar.button("🔄 Refresh Data & Rerun"):
         st.cache_data.clear() # Clear cached data
+        load_sales_cube.clear()
+        clear_loaded_frames() # Force the CSVs to be re-read
         st.rerun()
 
     st.sidebar.markdown("---")
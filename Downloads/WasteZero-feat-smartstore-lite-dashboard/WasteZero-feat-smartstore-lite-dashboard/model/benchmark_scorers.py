@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+# Make the utils package importable when run as "python benchmark_scorers.py" from model/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_loader import load_inventory, load_sales
+from utils.sales_cube import build_sales_cube, daily_sales_from_sales
+from utils.waste_model import load_waste_model
+from utils.waste_prediction import SCORER_HEURISTIC, SCORER_MODEL, predict_expiring_products, preprocess_for_waste_prediction
+
+CATALOG_SIZES = [150, 15_000, 150_000]  # SKUs scored per run (the sample catalog is tiled up)
+REPEATS = 5
+EXPIRY_THRESHOLD_DAYS = 365  # Wide enough that most SKUs reach the scorer
+
+def tile_catalog(inventory_df, sales_df, num_products):
+    """Repeats the sample catalog (and its sales) under new product ids up to num_products SKUs."""
+    copies = -(-num_products // len(inventory_df))
+    inventory_parts, sales_parts = [], []
+    for copy in range(copies):
+        suffix = f"_{copy}" if copy else ""
+        inventory_parts.append(inventory_df.assign(product_id=inventory_df['product_id'].astype(str) + suffix))
+        sales_parts.append(sales_df.assign(product_id=sales_df['product_id'].astype(str) + suffix))
+    inventory = pd.concat(inventory_parts, ignore_index=True).head(num_products)
+    return inventory, pd.concat(sales_parts, ignore_index=True)
+
+def measure(score):
+    """Best wall time over REPEATS runs and peak traced memory of one run."""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        score()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    score()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+def benchmark_scorers(inventory_data_path="../data/inventory.csv", sales_data_path="../data/sales.csv"):
+    """Compares latency and peak memory of the heuristic and trained-model scorers."""
+    inventory_df = load_inventory(inventory_data_path)
+    sales_df = load_sales(sales_data_path)
+    load_waste_model()  # Loaded once per process, as in the app
+    as_of = sales_df['timestamp'].max()
+
+    rows = []
+    for num_products in CATALOG_SIZES:
+        inventory, sales = tile_catalog(inventory_df, sales_df, num_products)
+        processed = preprocess_for_waste_prediction(inventory.copy(), sales, as_of=as_of)
+        cube = build_sales_cube(daily_sales_from_sales(sales))
+        for scorer in (SCORER_HEURISTIC, SCORER_MODEL):
+            seconds, peak_bytes = measure(lambda: predict_expiring_products(
+                processed.copy(), EXPIRY_THRESHOLD_DAYS, scorer=scorer, sales_cube=cube, as_of=as_of))
+            rows.append({'products': num_products, 'scorer': scorer,
+                         'ms': seconds * 1000, 'us_per_product': seconds * 1e6 / num_products,
+                         'peak_mb': peak_bytes / 2**20})
+
+    results = pd.DataFrame(rows)
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    return results
+
+if __name__ == "__main__":
+    model_dir = os.path.dirname(os.path.abspath(__file__))
+    benchmark_scorers(
+        inventory_data_path=os.path.join(model_dir, "../data/inventory.csv"),
+        sales_data_path=os.path.join(model_dir, "../data/sales.csv")
+    )
@@ -1,68 +1,94 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
-# from sklearn.model_selection import train_test_split
-# from sklearn.ensemble import RandomForestClassifier # Example model
-# import joblib # For saving the model
+import joblib
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.metrics import precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import GroupKFold, cross_val_predict
+
+# Make the utils package importable when run as "python train_model.py" from model/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_loader import load_inventory, load_sales
+from utils.sales_cube import build_sales_cube, daily_sales_from_sales
+from utils.waste_model import CATEGORIES, FEATURE_COLUMNS, VELOCITY_WINDOWS, build_training_set
+
+AS_OF_STEP_DAYS = 1  # One training snapshot per day of sales history
+HOLDOUT_FOLDS = 5  # Product folds for out-of-fold evaluation
 
 def train_and_save_waste_prediction_model(inventory_data_path="../data/inventory.csv", sales_data_path="../data/sales.csv", model_output_path="waste_predictor.joblib"):
     """
-    Placeholder for training a waste prediction model.
-    For the hackathon, we are using heuristics defined in utils/waste_prediction.py.
-    This function can be expanded if a dedicated ML model is desired.
+    Trains a waste prediction model on replayed history and saves it with joblib.
+
+    Training samples replay the sales history on daily as-of dates: a product is labelled
+    wasted if less than its stock on hand sold between the as-of date and its expiry
+    (utils/waste_model.build_training_set). The model is evaluated on held-out products,
+    next to the velocity rule it has to beat, and is only refit on all samples and saved
+    if it beats the rule; otherwise a previously saved model is removed, so the app stops
+    offering it as a scorer.
     """
-    print("Attempting to load data for model training (placeholder)...")
+    print("Loading data for model training...")
     try:
-        inventory_df = pd.read_csv(inventory_data_path)
-        sales_df = pd.read_csv(sales_data_path)
-        print("Data loaded (placeholder).")
+        inventory_df = load_inventory(inventory_data_path)
+        sales_df = load_sales(sales_data_path)
     except FileNotFoundError:
         print(f"Error: Could not find data files at {inventory_data_path} or {sales_data_path}. Skipping model training.")
-        return
-
-    # --- Begin ML Model Training Steps (example, currently commented out) ---
-    # 1. Preprocess data specifically for this model (might differ from heuristic preprocessing)
-    #    - Feature engineering (e.g., sales velocity, seasonality, product category encoding)
-    #    - Target variable creation (e.g., 'will_expire_soon_and_be_unsold')
-
-    # print("Preprocessing data for ML model (placeholder)...")
-    # Example:
-    # inventory_df['expiry_date'] = pd.to_datetime(inventory_df['expiry_date'])
-    # inventory_df['days_to_expiry'] = (inventory_df['expiry_date'] - pd.Timestamp.now()).dt.days
-    # inventory_df['target'] = (inventory_df['days_to_expiry'] < 15) & (inventory_df['quantity_in_stock'] > 0) # Simplified target
-
-    # features = ['quantity_in_stock', 'days_to_expiry', 'cost_price', 'selling_price'] # Add more relevant features
-    # target = 'target'
-
-    # X = inventory_df[features].fillna(0)
-    # y = inventory_df[target]
-
-    # X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-
-    # 2. Train the model
-    # print("Training model (placeholder)...")
-    # model = RandomForestClassifier(random_state=42, class_weight='balanced')
-    # model.fit(X_train, y_train)
+        return None
 
-    # 3. Evaluate the model
-    # print("Evaluating model (placeholder)...")
-    # accuracy = model.score(X_test, y_test)
-    # print(f"Model Accuracy (placeholder): {accuracy:.2f}")
+    cube = build_sales_cube(daily_sales_from_sales(sales_df))
+    # Start once the shortest velocity window is filled; longer windows are partial early on
+    as_of_days = np.arange(min(VELOCITY_WINDOWS), cube['num_days'], AS_OF_STEP_DAYS)
+    X, y, _, sample_rows = build_training_set(inventory_df, cube, as_of_days)
+    if len(np.unique(y)) < 2:
+        print("Error: Not enough labelled history to train a model (need both wasted and sold-through products).")
+        return None
+    print(f"Built {len(y)} samples from {len(as_of_days)} as-of dates ({y.mean():.1%} wasted).")
 
-    # 4. Save the trained model
-    # print(f"Saving model to {model_output_path} (placeholder)...")
-    # joblib.dump(model, model_output_path)
-    # print("Model saved (placeholder).")
-    # --- End ML Model Training Steps ---
+    # Out-of-fold predictions with whole products held out per fold: a product's samples on
+    # nearby dates share most of their outcome window. (Holding out the latest dates instead
+    # leaves only products about to expire, since a label needs the expiry inside the history.)
+    model = HistGradientBoostingClassifier(categorical_features=[FEATURE_COLUMNS.index('category_code')],
+                                           class_weight='balanced', random_state=42)
+    folds = min(HOLDOUT_FOLDS, len(np.unique(sample_rows)))
+    if folds < 2:
+        print("Error: Not enough products to evaluate a model on held-out products. Skipping model training.")
+        return None
+    probability = cross_val_predict(model, X, y, groups=sample_rows, cv=GroupKFold(folds),
+                                    method='predict_proba')[:, 1]
+    predicted = probability > 0.5
+    # Baseline: stock left after selling at the 30-day velocity until expiry
+    leftover = X[:, FEATURE_COLUMNS.index('quantity_in_stock')] - \
+        X[:, FEATURE_COLUMNS.index('velocity_30d')] * X[:, FEATURE_COLUMNS.index('days_to_expiry')]
+    model_auc, rule_auc = roc_auc_score(y, probability), roc_auc_score(y, leftover)
+    print(f"Held-out products ({folds} folds): precision {precision_score(y, predicted, zero_division=0):.2f}, "
+          f"recall {recall_score(y, predicted, zero_division=0):.2f}, "
+          f"ROC AUC {model_auc:.3f} (velocity rule: {rule_auc:.3f})")
+    if model_auc <= rule_auc:
+        print("Warning: The model does not beat the velocity rule on held-out products. Not saving it.")
+        if os.path.exists(model_output_path):
+            os.remove(model_output_path)
+            print(f"Removed the previously saved model at {model_output_path}.")
+        return None
 
-    print("\nUsing rule-based heuristics for waste prediction as per current project scope.")
-    print("This script is a placeholder for potential future ML model integration.")
-    print("No model was trained or saved.")
+    model.fit(X, y)
+    artifact = {
+        'model': model,
+        'feature_columns': FEATURE_COLUMNS,
+        'categories': CATEGORIES,
+        'holdout_roc_auc': model_auc,
+        'baseline_roc_auc': rule_auc,
+        'trained_until': pd.Timestamp(cube['start_date']) + pd.Timedelta(days=cube['num_days'] - 1)
+    }
+    joblib.dump(artifact, model_output_path)
+    print(f"Model saved to {model_output_path}.")
+    return artifact
 
 if __name__ == "__main__":
-    print("Running waste prediction model training script (placeholder)...\n")
-    # In a real scenario, you might pass command-line arguments for paths
+    print("Running waste prediction model training script...\n")
+    model_dir = os.path.dirname(os.path.abspath(__file__))
     train_and_save_waste_prediction_model(
-        inventory_data_path="../data/inventory.csv",
-        sales_data_path="../data/sales.csv",
-        model_output_path="waste_predictor.joblib"
+        inventory_data_path=os.path.join(model_dir, "../data/inventory.csv"),
+        sales_data_path=os.path.join(model_dir, "../data/sales.csv"),
+        model_output_path=os.path.join(model_dir, "waste_predictor.joblib")
     )
-    print("\nPlaceholder script execution finished.")
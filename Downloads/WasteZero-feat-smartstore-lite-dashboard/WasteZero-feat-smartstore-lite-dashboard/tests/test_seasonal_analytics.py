@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from utils.seasonal_analytics import (build_seasonal_context, calculate_seasonal_efficiency_score,
+                                      forecast_seasonal_demand, get_seasonal_recommendations)
+
+AS_OF = pd.Timestamp('2025-05-26')
+
+def sample_data():
+    """Three categories; the seasonal one ('Sports & Outdoors') sells little before AS_OF."""
+    inventory = pd.DataFrame({
+        'product_id': ['P1', 'P2', 'P3'],
+        'category': ['Sports & Outdoors', 'Books', 'Groceries'],
+        'quantity_in_stock': [500, 500, 500],
+        'seasonal_demand_factor': [1.4, 1.0, 1.0]
+    })
+    sales = pd.DataFrame({
+        'product_id': ['P1', 'P2', 'P3', 'P2'],
+        'timestamp': pd.to_datetime(['2025-05-10 10:00:00', '2025-05-11 10:00:00',
+                                     '2025-05-12 10:00:00', '2025-04-20 10:00:00']),
+        'quantity_sold': [10, 100, 100, 40]
+    })
+    # A burst of the seasonal category after AS_OF, in the same month
+    later = pd.DataFrame({
+        'product_id': ['P1', 'P1'],
+        'timestamp': pd.to_datetime(['2025-05-28 10:00:00', '2025-05-30 10:00:00']),
+        'quantity_sold': [1000, 1000]
+    })
+    return inventory, sales, pd.concat([sales, later], ignore_index=True)
+
+def test_sales_after_as_of_are_ignored():
+    inventory, sales, with_later = sample_data()
+    recommendations = get_seasonal_recommendations(inventory, sales, as_of=AS_OF)
+    score = calculate_seasonal_efficiency_score(inventory, sales, as_of=AS_OF)
+
+    assert get_seasonal_recommendations(inventory, with_later, as_of=AS_OF) == recommendations
+    assert calculate_seasonal_efficiency_score(inventory, with_later, as_of=AS_OF) == score
+    pd.testing.assert_frame_equal(forecast_seasonal_demand(inventory, with_later, as_of=AS_OF),
+                                  forecast_seasonal_demand(inventory, sales, as_of=AS_OF))
+
+    # The later sales would change both outputs if they were counted
+    context = build_seasonal_context(inventory, with_later)
+    assert get_seasonal_recommendations(inventory, None, seasonal_context=context) != recommendations
+    assert calculate_seasonal_efficiency_score(inventory, None, seasonal_context=context) != score
+
+def test_context_built_for_another_as_of_is_rejected():
+    inventory, sales, _ = sample_data()
+    context = build_seasonal_context(inventory, sales, as_of=AS_OF)
+    assert calculate_seasonal_efficiency_score(inventory, sales, as_of=AS_OF, seasonal_context=context) == \
+        calculate_seasonal_efficiency_score(inventory, sales, as_of=AS_OF)
+    with pytest.raises(ValueError):
+        get_seasonal_recommendations(inventory, sales, seasonal_context=context)
+    with pytest.raises(ValueError):
+        forecast_seasonal_demand(inventory, sales, as_of=AS_OF + pd.Timedelta(days=1), seasonal_context=context)
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+from utils.data_loader import load_inventory, load_suppliers
+from utils.supplier_analytics import analyze_supplier_performance
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# Per-supplier loop from before the metrics were computed in one groupby, kept verbatim as the reference.
+
+def reference_supplier_performance(inventory_df, suppliers_df, as_of=None):
+    merged_df = inventory_df.merge(suppliers_df, on='supplier_id', how='left')
+    supplier_metrics = []
+    for supplier_id in merged_df['supplier_id'].unique():
+        supplier_data = merged_df[merged_df['supplier_id'] == supplier_id]
+        supplier_info = suppliers_df[suppliers_df['supplier_id'] == supplier_id].iloc[0]
+
+        total_products = len(supplier_data)
+        total_inventory_value = (supplier_data['cost_price'] * supplier_data['quantity_in_stock']).sum()
+        avg_product_price = supplier_data['cost_price'].mean()
+
+        current_date = datetime.now() if as_of is None else pd.Timestamp(as_of)
+        supplier_data_copy = supplier_data.copy()
+        supplier_data_copy['expiry_date'] = pd.to_datetime(supplier_data_copy['expiry_date'])
+        supplier_data_copy['days_to_expiry'] = (supplier_data_copy['expiry_date'] - current_date).dt.days
+
+        expiring_soon = supplier_data_copy[supplier_data_copy['days_to_expiry'] <= 30]
+        expiry_risk_value = (expiring_soon['cost_price'] * expiring_soon['quantity_in_stock']).sum()
+        avg_stock_level = supplier_data['quantity_in_stock'].mean()
+
+        supplier_metrics.append({
+            'supplier_id': supplier_id,
+            'supplier_name': supplier_info['supplier_name'],
+            'total_products': total_products,
+            'total_inventory_value': total_inventory_value,
+            'avg_product_price': avg_product_price,
+            'expiry_risk_value': expiry_risk_value,
+            'avg_stock_level': avg_stock_level,
+            'reliability_score': supplier_info['reliability_score'],
+            'delivery_time_days': supplier_info['delivery_time_days'],
+            'risk_score': reference_risk_score(supplier_data, supplier_info, as_of)
+        })
+    return pd.DataFrame(supplier_metrics)
+
+def reference_risk_score(supplier_data, supplier_info, as_of=None):
+    risk_score = 0
+    risk_score += (1 - supplier_info['reliability_score']) * 30
+    delivery_risk = min(supplier_info['delivery_time_days'] / 14, 1) * 20
+    risk_score += delivery_risk
+
+    current_date = datetime.now() if as_of is None else pd.Timestamp(as_of)
+    supplier_data_copy = supplier_data.copy()
+    supplier_data_copy['expiry_date'] = pd.to_datetime(supplier_data_copy['expiry_date'])
+    supplier_data_copy['days_to_expiry'] = (supplier_data_copy['expiry_date'] - current_date).dt.days
+
+    expiring_soon = supplier_data_copy[supplier_data_copy['days_to_expiry'] <= 30]
+    total_value = (supplier_data_copy['cost_price'] * supplier_data_copy['quantity_in_stock']).sum()
+    expiry_risk_value = (expiring_soon['cost_price'] * expiring_soon['quantity_in_stock']).sum()
+
+    if total_value > 0:
+        expiry_risk_ratio = expiry_risk_value / total_value
+        risk_score += expiry_risk_ratio * 50
+
+    return min(risk_score, 100)
+
+AS_OF = pd.Timestamp('2025-06-01 12:00')
+
+def random_data(seed, num_suppliers=40, num_products=3000):
+    """Suppliers (a quarter of them without products) and an inventory with NaT expiry dates and empty stock."""
+    rng = np.random.default_rng(seed)
+    supplier_ids = np.array([f"SUP_{i:03d}" for i in range(num_suppliers)], dtype=object)
+    suppliers = pd.DataFrame({
+        'supplier_id': supplier_ids,
+        'supplier_name': [f"Supplier {i}" for i in range(num_suppliers)],
+        'reliability_score': rng.uniform(0.5, 1.0, num_suppliers).round(2),
+        'delivery_time_days': rng.integers(1, 30, num_suppliers)
+    })
+    stocked = supplier_ids[rng.permutation(num_suppliers)[:num_suppliers * 3 // 4]]
+    expiry = AS_OF + pd.to_timedelta(rng.integers(-20 * 24, 200 * 24, num_products), unit='h')
+    inventory = pd.DataFrame({
+        'product_id': [f"P{i:05d}" for i in range(num_products)],
+        'supplier_id': rng.choice(stocked, num_products),
+        'cost_price': rng.uniform(0.5, 200, num_products).round(2),
+        'quantity_in_stock': rng.integers(0, 300, num_products),
+        'expiry_date': expiry.where(rng.random(num_products) > 0.05)
+    })
+    # One supplier whose products are all out of stock (zero inventory value)
+    inventory.loc[inventory['supplier_id'] == stocked[0], 'quantity_in_stock'] = 0
+    return inventory, suppliers
+
+@pytest.mark.parametrize('seed', range(5))
+def test_metrics_match_per_supplier_loop(seed):
+    inventory, suppliers = random_data(seed)
+    expected = reference_supplier_performance(inventory, suppliers, AS_OF)
+    metrics = analyze_supplier_performance(inventory, suppliers, AS_OF)
+    pd.testing.assert_frame_equal(metrics, expected, check_dtype=False, rtol=1e-12)
+
+def test_suppliers_without_products_are_left_out():
+    inventory, suppliers = random_data(0)
+    metrics = analyze_supplier_performance(inventory, suppliers, AS_OF)
+    assert set(metrics['supplier_id']) == set(inventory['supplier_id'])
+
+def test_inventory_suppliers_missing_from_table_are_left_out():
+    inventory, suppliers = random_data(1)
+    missing = inventory['supplier_id'].iloc[0]
+    metrics = analyze_supplier_performance(inventory, suppliers[suppliers['supplier_id'] != missing], AS_OF)
+    assert missing not in set(metrics['supplier_id'])
+    assert len(metrics) == inventory['supplier_id'].nunique() - 1
+
+def test_metrics_match_per_supplier_loop_on_sample_data():
+    inventory = load_inventory(os.path.join(DATA_DIR, "inventory.csv"))
+    suppliers = load_suppliers(os.path.join(DATA_DIR, "suppliers.csv"))
+    expected = reference_supplier_performance(inventory, suppliers, AS_OF)
+    expected['supplier_id'] = expected['supplier_id'].astype(str)
+    metrics = analyze_supplier_performance(inventory, suppliers, AS_OF)
+    pd.testing.assert_frame_equal(metrics, expected, check_dtype=False, rtol=1e-12)
@@ -0,0 +1,23 @@
+import os
+import joblib
+import pandas as pd
+import pytest
+from utils.waste_model import CATEGORIES, FEATURE_COLUMNS, load_waste_model
+
+def write_artifact(path, feature_columns=FEATURE_COLUMNS, model='v1'):
+    joblib.dump({'model': model, 'feature_columns': list(feature_columns), 'categories': CATEGORIES,
+                 'trained_until': pd.Timestamp('2025-06-30')}, path)
+
+def test_load_waste_model_reloads_after_retraining(tmp_path):
+    path = str(tmp_path / 'waste_predictor.joblib')
+    write_artifact(path, model='v1')
+    assert load_waste_model(path)['model'] == 'v1'
+    write_artifact(path, model='version 2')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert load_waste_model(path)['model'] == 'version 2'
+
+def test_load_waste_model_rejects_other_feature_columns(tmp_path):
+    path = str(tmp_path / 'waste_predictor.joblib')
+    write_artifact(path, feature_columns=FEATURE_COLUMNS[:-1])
+    with pytest.raises(ValueError):
+        load_waste_model(path)
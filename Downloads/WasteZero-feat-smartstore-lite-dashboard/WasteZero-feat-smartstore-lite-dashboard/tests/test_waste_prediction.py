@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.waste_prediction import (CATEGORY_EXPIRY_TYPES, calculate_risk_scores, estimate_stock_days, expiry_type_priorities,
+                                    predict_expiring_products)
+
+# Row-wise implementations from before scoring was vectorized, kept verbatim as the reference.
+
+def reference_stock_days(row):
+    if row['avg_daily_sales_last_30d'] > 0:
+        return row['quantity_in_stock'] / row['avg_daily_sales_last_30d']
+    else:
+        category = row['category']
+        stock_level = row['quantity_in_stock']
+        if category == 'Groceries':
+            return min(90, max(30, stock_level * 2))
+        elif category == 'Beauty & Health':
+            return min(180, max(60, stock_level * 3))
+        elif category == 'Electronics':
+            return min(365, max(90, stock_level * 5))
+        elif category == 'Clothing':
+            return min(180, max(30, stock_level * 2))
+        else:
+            return min(365, max(60, stock_level * 4))
+
+critical_expiry_types = ['Shelf Life', 'Expiration Date']
+moderate_expiry_types = ['Warranty Period', 'Fashion Season']
+
+def reference_risk_score(row, stock_threshold_factor=1.5):
+    base_risk = 0
+    if row['days_to_expiry'] <= 0:
+        base_risk += 100
+    elif row['days_to_expiry'] <= 7:
+        base_risk += 80
+    elif row['days_to_expiry'] <= 30:
+        base_risk += 60
+    elif row['days_to_expiry'] <= 90:
+        base_risk += 40
+    else:
+        base_risk += 20
+
+    if row['avg_daily_sales_last_30d'] == 0:
+        base_risk += 30
+    elif row['estimated_days_stock_left'] > row['days_to_expiry'] * stock_threshold_factor:
+        base_risk += 25
+
+    if row['expiry_type'] in critical_expiry_types:
+        base_risk *= 1.0
+    elif row['expiry_type'] in moderate_expiry_types:
+        base_risk *= 0.7
+    else:
+        base_risk *= 0.4
+
+    return min(base_risk, 100)
+
+def reference_expiry_type(row):
+    category = row['category']
+    if category == 'Groceries':
+        return 'Shelf Life'
+    elif category == 'Beauty & Health':
+        return 'Expiration Date'
+    elif category == 'Electronics':
+        return 'Warranty Period'
+    elif category == 'Clothing':
+        return 'Fashion Season'
+    elif category == 'Home Goods':
+        return 'Quality Period'
+    elif category == 'Books':
+        return 'Obsolescence'
+    else:  # Sports & Outdoors
+        return 'Wear Period'
+
+def reference_predict_expiring_products(processed_inventory_df, expiry_threshold_days=30, stock_threshold_factor=1.5):
+    if 'expiry_type' not in processed_inventory_df.columns:
+        processed_inventory_df['expiry_type'] = processed_inventory_df.apply(reference_expiry_type, axis=1)
+
+    if isinstance(expiry_threshold_days, dict):
+        def get_risk_threshold(row):
+            return expiry_threshold_days.get(row['expiry_type'], 30)
+    else:
+        def get_risk_threshold(row):
+            if row['expiry_type'] in critical_expiry_types:
+                return expiry_threshold_days
+            elif row['expiry_type'] in moderate_expiry_types:
+                return expiry_threshold_days * 0.5
+            else:
+                return expiry_threshold_days * 0.25
+
+    processed_inventory_df['risk_threshold'] = processed_inventory_df.apply(get_risk_threshold, axis=1)
+    expiring_soon_df = processed_inventory_df[
+        processed_inventory_df['days_to_expiry'] <= processed_inventory_df['risk_threshold']
+    ].copy()
+    expiring_soon_df['risk_score'] = expiring_soon_df.apply(reference_risk_score, axis=1,
+                                                            stock_threshold_factor=stock_threshold_factor)
+
+    def is_high_risk(row):
+        if row['expiry_type'] in critical_expiry_types:
+            return row['risk_score'] > 30
+        elif row['expiry_type'] in moderate_expiry_types:
+            return row['risk_score'] > 50
+        else:
+            return row['risk_score'] > 70
+
+    expiring_soon_df['at_risk_of_expiry'] = expiring_soon_df.apply(is_high_risk, axis=1)
+    return expiring_soon_df[
+        (expiring_soon_df['at_risk_of_expiry']) & (expiring_soon_df['days_to_expiry'] >= 0)
+    ].sort_values(by=['risk_score', 'days_to_expiry'], ascending=[False, True])
+
+CATEGORIES = list(CATEGORY_EXPIRY_TYPES) + ['Sports & Outdoors', 'Toys', None]
+EXPIRY_TYPES = critical_expiry_types + moderate_expiry_types + ['Quality Period', 'Wear Period', 'Recall']
+
+def random_inventory(seed, num_products=2000):
+    """Inventory with NaN expiry dates, unknown categories / expiry types and zero velocities."""
+    rng = np.random.default_rng(seed)
+    as_of = pd.Timestamp('2025-06-01')
+    expiry = as_of + pd.to_timedelta(rng.integers(-30, 400, num_products), unit='D')
+    expiry = expiry.where(rng.random(num_products) > 0.1)  # NaT
+    velocity = rng.gamma(1.0, 2.0, num_products).round(2)
+    velocity[rng.random(num_products) < 0.3] = 0
+    inventory = pd.DataFrame({
+        'product_id': [f'P{i:05d}' for i in range(num_products)],
+        'category': rng.choice(np.array(CATEGORIES, dtype=object), num_products),
+        'quantity_in_stock': rng.integers(0, 300, num_products),
+        'avg_daily_sales_last_30d': velocity,
+        'expiry_date': expiry,
+        'expiry_type': rng.choice(EXPIRY_TYPES, num_products)
+    })
+    inventory['days_to_expiry'] = (inventory['expiry_date'] - as_of).dt.days
+    return inventory
+
+@pytest.mark.parametrize('seed', range(5))
+def test_estimate_stock_days_matches_row_wise(seed):
+    inventory = random_inventory(seed)
+    expected = inventory.apply(reference_stock_days, axis=1).to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(estimate_stock_days(inventory), expected)
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('stock_threshold_factor', [0.5, 1.5, 3.0])
+def test_calculate_risk_scores_matches_row_wise(seed, stock_threshold_factor):
+    inventory = random_inventory(seed)
+    inventory['estimated_days_stock_left'] = inventory.apply(reference_stock_days, axis=1)
+    expected = inventory.apply(reference_risk_score, axis=1, stock_threshold_factor=stock_threshold_factor)
+
+    risk_score = calculate_risk_scores(
+        inventory['days_to_expiry'].to_numpy(),
+        inventory['avg_daily_sales_last_30d'].to_numpy(),
+        estimate_stock_days(inventory),
+        expiry_type_priorities(inventory['expiry_type']),
+        stock_threshold_factor
+    )
+    np.testing.assert_array_equal(risk_score, expected.to_numpy(dtype=np.float64))
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('expiry_threshold_days', [15, 30, 120, {'Shelf Life': 10, 'Fashion Season': 45, 'Recall': 200}])
+@pytest.mark.parametrize('with_expiry_type', [True, False])
+def test_predict_expiring_products_matches_row_wise(seed, expiry_threshold_days, with_expiry_type):
+    inventory = random_inventory(seed)
+    inventory['estimated_days_stock_left'] = inventory.apply(reference_stock_days, axis=1)
+    if not with_expiry_type:
+        inventory = inventory.drop(columns='expiry_type')
+    expected = reference_predict_expiring_products(inventory.copy(), expiry_threshold_days, 1.2)
+    result = predict_expiring_products(inventory.copy(), expiry_threshold_days, 1.2)
+
+    assert len(expected) > 0
+    columns = ['product_id', 'expiry_type', 'days_to_expiry', 'risk_threshold', 'risk_score']
+    pd.testing.assert_frame_equal(result[columns].reset_index(drop=True), expected[columns].reset_index(drop=True),
+                                  check_dtype=False)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from utils.sales_cube import cube_day_index, cube_sales_between
+from utils.sales_stream import VELOCITY_WINDOW_DAYS
+from utils.waste_prediction import (
+    CATEGORY_EXPIRY_TYPES, DEFAULT_EXPIRY_TYPE, PRIORITY_HIGH_RISK_CUTOFFS,
+    calculate_risk_scores, expiry_type_priorities, risk_threshold_table,
+    stock_days_from_arrays, stock_days_parameters
+)
+
+DEFAULT_DATE_BATCH = 64
+
+def backtest_waste_predictions(inventory_df, cube, as_of_dates, expiry_threshold_days=30,
+                               stock_threshold_factor=1.5, stock_days_table=None,
+                               snapshot_date=None, date_batch=DEFAULT_DATE_BATCH):
+    """
+    Replays the waste heuristic of predict_expiring_products on each date in as_of_dates
+    and scores the flagged products against what actually sold afterwards.
+
+    Everything is evaluated as (dates x products) arrays over the sales cube:
+    - velocity: units sold in the 30 days before the as-of date / 30
+    - stock on the as-of date: quantity_in_stock at snapshot_date (default: the day after
+      the last day in the cube) plus the units sold between the as-of date and the snapshot
+    - actually wasted: expired by the snapshot with fewer units sold between the as-of
+      date and expiry than were in stock on the as-of date
+    Products purchased after an as-of date are not in stock yet and are skipped for it, and
+    products expiring after the snapshot have no known outcome and are left out of scoring.
+    Dates are processed in batches of date_batch to bound memory.
+
+    Returns one row per as-of date with flagged / wasted counts, true positives,
+    precision, recall and the cost value of flagged, actually wasted and all in-stock stock.
+    """
+    as_of_dates = pd.DatetimeIndex(pd.to_datetime(as_of_dates)).normalize()
+    product_ids = inventory_df['product_id'].astype(str).to_numpy()
+    if snapshot_date is None:
+        snapshot_day = cube['num_days']
+    else:
+        snapshot_day = int(cube_day_index(cube, snapshot_date)[0])
+
+    if 'expiry_type' in inventory_df.columns:
+        expiry_types = inventory_df['expiry_type'].astype(object)
+    else:
+        expiry_types = inventory_df['category'].astype(object).map(CATEGORY_EXPIRY_TYPES).fillna(DEFAULT_EXPIRY_TYPE)
+    type_codes, type_values = pd.factorize(expiry_types)
+    priority = expiry_type_priorities(type_values)[type_codes]
+    risk_threshold = risk_threshold_table(type_values, expiry_threshold_days).astype(np.float64)[type_codes]
+    min_days, max_days, days_per_unit = stock_days_parameters(inventory_df['category'], stock_days_table)
+
+    expiry_day = cube_day_index(cube, inventory_df['expiry_date'])
+    purchase_day = cube_day_index(cube, inventory_df['purchase_date'])
+    snapshot_stock = inventory_df['quantity_in_stock'].to_numpy(dtype=np.float64)
+    unit_cost = inventory_df['cost_price'].to_numpy(dtype=np.float64)
+    observable = expiry_day <= snapshot_day
+
+    results = []
+    for batch_start in range(0, len(as_of_dates), date_batch):
+        batch_dates = as_of_dates[batch_start:batch_start + date_batch]
+        as_of_day = cube_day_index(cube, batch_dates)[:, None]
+
+        velocity = cube_sales_between(cube, as_of_day - VELOCITY_WINDOW_DAYS, as_of_day, product_ids) / VELOCITY_WINDOW_DAYS
+        stock = snapshot_stock + cube_sales_between(cube, as_of_day, snapshot_day, product_ids)
+        days_to_expiry = (expiry_day - as_of_day).astype(np.float64)
+        stock_days = stock_days_from_arrays(stock, velocity, min_days, max_days, days_per_unit)
+
+        in_stock = purchase_day <= as_of_day
+        risk_score = calculate_risk_scores(days_to_expiry, velocity, stock_days, priority, stock_threshold_factor)
+        flagged = (
+            in_stock
+            & (days_to_expiry <= risk_threshold)
+            & (risk_score > PRIORITY_HIGH_RISK_CUTOFFS[priority])
+            & (days_to_expiry >= 0)
+        )
+
+        sold_before_expiry = cube_sales_between(cube, as_of_day, expiry_day, product_ids)
+        scored = in_stock & observable & (days_to_expiry >= 0)
+        wasted = scored & (sold_before_expiry < stock)
+        flagged_scored = flagged & scored
+        stock_value = stock * unit_cost
+
+        true_positives = (flagged_scored & wasted).sum(axis=1)
+        flagged_count = flagged_scored.sum(axis=1)
+        wasted_count = wasted.sum(axis=1)
+        results.append(pd.DataFrame({
+            'flagged_products': flagged.sum(axis=1),
+            'scored_flagged_products': flagged_count,
+            'actually_wasted_products': wasted_count,
+            'true_positives': true_positives,
+            'flagged_value': (flagged * stock_value).sum(axis=1),
+            'actually_wasted_value': (wasted * stock_value).sum(axis=1),
+            'inventory_value': (in_stock * stock_value).sum(axis=1)
+        }, index=batch_dates.rename('as_of')))
+
+    if not results:
+        return pd.DataFrame()
+    backtest = pd.concat(results)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        backtest['precision'] = backtest['true_positives'] / backtest['scored_flagged_products']
+        backtest['recall'] = backtest['true_positives'] / backtest['actually_wasted_products']
+    return backtest
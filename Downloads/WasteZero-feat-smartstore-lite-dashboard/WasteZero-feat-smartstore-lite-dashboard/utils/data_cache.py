@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (needed by pandas for Parquet I/O)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+CACHE_DIR_NAME = ".cache"
+FRAME_EXT = ".parquet" if PARQUET_AVAILABLE else ".pkl"  # Derived frames kept in the cache directory
+_HASH_CHUNK_BYTES = 1 << 20
+CACHE_FORMAT_VERSION = 1  # Bump when parsing changes in ways a parse spec does not describe
+
+def cache_paths(source_path):
+    """Returns the (parquet, manifest) paths caching source_path, under <data dir>/.cache/."""
+    directory, filename = os.path.split(os.path.abspath(source_path))
+    stem = os.path.splitext(filename)[0]
+    cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f"{stem}.parquet"), os.path.join(cache_dir, f"{stem}.manifest.json")
+
+def write_frame(df, path):
+    """Atomically writes a derived frame (Parquet, or pickle without pyarrow)."""
+    tmp_path = path + ".tmp"
+    if PARQUET_AVAILABLE:
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+def read_frame(path):
+    """Reads a frame written by write_frame."""
+    if PARQUET_AVAILABLE:
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+def file_digest(path):
+    """SHA-1 of the file contents, read in fixed-size blocks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _source_fingerprint(source_path):
+    stat = os.stat(source_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def parse_spec_digest(parse_spec=None):
+    """SHA-1 of the cache format version and a JSON-serializable description of the parse."""
+    spec = json.dumps({'version': CACHE_FORMAT_VERSION, 'parse_spec': parse_spec}, sort_keys=True, default=str)
+    return hashlib.sha1(spec.encode()).hexdigest()
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write_manifest(manifest_path, manifest):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def is_cache_valid(source_path, parse_spec=None):
+    """
+    Checks whether the cached copy still matches the source file and was parsed with
+    parse_spec under the current CACHE_FORMAT_VERSION. Size and mtime are compared first; if only the mtime moved, the content hash decides
+    (a touched-but-unchanged file keeps its cache).
+    """
+    parquet_path, manifest_path = cache_paths(source_path)
+    manifest = _read_manifest(manifest_path)
+    if manifest is None or not os.path.exists(parquet_path):
+        return False
+
+    if manifest.get('parse_spec') != parse_spec_digest(parse_spec):
+        return False
+    fingerprint = _source_fingerprint(source_path)
+    if fingerprint['size'] != manifest.get('size'):
+        return False
+    if fingerprint['mtime_ns'] == manifest.get('mtime_ns'):
+        return True
+    if file_digest(source_path) != manifest.get('sha1'):
+        return False
+
+    manifest['mtime_ns'] = fingerprint['mtime_ns']
+    _write_manifest(manifest_path, manifest)
+    return True
+
+def source_manifest(source_path, parse_spec=None):
+    """Size, mtime and SHA-1 of source_path and the parse spec digest, as stored in its cache manifest."""
+    manifest = _source_fingerprint(source_path)
+    manifest['sha1'] = file_digest(source_path)
+    manifest['parse_spec'] = parse_spec_digest(parse_spec)
+    return manifest
+
+def write_cache(source_path, df, manifest=None, parse_spec=None):
+    """
+    Writes df as the columnar copy of source_path together with its manifest.
+    manifest should be taken with source_manifest before df was parsed: if the file
+    changes in between, the cache then fails validation instead of passing with the new
+    fingerprint on the old contents. Defaults to the file's current manifest with parse_spec.
+    """
+    parquet_path, manifest_path = cache_paths(source_path)
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    if manifest is None:
+        manifest = source_manifest(source_path, parse_spec)
+    write_frame(df, parquet_path)
+    _write_manifest(manifest_path, manifest)
+
+def read_through_cache(source_path, parse_csv, columns=None, parse_spec=None):
+    """
+    Returns the frame for source_path, reading the Parquet copy when it is current.
+    On a miss the CSV is parsed with parse_csv(source_path) and the cache is refreshed.
+    parse_spec describes how parse_csv parses (dtypes, date formats): a cache written
+    under another spec is stale.
+    Only the requested columns are read from the memory-mapped Parquet file.
+    Without pyarrow installed this is a plain CSV parse.
+    """
+    if not PARQUET_AVAILABLE:
+        df = parse_csv(source_path)
+        return df[list(columns)] if columns is not None else df
+
+    parquet_path, _ = cache_paths(source_path)
+    if is_cache_valid(source_path, parse_spec):
+        try:
+            return pd.read_parquet(parquet_path, columns=columns, memory_map=True)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable cache {parquet_path}: {e}")
+
+    manifest = source_manifest(source_path, parse_spec)
+    df = parse_csv(source_path)
+    try:
+        write_cache(source_path, df, manifest)
+    except OSError as e:
+        print(f"Warning: could not write cache for {source_path}: {e}")
+    return df[list(columns)] if columns is not None else df
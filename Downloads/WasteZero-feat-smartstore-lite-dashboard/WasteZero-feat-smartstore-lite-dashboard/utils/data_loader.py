@@ -0,0 +1,115 @@
+import os
+import pandas as pd
+from utils.data_cache import read_through_cache
+
+# Explicit dtypes so every CSV is parsed exactly once, without type inference.
+# Identifier and label columns are categorical, counts are int32.
+INVENTORY_DTYPES = {
+    'product_id': 'category',
+    'product_name': 'object',
+    'category': 'category',
+    'supplier_id': 'category',
+    'purchase_date': 'object',
+    'expiry_date': 'object',
+    'expiry_type': 'category',
+    'quantity_in_stock': 'int32',
+    'cost_price': 'float64',
+    'selling_price': 'float64',
+    'seasonal_demand_factor': 'float64'
+}
+SALES_DTYPES = {
+    'product_id': 'category',
+    'timestamp': 'object',
+    'quantity_sold': 'int32'
+}
+SUPPLIER_DTYPES = {
+    'supplier_id': 'category',
+    'supplier_name': 'object',
+    'reliability_score': 'float64',
+    'delivery_time_days': 'int32',
+    'contact_email': 'object',
+    'phone': 'object'
+}
+SCHEDULE_DTYPES = {
+    'employee_id': 'category',
+    'store_id': 'category',
+    'date': 'object',
+    'shift_start_time': 'object',
+    'shift_end_time': 'object'
+}
+
+DATE_FORMAT = '%Y-%m-%d'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+INVENTORY_DATE_COLUMNS = {'purchase_date': DATE_FORMAT, 'expiry_date': DATE_FORMAT}
+SALES_DATE_COLUMNS = {'timestamp': TIMESTAMP_FORMAT}
+SCHEDULE_DATE_COLUMNS = {'date': DATE_FORMAT}
+
+# Parsed frames shared by every module in the process, keyed by file path.
+# Callers must treat them as read-only and copy before modifying in place.
+_loaded_frames = {}
+
+def ensure_datetime(series, fmt=None):
+    """Returns the series as datetime64, parsing only if it is not already parsed."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, format=fmt)
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def _parse_csv(path, dtypes, date_columns=None):
+    """Parses a CSV with explicit dtypes and fixed-format date columns."""
+    df = pd.read_csv(path, dtype=dtypes)
+    for col, fmt in (date_columns or {}).items():
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=fmt)
+    return df
+
+def _load_shared(path, dtypes, date_columns=None, columns=None):
+    """
+    Returns the shared parsed frame for path, re-reading only if the file changed.
+    Reads go through the on-disk columnar cache, so a cold start skips the CSV parse.
+    """
+    key = (os.path.abspath(path), tuple(columns) if columns is not None else None)
+    signature = _file_signature(path)
+    cached = _loaded_frames.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    df = read_through_cache(path, lambda p: _parse_csv(p, dtypes, date_columns), columns=columns,
+                            parse_spec={'dtypes': dtypes, 'date_columns': date_columns})
+    _loaded_frames[key] = (signature, df)
+    return df
+
+def load_inventory(inventory_path="data/inventory.csv", columns=None):
+    """Loads the shared, typed inventory frame (optionally only some columns)."""
+    return _load_shared(inventory_path, INVENTORY_DTYPES, INVENTORY_DATE_COLUMNS, columns)
+
+def load_sales(sales_path="data/sales.csv", columns=None):
+    """Loads the shared, typed sales frame (optionally only some columns)."""
+    return _load_shared(sales_path, SALES_DTYPES, SALES_DATE_COLUMNS, columns)
+
+def load_suppliers(suppliers_path="data/suppliers.csv", columns=None):
+    """Loads the shared, typed supplier frame (optionally only some columns)."""
+    return _load_shared(suppliers_path, SUPPLIER_DTYPES, columns=columns)
+
+def load_employee_schedules(schedules_path="data/employee_schedules.csv", columns=None):
+    """Loads the shared, typed employee shift frame (optionally only some columns)."""
+    return _load_shared(schedules_path, SCHEDULE_DTYPES, SCHEDULE_DATE_COLUMNS, columns)
+
+def loaded_file_size(path, df, columns=None):
+    """
+    Size in bytes of the file at path when df was parsed from it, if df is its shared
+    frame (None otherwise).
+    """
+    key = (os.path.abspath(path), tuple(columns) if columns is not None else None)
+    cached = _loaded_frames.get(key)
+    if cached is None or cached[1] is not df:
+        return None
+    return cached[0][0]
+
+def clear_loaded_frames():
+    """Drops all shared frames so the next load re-reads the files (cache files are kept)."""
+    _loaded_frames.clear()
@@ -0,0 +1,130 @@
+import math
+import threading
+from bisect import bisect_left, insort
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Sorted expiry index.
+# Products are kept as (expiry_ns, product_id) tuples sorted by expiry, overall and per
+# category, so "what expires in the next N days" and expiry percentiles are bisect
+# lookups instead of scans. Entries are inserted/removed one at a time as stock changes;
+# refresh_expiry_index applies a reloaded inventory that way instead of rebuilding.
+
+_NS_PER_DAY = 86_400 * 10**9
+_refresh_lock = threading.Lock()  # The app shares one index between sessions
+
+def _expiry_key(expiry_date):
+    return pd.Timestamp(expiry_date).as_unit('ns').value
+
+def _now_ns(as_of=None):
+    return pd.Timestamp(datetime.now() if as_of is None else as_of).as_unit('ns').value
+
+def build_expiry_index(inventory_df):
+    """Builds the index from inventory rows (product_id, category, expiry_date)."""
+    keys = inventory_df['expiry_date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    product_ids = inventory_df['product_id'].astype(str).to_numpy()
+    categories = inventory_df['category'].astype(object).to_numpy()
+    order = np.lexsort((product_ids, keys))
+
+    index = {'entries': [], 'by_category': {}, 'products': {}, 'source': inventory_df}
+    for key, product_id, category in zip(keys[order].tolist(), product_ids[order], categories[order]):
+        index['entries'].append((key, product_id))
+        index['by_category'].setdefault(category, []).append((key, product_id))
+        index['products'][product_id] = (key, category)
+    return index
+
+def remove_from_expiry_index(index, product_id):
+    """Removes a product (e.g. sold out or written off); unknown ids are ignored."""
+    existing = index['products'].pop(product_id, None)
+    if existing is None:
+        return
+    key, category = existing
+    for entries in (index['entries'], index['by_category'][category]):
+        del entries[bisect_left(entries, (key, product_id))]
+
+def update_expiry_index(index, product_id, expiry_date, category):
+    """Inserts a product, or moves it if its expiry date or category changed (e.g. restocked)."""
+    remove_from_expiry_index(index, product_id)
+    key = _expiry_key(expiry_date)
+    insort(index['entries'], (key, product_id))
+    insort(index['by_category'].setdefault(category, []), (key, product_id))
+    index['products'][product_id] = (key, category)
+
+def refresh_expiry_index(index, inventory_df):
+    """
+    Brings the index in line with inventory_df in place: products whose expiry date or
+    category changed are moved, new ones inserted and products no longer listed removed.
+    Returns at once if inventory_df is the frame the index was last built or refreshed
+    from (the shared loader hands out the same frame until the file changes).
+    """
+    with _refresh_lock:
+        if index.get('source') is inventory_df:
+            return index
+        keys = inventory_df['expiry_date'].to_numpy(dtype='datetime64[ns]').astype(np.int64).tolist()
+        product_ids = inventory_df['product_id'].astype(str).tolist()
+        categories = inventory_df['category'].astype(object).tolist()
+
+        indexed = index['products']
+        for product_id in set(indexed).difference(product_ids):
+            remove_from_expiry_index(index, product_id)
+        for key, product_id, category in zip(keys, product_ids, categories):
+            if indexed.get(product_id) != (key, category):
+                update_expiry_index(index, product_id, pd.Timestamp(key), category)
+        index['source'] = inventory_df
+    return index
+
+def _entries(index, category=None):
+    return index['entries'] if category is None else index['by_category'].get(category, [])
+
+def expiring_within(index, days, as_of=None, category=None):
+    """
+    Product ids with 0 <= days_to_expiry <= days, soonest first, where days_to_expiry is
+    the whole number of days from as_of (default now) as in preprocess_for_waste_prediction.
+    """
+    entries = _entries(index, category)
+    now = _now_ns(as_of)
+    start = bisect_left(entries, (now,))
+    end = bisect_left(entries, (now + (days + 1) * _NS_PER_DAY,))
+    return [product_id for _, product_id in entries[start:end]]
+
+def count_expiring_within(index, days, as_of=None, category=None):
+    """Number of products expiring within days, without materializing them."""
+    entries = _entries(index, category)
+    now = _now_ns(as_of)
+    return bisect_left(entries, (now + (days + 1) * _NS_PER_DAY,)) - bisect_left(entries, (now,))
+
+def _kth_key(lists, k):
+    """k-th smallest expiry key (0-based) across several sorted lists, by bisecting on the key value."""
+    lo = min(entries[0][0] for entries in lists if entries)
+    hi = max(entries[-1][0] for entries in lists if entries)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sum(bisect_left(entries, (mid + 1,)) for entries in lists) > k:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def expiry_days_quantile(index, q, as_of=None, categories=None):
+    """
+    Quantile of days_to_expiry (linear interpolation, like pandas Series.quantile) over the
+    given categories (default: all products). Returns NaN if there are no products.
+    """
+    lists = [index['entries']] if categories is None else [_entries(index, c) for c in categories]
+    total = sum(len(entries) for entries in lists)
+    if total == 0:
+        return float('nan')
+
+    now = _now_ns(as_of)
+    position = (total - 1) * q
+    lower = math.floor(position)
+    upper = min(lower + 1, total - 1)
+    if len(lists) == 1:
+        lower_key, upper_key = lists[0][lower][0], lists[0][upper][0]
+    else:
+        lower_key, upper_key = _kth_key(lists, lower), _kth_key(lists, upper)
+
+    lower_days = (lower_key - now) // _NS_PER_DAY
+    upper_days = (upper_key - now) // _NS_PER_DAY
+    return lower_days + (upper_days - lower_days) * (position - lower)
@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from utils.schedule_optimization import MINUTES_PER_DAY, SETTING_MINIMAL, SETTING_REDUCED, SETTING_FULL, setting_power_shares
 
 # These are simplified estimations for a hackathon context
 BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW = 10  # kW for a small/medium store
@@ -19,6 +21,30 @@ def calculate_predicted_waste_value(at_risk_products_df):
 
     return total_predicted_waste_value, total_items_at_risk
 
+def setting_codes_from_labels(settings):
+    """Maps rendered setting strings back to setting codes (-1 for anything else)."""
+    settings = pd.Series(settings, dtype=object).astype(str)
+    codes = np.full(len(settings), -1, dtype=np.int8)
+    codes[(settings == 'Full Power').to_numpy()] = SETTING_FULL
+    codes[settings.str.contains('Reduced Power', regex=False).to_numpy()] = SETTING_REDUCED # Handles "Reduced Power (50% savings mode)"
+    codes[(settings == 'Minimal/Off').to_numpy()] = SETTING_MINIMAL
+    return codes
+
+def schedule_slot_minutes(schedule_df):
+    """
+    Slot length of a rendered schedule frame, in minutes: the smallest step between the
+    slot start times of its 'time' column (HH:MM, sub-hourly schedules) or 'hour' column.
+    """
+    if 'time' in schedule_df.columns:
+        hours_minutes = schedule_df['time'].astype(str).str.split(':', n=1, expand=True).astype(int)
+        minutes = hours_minutes[0] * 60 + hours_minutes[1]
+    elif 'hour' in schedule_df.columns:
+        minutes = schedule_df['hour'].astype(int) * 60
+    else:
+        raise ValueError("A schedule frame needs an 'hour' or 'time' column")
+    steps = np.diff(np.unique(minutes.to_numpy()))
+    return int(steps.min()) if len(steps) else 60
+
 def estimate_energy_savings(schedule_recommendations_df,
                             base_consumption_kwh=BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW,
                             off_peak_reduction_pct=50): # Must match the one in schedule_optimization
@@ -27,21 +53,36 @@ def estimate_energy_savings(schedule_recommendations_df,
     Assumes 'Full Power' is base_consumption_kwh,
     'Reduced Power' applies off_peak_reduction_pct,
     and 'Minimal/Off' is near zero (e.g., 10% of base for essential systems).
+
+    The schedule can be a rendered schedule frame or an int8 setting code array from
+    schedule_optimization.schedule_codes with the slots of a day on the last axis, e.g.
+    (stores, days, 24); savings are then returned per day as arrays of the leading shape.
+    Code arrays may be sub-hourly (48 or 96 slots), each slot then counting for its share
+    of an hour. A frame's slot length and day count come from the attrs render_schedule
+    records, else from its time/hour column (schedule_slot_minutes) and row count; a frame
+    covering several days (e.g. one block per weekday) gives the average day.
     """
-    if schedule_recommendations_df is None or schedule_recommendations_df.empty:
+    if schedule_recommendations_df is None or len(schedule_recommendations_df) == 0:
         return 0.0, 0.0
 
-    daily_standard_consumption = base_consumption_kwh * 24 # Baseline: full power 24h
+    if isinstance(schedule_recommendations_df, pd.DataFrame):
+        codes = setting_codes_from_labels(schedule_recommendations_df['setting'])
+        attrs = schedule_recommendations_df.attrs
+        slot_minutes = attrs.get('slot_minutes') or schedule_slot_minutes(schedule_recommendations_df)
+        # Slots of all days on one axis; dividing by the day count averages them. A frame
+        # filtered after rendering no longer has the recorded day count.
+        num_days = len(codes) * slot_minutes / MINUTES_PER_DAY
+        if attrs.get('days') and len(codes) == attrs['days'] * MINUTES_PER_DAY // slot_minutes:
+            num_days = attrs['days']
+    else:
+        codes = np.asarray(schedule_recommendations_df)
+        slot_minutes = MINUTES_PER_DAY / codes.shape[-1]
+        num_days = 1
+    hours_per_slot = slot_minutes / 60
 
-    optimized_consumption = 0
-    for _, row in schedule_recommendations_df.iterrows():
-        if row['setting'] == 'Full Power':
-            optimized_consumption += base_consumption_kwh
-        elif 'Reduced Power' in row['setting']: # Handles "Reduced Power (50% savings mode)"
-            # Extract reduction from setting string if needed, or use parameter
-            optimized_consumption += base_consumption_kwh * (1 - (off_peak_reduction_pct / 100.0))
-        elif row['setting'] == 'Minimal/Off':
-            optimized_consumption += base_consumption_kwh * 0.1 # Assume 10% for minimal systems
+    daily_standard_consumption = base_consumption_kwh * 24 # Baseline: full power 24h
+    optimized_consumption = base_consumption_kwh * hours_per_slot * \
+        setting_power_shares(off_peak_reduction_pct)[codes].sum(axis=-1) / num_days
 
     daily_energy_saved_kwh = daily_standard_consumption - optimized_consumption
     daily_cost_saved = daily_energy_saved_kwh * COST_PER_KWH
@@ -78,6 +119,86 @@ def calculate_greenscore(predicted_waste_value, total_inventory_value,
 
     return round(green_score, 2), round(waste_score, 2), round(energy_score, 2)
 
+def max_possible_daily_energy_savings(store_open_hour, store_close_hour, off_peak_reduction_pct,
+                                      base_consumption_kwh=BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW):
+    """
+    Savings ceiling used to normalise the energy score: 'Reduced Power' during all operating
+    hours instead of 'Full Power' ('Minimal/Off' outside them in both cases). Accepts arrays
+    (e.g. one reduction % per row) and broadcasts.
+    """
+    operating_hours = np.asarray(store_close_hour) - np.asarray(store_open_hour)
+    savings = operating_hours * base_consumption_kwh * (np.asarray(off_peak_reduction_pct) / 100.0)
+    return np.maximum(0, savings)
+
+def energy_savings_by_reduction_pct(schedule_codes, off_peak_reduction_pcts,
+                                    base_consumption_kwh=BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW):
+    """
+    Daily energy saved by a fixed schedule (setting codes for one day, or a (days x slots)
+    array, which is averaged over its days) for every reduction % in off_peak_reduction_pcts,
+    in one call. Only the 'Reduced Power' slots depend on the percentage, so the codes are
+    counted once and savings are linear in it.
+    """
+    codes = np.asarray(schedule_codes)
+    hours_per_slot = 24 / codes.shape[-1]
+    num_days = codes.size // codes.shape[-1]
+    counts = np.bincount(codes.reshape(-1), minlength=SETTING_FULL + 1) * hours_per_slot / num_days
+    reductions = np.asarray(off_peak_reduction_pcts, dtype=np.float64) / 100.0
+    optimized_consumption = base_consumption_kwh * (
+        counts[SETTING_MINIMAL] * setting_power_shares()[SETTING_MINIMAL]
+        + counts[SETTING_REDUCED] * (1 - reductions)
+        + counts[SETTING_FULL]
+    )
+    return base_consumption_kwh * 24 - optimized_consumption
+
+def calculate_greenscore_batch(predicted_waste_value, total_inventory_value,
+                               daily_energy_saved_kwh, max_possible_daily_energy_savings_kwh,
+                               waste_weight=0.6, energy_weight=None):
+    """
+    Vectorized calculate_greenscore: every argument may be an array, and all of them are
+    broadcast together, so a grid of inputs is scored in one call. energy_weight defaults
+    to 1 - waste_weight. Returns (green_score, waste_score, energy_score) arrays rounded
+    to 2 decimals, with the same neutral scores (50) for zero inventory or zero ceiling.
+    """
+    predicted_waste_value = np.asarray(predicted_waste_value, dtype=np.float64)
+    total_inventory_value = np.asarray(total_inventory_value, dtype=np.float64)
+    daily_energy_saved_kwh = np.asarray(daily_energy_saved_kwh, dtype=np.float64)
+    max_savings = np.asarray(max_possible_daily_energy_savings_kwh, dtype=np.float64)
+    waste_weight = np.asarray(waste_weight, dtype=np.float64)
+    energy_weight = 1 - waste_weight if energy_weight is None else np.asarray(energy_weight, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        waste_percentage = predicted_waste_value / total_inventory_value * 100
+        energy_savings_percentage = daily_energy_saved_kwh / max_savings * 100
+    waste_score = np.where(total_inventory_value == 0, 50, np.maximum(0, 100 - waste_percentage * 5))
+    energy_score = np.where(max_savings == 0, 50, np.clip(energy_savings_percentage, 0, 100))
+
+    green_score = waste_score * waste_weight + energy_score * energy_weight
+    return np.round(green_score, 2), np.round(waste_score, 2), np.round(energy_score, 2)
+
+def greenscore_sensitivity_surface(predicted_waste_value, total_inventory_value, schedule_codes,
+                                   off_peak_reduction_pcts, waste_weights,
+                                   store_open_hour=8, store_close_hour=22,
+                                   base_consumption_kwh=BASE_ENERGY_CONSUMPTION_PER_HOUR_AC_LIGHTING_KW):
+    """
+    GreenScore for every (reduction %, waste weight) pair, holding the schedule's setting
+    codes fixed: rows are off_peak_reduction_pcts, columns are waste_weights (the energy
+    weight being 1 - waste weight). Computed in one broadcast call, for use as a heatmap.
+    """
+    reductions = np.asarray(off_peak_reduction_pcts, dtype=np.float64)
+    weights = np.asarray(waste_weights, dtype=np.float64)
+    if schedule_codes is None:
+        saved = np.zeros(len(reductions))
+    else:
+        saved = energy_savings_by_reduction_pct(schedule_codes, reductions, base_consumption_kwh)
+    max_savings = max_possible_daily_energy_savings(store_open_hour, store_close_hour, reductions, base_consumption_kwh)
+    # A zero ceiling is scored against 1 kWh, as on the dashboard
+    max_savings = np.where(max_savings > 0, max_savings, 1.0)
+
+    green_score, _, _ = calculate_greenscore_batch(predicted_waste_value, total_inventory_value,
+                                                   saved[:, None], max_savings[:, None], weights[None, :])
+    return pd.DataFrame(green_score, index=pd.Index(off_peak_reduction_pcts, name='off_peak_reduction_pct'),
+                        columns=pd.Index(waste_weights, name='waste_weight'))
+
 if __name__ == '__main__':
     # Example Usage (requires outputs from other utils or mock data)
 
@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.backtest import backtest_waste_predictions
+from utils.data_cache import CACHE_DIR_NAME, FRAME_EXT, read_frame, write_frame
+from utils.greenscore import calculate_greenscore_batch, estimate_energy_savings, max_possible_daily_energy_savings
+from utils.schedule_optimization import schedule_codes
+
+# Persisted GreenScore history.
+# One row per (store_id, date) holding the day's inputs and scores. A day is scored once,
+# when it is first appended, with the settings in effect at that time; later refreshes only
+# score dates missing from the history, so trends over a year of days are read back
+# instead of recomputed.
+
+INPUT_COLUMNS = ['predicted_waste_value', 'total_inventory_value',
+                 'daily_energy_saved_kwh', 'max_possible_daily_energy_savings_kwh']
+SCORE_COLUMNS = ['waste_weight', 'waste_score', 'energy_score', 'green_score']
+HISTORY_COLUMNS = ['store_id', 'date'] + INPUT_COLUMNS + SCORE_COLUMNS
+DEFAULT_STORE_ID = "STORE_001"  # The sample data covers a single store
+DEFAULT_TREND_WINDOW_DAYS = 7
+
+def history_path(data_dir="data"):
+    """Location of the history file in the cache directory of data_dir."""
+    return os.path.join(data_dir, CACHE_DIR_NAME, f"greenscore_history{FRAME_EXT}")
+
+def empty_history():
+    history = pd.DataFrame({column: pd.Series(dtype='float64') for column in HISTORY_COLUMNS})
+    history['store_id'] = history['store_id'].astype(object)
+    history['date'] = history['date'].astype('datetime64[ns]')
+    return history
+
+def load_greenscore_history(path=None):
+    """Loads the persisted history (empty if none exists)."""
+    path = history_path() if path is None else path
+    if not os.path.exists(path):
+        return empty_history()
+    try:
+        return read_frame(path)
+    except Exception as e:
+        print(f"Error reading GreenScore history at {path}: {e}. Starting a new one.")
+        return empty_history()
+
+def save_greenscore_history(history, path=None):
+    """Persists the history next to the other cached data."""
+    path = history_path() if path is None else path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_frame(history, path)
+
+def missing_history_dates(history, store_id, dates):
+    """The dates in dates that have no history row for store_id yet."""
+    dates = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+    recorded = history.loc[history['store_id'] == store_id, 'date']
+    return dates[~dates.isin(recorded)]
+
+def append_greenscore_days(history, daily_inputs, waste_weight=0.6):
+    """
+    Scores the rows of daily_inputs (store_id, date and the INPUT_COLUMNS) whose
+    (store_id, date) is not in history yet, in one calculate_greenscore_batch call, and
+    returns the history with them appended, sorted by store and date. Rows already in the
+    history are kept as recorded. A zero savings ceiling is scored against 1 kWh, as on
+    the dashboard.
+    """
+    if daily_inputs is None or daily_inputs.empty:
+        return history
+    new_days = daily_inputs[['store_id', 'date'] + INPUT_COLUMNS].copy()
+    new_days['date'] = pd.to_datetime(new_days['date']).dt.normalize()
+    new_days = new_days.drop_duplicates(['store_id', 'date'], keep='last')
+    recorded = pd.MultiIndex.from_frame(history[['store_id', 'date']])
+    new_days = new_days[~pd.MultiIndex.from_frame(new_days[['store_id', 'date']]).isin(recorded)]
+    if new_days.empty:
+        return history
+
+    max_savings = new_days['max_possible_daily_energy_savings_kwh'].to_numpy(dtype=np.float64)
+    green_score, waste_score, energy_score = calculate_greenscore_batch(
+        new_days['predicted_waste_value'], new_days['total_inventory_value'],
+        new_days['daily_energy_saved_kwh'], np.where(max_savings > 0, max_savings, 1.0),
+        waste_weight=waste_weight
+    )
+    new_days = new_days.assign(waste_weight=float(waste_weight), waste_score=waste_score,
+                               energy_score=energy_score, green_score=green_score)
+
+    frames = [frame for frame in (history, new_days) if not frame.empty]
+    combined = pd.concat(frames, ignore_index=True)[HISTORY_COLUMNS]
+    return combined.sort_values(['store_id', 'date'], kind='stable', ignore_index=True)
+
+def daily_greenscore_inputs(inventory_df, cube, footfall_by_date, dates=None,
+                            store_open_hour=8, store_close_hour=22, off_peak_reduction_pct=50,
+                            expiry_threshold_days=30, stock_threshold_factor=1.5):
+    """
+    GreenScore inputs for each date in dates (default: every row of footfall_by_date):
+    - predicted waste: cost value of the products the waste heuristic flags on that date,
+      and total in-stock value, both replayed over the sales cube (utils.backtest)
+    - energy saved: the threshold schedule for that date's own footfall (rows of
+      footfall_by_date, slot columns) and its savings ceiling
+    All dates are evaluated together as (dates x products) and (dates x slots) arrays.
+    """
+    if dates is None:
+        dates = footfall_by_date.index
+    dates = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+    if len(dates) == 0:
+        return pd.DataFrame(columns=['date'] + INPUT_COLUMNS)
+
+    backtest = backtest_waste_predictions(inventory_df, cube, dates, expiry_threshold_days=expiry_threshold_days,
+                                          stock_threshold_factor=stock_threshold_factor)
+    footfall = footfall_by_date.reindex(dates, fill_value=0).to_numpy()
+    codes = schedule_codes(footfall, store_open_hour=store_open_hour, store_close_hour=store_close_hour)
+    energy_saved, _ = estimate_energy_savings(codes, off_peak_reduction_pct=off_peak_reduction_pct)
+    max_savings = max_possible_daily_energy_savings(store_open_hour, store_close_hour, off_peak_reduction_pct)
+
+    return pd.DataFrame({
+        'date': dates,
+        'predicted_waste_value': backtest['flagged_value'].to_numpy(),
+        'total_inventory_value': backtest['inventory_value'].to_numpy(),
+        'daily_energy_saved_kwh': energy_saved,
+        'max_possible_daily_energy_savings_kwh': float(max_savings)
+    })
+
+def refresh_greenscore_history(inventory_df, cube, footfall_by_date, store_id=DEFAULT_STORE_ID, path=None,
+                               waste_weight=0.6, persist=True, **input_kwargs):
+    """
+    Appends the complete days of footfall_by_date that store_id has no history for, and
+    returns the full history. The last day of data may still be receiving sales, so it
+    is only scored once a later day appears. input_kwargs go to daily_greenscore_inputs.
+    """
+    history = load_greenscore_history(path)
+    complete_days = footfall_by_date.index[:-1]
+    dates = missing_history_dates(history, store_id, complete_days)
+    if len(dates) == 0:
+        return history
+
+    daily_inputs = daily_greenscore_inputs(inventory_df, cube, footfall_by_date, dates, **input_kwargs)
+    history = append_greenscore_days(history, daily_inputs.assign(store_id=store_id), waste_weight=waste_weight)
+    if persist:
+        save_greenscore_history(history, path)
+    return history
+
+def greenscore_trend(history, store_ids=None, start=None, end=None,
+                     window_days=DEFAULT_TREND_WINDOW_DAYS, column='green_score'):
+    """
+    Daily values of column as a (date x store) frame over [start, end], with each store's
+    trailing rolling mean over window_days calendar days (window_days=1 for the raw
+    values). Days a store has no row for are left empty and skipped by the mean.
+    """
+    if store_ids is not None:
+        history = history[history['store_id'].isin(store_ids)]
+    if start is not None:
+        history = history[history['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        history = history[history['date'] <= pd.Timestamp(end)]
+    if history.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='date'))
+
+    daily = history.pivot(index='date', columns='store_id', values=column)
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq='D', name='date'))
+    if window_days <= 1:
+        return daily
+    return daily.rolling(window_days, min_periods=1).mean()
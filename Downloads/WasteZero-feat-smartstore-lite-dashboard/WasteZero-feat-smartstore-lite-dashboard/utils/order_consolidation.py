@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+# Supplier order consolidation.
+# Each pending replenishment line has a deadline: the day its usable stock reaches the reorder
+# point. Ordered independently, each supplier delivers once per day that has lines due (lines
+# due the same day share a delivery). Consolidating picks a set of delivery days per supplier
+# and orders each line on the latest picked day on or before its deadline. Ordering a line k days early costs k x its order value x (1 / shelf life + holding
+# rate): each early day uses up a share of the batch's shelf life (expiry risk) and ties up
+# capital. Deliveries cost DELIVERY_COST each.
+#
+# For one supplier, with picked days t1 < t2 < ... (t1 no later than the earliest deadline),
+#     F[t] = min(DELIVERY_COST                              if no deadline is before t,
+#                min over s < t of F[s] + DELIVERY_COST + early cost of deadlines in [s, t) on day s)
+# and the plan costs min over t of F[t] + early cost of deadlines in [t, horizon) on day t.
+# Early costs of a deadline range come from prefix sums, and the recursion runs for all
+# suppliers at once as (suppliers x days) arrays.
+
+DEFAULT_HORIZON_DAYS = 28  # Planning window; lines due later are left for a later run
+DELIVERY_COST = 50.0  # $ per delivery (freight and handling)
+DELIVERY_EMISSIONS_KG = 12.0  # kg CO2e per delivery
+HOLDING_COST_RATE = 0.0005  # Share of order value per day of holding stock
+
+def pending_order_lines(plan, inventory_df, horizon_days=DEFAULT_HORIZON_DAYS):
+    """
+    Order lines due within horizon_days from a replenishment plan (utils.replenishment):
+    deadline_day is 0 for products to reorder now, else the days until usable stock falls
+    to the reorder point. Lines due now order the plan's quantity; later ones order up to
+    the order-up-to level from the reorder point, capped by the shelf life.
+    """
+    if plan is None or plan.empty:
+        return pd.DataFrame(columns=['product_id', 'supplier_id', 'deadline_day', 'order_quantity',
+                                     'order_value', 'early_cost_per_day'])
+    velocity = plan['avg_daily_sales'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_to_reorder = np.floor((plan['usable_stock'].to_numpy() - plan['reorder_point'].to_numpy()) / velocity)
+    deadline = np.where(plan['reorder_now'].to_numpy(), 0, np.clip(days_to_reorder, 0, None))
+    future_quantity = np.minimum(plan['order_up_to'].to_numpy() - plan['reorder_point'].to_numpy(),
+                                 plan['expiry_cap'].to_numpy())
+    quantity = np.where(plan['reorder_now'].to_numpy(), plan['order_quantity'].to_numpy(), future_quantity)
+    pending = (velocity > 0) & (deadline < horizon_days) & (quantity > 0) & ~np.isnan(plan['lead_time_days'].to_numpy())
+
+    cost_price = inventory_df.assign(product_id=inventory_df['product_id'].astype(str)).drop_duplicates(
+        'product_id').set_index('product_id')['cost_price']
+    lines = pd.DataFrame({
+        'product_id': plan.index[pending],
+        'supplier_id': plan['supplier_id'].to_numpy()[pending],
+        'deadline_day': deadline[pending].astype(np.int64),
+        'order_quantity': quantity[pending]
+    })
+    lines['order_value'] = lines['order_quantity'] * cost_price.reindex(lines['product_id']).to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        shelf_life_share = 1 / plan['shelf_life_days'].to_numpy(dtype=np.float64)[pending]
+    lines['early_cost_per_day'] = lines['order_value'] * (np.nan_to_num(shelf_life_share, nan=0.0) + HOLDING_COST_RATE)
+    return lines
+
+def consolidation_days(cost_per_day, deadline_weighted_cost, line_counts, delivery_cost=DELIVERY_COST):
+    """
+    Optimal delivery days for many suppliers at once. Inputs are (suppliers x days) arrays:
+    the summed early_cost_per_day of the lines due on each day, the same weighted by the
+    day, and the number of lines due. Returns a boolean (suppliers x days) array of picked
+    days.
+    """
+    num_suppliers, horizon = cost_per_day.shape
+    zeros = np.zeros((num_suppliers, 1))
+    prefix_cost = np.concatenate([zeros, np.cumsum(cost_per_day, axis=1)], axis=1)
+    prefix_weighted = np.concatenate([zeros, np.cumsum(deadline_weighted_cost, axis=1)], axis=1)
+    prefix_count = np.concatenate([zeros, np.cumsum(line_counts, axis=1)], axis=1)
+    days = np.arange(horizon)
+
+    def early_cost(start, end):
+        # Lines due on days [start, end), ordered on day start
+        return (prefix_weighted[:, end] - prefix_weighted[:, start]) - days[start] * (prefix_cost[:, end] - prefix_cost[:, start])
+
+    best = np.full((num_suppliers, horizon), np.inf)
+    previous = np.full((num_suppliers, horizon), -1, dtype=np.int64)
+    for day in range(horizon):
+        first_pick = np.where(prefix_count[:, day] == 0, delivery_cost, np.inf)
+        if day == 0:
+            best[:, 0] = first_pick
+            continue
+        earlier = days[:day]
+        transition = best[:, :day] + delivery_cost + early_cost(earlier, np.full(day, day))
+        choice = transition.argmin(axis=1)
+        chosen_cost = transition[np.arange(num_suppliers), choice]
+        use_first = first_pick <= chosen_cost
+        best[:, day] = np.where(use_first, first_pick, chosen_cost)
+        previous[:, day] = np.where(use_first, -1, choice)
+
+    final = best + early_cost(days, np.full(horizon, horizon))
+    last = final.argmin(axis=1)
+    has_lines = prefix_count[:, horizon] > 0
+
+    picked = np.zeros((num_suppliers, horizon), dtype=bool)
+    rows = np.flatnonzero(has_lines)
+    current = last[rows]
+    while len(rows):
+        picked[rows, current] = True
+        current = previous[rows, current]
+        rows, current = rows[current >= 0], current[current >= 0]
+    return picked
+
+def consolidate_supplier_orders(plan, inventory_df, horizon_days=DEFAULT_HORIZON_DAYS, delivery_cost=DELIVERY_COST):
+    """
+    Groups the pending lines of a replenishment plan into consolidated deliveries per
+    supplier, all suppliers in one batched DP. Returns a dict with
+    - 'lines': each pending line with its order_day, days_early and early_order_cost
+    - 'suppliers': per supplier, deliveries and costs when ordering independently (one
+      delivery per deadline day) and consolidated, with the net saving and emissions avoided
+    """
+    lines = pending_order_lines(plan, inventory_df, horizon_days)
+    if lines.empty:
+        return {'lines': lines, 'suppliers': pd.DataFrame()}
+
+    supplier_codes, suppliers = pd.factorize(lines['supplier_id'])
+    cells = supplier_codes * horizon_days + lines['deadline_day'].to_numpy()
+    shape = (len(suppliers), horizon_days)
+    size = shape[0] * shape[1]
+    cost = lines['early_cost_per_day'].to_numpy()
+    cost_per_day = np.bincount(cells, weights=cost, minlength=size).reshape(shape)
+    weighted = np.bincount(cells, weights=cost * lines['deadline_day'].to_numpy(), minlength=size).reshape(shape)
+    counts = np.bincount(cells, minlength=size).reshape(shape)
+    picked = consolidation_days(cost_per_day, weighted, counts, delivery_cost)
+
+    # Each line goes on the latest picked day on or before its deadline
+    latest_picked = np.maximum.accumulate(np.where(picked, np.arange(horizon_days), -1), axis=1)
+    lines['order_day'] = latest_picked[supplier_codes, lines['deadline_day'].to_numpy()]
+    lines['days_early'] = lines['deadline_day'] - lines['order_day']
+    lines['early_order_cost'] = lines['days_early'] * lines['early_cost_per_day']
+
+    summary = lines.groupby(supplier_codes).agg(
+        lines=('product_id', 'size'),
+        order_value=('order_value', 'sum'),
+        early_order_cost=('early_order_cost', 'sum')
+    )
+    summary.insert(0, 'supplier_id', suppliers[summary.index])
+    summary['deliveries_independent'] = (counts > 0).sum(axis=1)[summary.index]
+    summary['deliveries_consolidated'] = picked.sum(axis=1)[summary.index]
+    deliveries_saved = summary['deliveries_independent'] - summary['deliveries_consolidated']
+    summary['delivery_cost_saved'] = deliveries_saved * delivery_cost
+    summary['net_saving'] = summary['delivery_cost_saved'] - summary['early_order_cost']
+    summary['emissions_saved_kg'] = deliveries_saved * DELIVERY_EMISSIONS_KG
+    summary = summary.sort_values('net_saving', ascending=False, ignore_index=True)
+    return {'lines': lines, 'suppliers': summary}
@@ -0,0 +1,195 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from statistics import NormalDist
+from utils.data_cache import CACHE_DIR_NAME, FRAME_EXT, read_frame, write_frame
+from utils.sales_cube import cube_daily_sales_std
+from utils.supply_simulation import LEAD_TIME_CV
+
+# Replenishment plan: when and how much to reorder, per product.
+# Periodic review with an order-up-to level:
+#   safety stock  = z(service level) x sqrt(lead time x demand variance + velocity^2 x lead time variance)
+#   reorder point = velocity x lead time + safety stock
+#   order-up-to   = reorder point + velocity x review period
+# Stock expected to expire before it sells does not count towards the stock position, and
+# an order is capped at what sells within one shelf life (expiry - purchase date of the
+# current batch), so short-life items are ordered in smaller, more frequent batches.
+# The order levels only change with a product's inputs and are kept between refreshes;
+# what the stock is worth against them (usable stock, whether and how much to order)
+# moves with days_to_expiry every day and is recomputed for every product.
+
+DEFAULT_SERVICE_LEVEL = 0.95  # Probability of not stocking out during a lead time
+DEFAULT_REVIEW_PERIOD_DAYS = 7  # Days between ordering decisions (the plan is refreshed nightly)
+DEMAND_STD_WINDOW_DAYS = 30  # Days of sales used for the demand variability (matches the velocity window)
+INPUT_COLUMNS = ['quantity_in_stock', 'avg_daily_sales', 'demand_std', 'expiry_date',
+                 'shelf_life_days', 'lead_time_days', 'service_level', 'review_period_days']
+LEVEL_COLUMNS = ['safety_stock', 'reorder_point', 'order_up_to', 'expiry_cap']  # Functions of INPUT_COLUMNS only
+PLAN_COLUMNS = ['safety_stock', 'reorder_point', 'usable_stock', 'order_up_to', 'expiry_cap',
+                'order_quantity', 'reorder_now', 'capped_by_expiry']
+
+def plan_path(data_dir="data"):
+    """Location of the persisted plan in the cache directory of data_dir."""
+    return os.path.join(data_dir, CACHE_DIR_NAME, f"replenishment_plan{FRAME_EXT}")
+
+def load_replenishment_plan(path=None):
+    """Loads the persisted plan (None if there is none yet)."""
+    path = plan_path() if path is None else path
+    if not os.path.exists(path):
+        return None
+    try:
+        return read_frame(path)
+    except Exception as e:
+        print(f"Error reading replenishment plan at {path}: {e}. Recomputing it.")
+        return None
+
+def save_replenishment_plan(plan, path=None):
+    """Persists the plan next to the other cached data."""
+    path = plan_path() if path is None else path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_frame(plan, path)
+
+def replenishment_inputs(processed_inventory, suppliers_df, cube=None, as_of=None,
+                         service_level=DEFAULT_SERVICE_LEVEL, review_period_days=DEFAULT_REVIEW_PERIOD_DAYS):
+    """
+    Per-product inputs of the plan, indexed by product_id. processed_inventory is the output
+    of preprocess_for_waste_prediction (velocity and days_to_expiry). The daily demand
+    standard deviation comes from the sales cube when given, else demand is taken as
+    Poisson (variance = velocity). Products whose supplier is not listed get no lead time.
+    """
+    product_ids = processed_inventory['product_id'].astype(str)
+    velocity = processed_inventory['avg_daily_sales_last_30d'].to_numpy(dtype=np.float64)
+    if cube is not None:
+        as_of = datetime.now() if as_of is None else as_of
+        demand_std = cube_daily_sales_std(cube, DEMAND_STD_WINDOW_DAYS, as_of, product_ids)
+    else:
+        demand_std = np.sqrt(velocity)
+    lead_times = suppliers_df.drop_duplicates('supplier_id').set_index('supplier_id')['delivery_time_days'].astype(float)
+    supplier_ids = processed_inventory['supplier_id'].astype(str)
+
+    return pd.DataFrame({
+        'supplier_id': supplier_ids.to_numpy(),
+        'quantity_in_stock': processed_inventory['quantity_in_stock'].to_numpy(dtype=np.float64),
+        'avg_daily_sales': velocity,
+        'demand_std': demand_std.astype(np.float64),
+        'expiry_date': processed_inventory['expiry_date'].to_numpy(dtype='datetime64[ns]'),
+        'days_to_expiry': processed_inventory['days_to_expiry'].to_numpy(dtype=np.float64),
+        'shelf_life_days': (processed_inventory['expiry_date'] - processed_inventory['purchase_date']).dt.days.to_numpy(dtype=np.float64),
+        'lead_time_days': supplier_ids.map(lead_times).to_numpy(dtype=np.float64),
+        'service_level': float(service_level),
+        'review_period_days': float(review_period_days)
+    }, index=pd.Index(product_ids.to_numpy(), name='product_id'))
+
+def order_levels(inputs):
+    """
+    Safety stock, reorder point, order-up-to level and expiry cap (LEVEL_COLUMNS) for every
+    row of inputs (as built by replenishment_inputs), as a dict of arrays.
+    """
+    velocity = inputs['avg_daily_sales'].to_numpy()
+    lead_time = inputs['lead_time_days'].to_numpy()
+    service_levels = inputs['service_level'].to_numpy()
+    unique_levels, level_codes = np.unique(service_levels, return_inverse=True)
+    z = np.array([NormalDist().inv_cdf(level) for level in unique_levels])[level_codes]
+
+    lead_time_std = lead_time * LEAD_TIME_CV
+    safety_stock = np.ceil(z * np.sqrt(lead_time * inputs['demand_std'].to_numpy() ** 2 + (velocity * lead_time_std) ** 2))
+    reorder_point = np.ceil(velocity * lead_time) + safety_stock
+    return {
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'order_up_to': reorder_point + np.ceil(velocity * inputs['review_period_days'].to_numpy()),
+        'expiry_cap': np.floor(velocity * np.nan_to_num(inputs['shelf_life_days'].to_numpy(), nan=np.inf))
+    }
+
+def _plan_orders(inputs, levels):
+    """inputs with the PLAN_COLUMNS: levels plus today's usable stock and order decision."""
+    velocity = inputs['avg_daily_sales'].to_numpy()
+    stock = inputs['quantity_in_stock'].to_numpy()
+
+    # Units of current stock expected to sell before they expire (undated stock never expires)
+    days_to_expiry = np.nan_to_num(inputs['days_to_expiry'].to_numpy(), nan=np.inf)
+    usable_stock = np.minimum(stock, np.floor(velocity * np.clip(days_to_expiry, 0, None)))
+    usable_stock = np.nan_to_num(usable_stock, nan=stock)  # 0 x inf
+    reorder_now = usable_stock <= levels['reorder_point']
+
+    uncapped = np.where(reorder_now, np.maximum(levels['order_up_to'] - usable_stock, 0), 0)
+    order_quantity = np.minimum(uncapped, levels['expiry_cap'])
+    order_quantity = np.nan_to_num(order_quantity, nan=0.0, posinf=0.0)
+
+    plan = inputs.copy()
+    plan['safety_stock'] = levels['safety_stock']
+    plan['reorder_point'] = levels['reorder_point']
+    plan['usable_stock'] = usable_stock
+    plan['order_up_to'] = levels['order_up_to']
+    plan['expiry_cap'] = levels['expiry_cap']
+    plan['order_quantity'] = order_quantity
+    plan['reorder_now'] = reorder_now & (order_quantity > 0)
+    plan['capped_by_expiry'] = levels['expiry_cap'] < uncapped
+    return plan
+
+def compute_replenishment(inputs):
+    """
+    Reorder point, safety stock and expiry-capped order quantity for every row of inputs
+    (as built by replenishment_inputs) in one vectorized pass. Returns inputs with the
+    PLAN_COLUMNS added; quantities are in whole units.
+    """
+    return _plan_orders(inputs, order_levels(inputs))
+
+def _changed_rows(previous, inputs, rows):
+    """
+    Products that are new (rows < 0) or whose INPUT_COLUMNS differ from previous (missing
+    values equal each other); a change of supplier shows up as a change of lead time.
+    """
+    changed = rows < 0
+    known = np.flatnonzero(~changed)
+    for column in INPUT_COLUMNS:
+        old = previous[column].to_numpy()[rows[known]]
+        new = inputs[column].to_numpy()[known]
+        same = (old == new) | (pd.isna(old) & pd.isna(new))
+        changed[known[~same]] = True
+    return changed
+
+def refresh_replenishment_plan(processed_inventory, suppliers_df, cube=None, as_of=None, previous_plan=None,
+                               path=None, persist=True, **input_kwargs):
+    """
+    Brings the replenishment plan up to date with processed_inventory. Order levels are
+    recomputed only for products whose inputs changed since previous_plan (default: the
+    persisted plan) - velocity, stock, expiry date, lead time, settings - and kept for the
+    rest; usable stock and order quantities are re-evaluated for every product, as they
+    move with days to expiry. Products no longer in the inventory are dropped.
+    input_kwargs go to replenishment_inputs.
+    """
+    if processed_inventory is None or suppliers_df is None:
+        return None
+    inputs = replenishment_inputs(processed_inventory, suppliers_df, cube, as_of, **input_kwargs)
+    if previous_plan is None:
+        previous_plan = load_replenishment_plan(path)
+
+    reusable = (
+        previous_plan is not None and not previous_plan.empty and previous_plan.index.is_unique
+        and set(INPUT_COLUMNS + LEVEL_COLUMNS).issubset(previous_plan.columns)
+    )
+    if not reusable:
+        plan = compute_replenishment(inputs)
+    else:
+        rows = previous_plan.index.get_indexer(inputs.index)
+        changed = _changed_rows(previous_plan, inputs, rows)
+        # Unchanged products keep their levels; changed ones are recomputed in one call
+        updated = order_levels(inputs[changed])
+        positions = np.flatnonzero(changed)
+        levels = {}
+        for column in LEVEL_COLUMNS:
+            values = previous_plan[column].to_numpy(dtype=np.float64)[np.maximum(rows, 0)]
+            values[positions] = updated[column]
+            levels[column] = values
+        plan = _plan_orders(inputs, levels)
+
+    if persist:
+        save_replenishment_plan(plan, path)
+    return plan
+
+def products_to_reorder(plan):
+    """Products due for an order, largest orders first."""
+    if plan is None or plan.empty:
+        return pd.DataFrame()
+    return plan[plan['reorder_now']].sort_values('order_quantity', ascending=False)
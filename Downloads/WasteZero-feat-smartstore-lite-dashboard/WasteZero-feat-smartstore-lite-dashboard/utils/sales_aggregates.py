@@ -0,0 +1,256 @@
+import io
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.data_cache import CACHE_DIR_NAME, FRAME_EXT, read_frame, write_frame
+from utils.data_loader import TIMESTAMP_FORMAT, loaded_file_size
+from utils.sales_stream import VELOCITY_WINDOW_DAYS
+from utils.schedule_optimization import HOURS_PER_DAY, WEEKDAY_NAMES
+
+# Incremental sales aggregation store.
+# sales.csv only grows by appends, so the store remembers the byte offset and the
+# latest timestamp (watermark) it has folded in, and a refresh parses only the bytes
+# after that offset. The aggregates kept are:
+# - daily: quantity_sold / transaction_count per (date, product_id)
+# - hourly: transaction_count per (date, hour)
+
+DEFAULT_BLOCK_BYTES = 64 << 20
+_TAIL_CHECK_BYTES = 4096
+
+def _store_paths(sales_path):
+    directory, filename = os.path.split(os.path.abspath(sales_path))
+    stem = os.path.splitext(filename)[0]
+    cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    return {
+        'dir': cache_dir,
+        'daily': os.path.join(cache_dir, f"{stem}_daily{FRAME_EXT}"),
+        'hourly': os.path.join(cache_dir, f"{stem}_hourly{FRAME_EXT}"),
+        'state': os.path.join(cache_dir, f"{stem}_aggregates.state.json")
+    }
+
+def _empty_store():
+    return {
+        'daily': pd.DataFrame({
+            'date': pd.Series(dtype='datetime64[ns]'),
+            'product_id': pd.Series(dtype='object'),
+            'quantity_sold': pd.Series(dtype='int64'),
+            'transaction_count': pd.Series(dtype='int64')
+        }),
+        'hourly': pd.DataFrame({
+            'date': pd.Series(dtype='datetime64[ns]'),
+            'hour': pd.Series(dtype='int64'),
+            'transaction_count': pd.Series(dtype='int64')
+        }),
+        'state': {'byte_offset': 0, 'first_timestamp': None, 'watermark': None,
+                  'columns': None, 'tail_digest': None}
+    }
+
+def load_sales_store(sales_path="data/sales.csv"):
+    """Loads the persisted aggregation store for sales_path (empty if none exists)."""
+    paths = _store_paths(sales_path)
+    try:
+        with open(paths['state']) as f:
+            state = json.load(f)
+        return {'daily': read_frame(paths['daily']), 'hourly': read_frame(paths['hourly']), 'state': state}
+    except (FileNotFoundError, ValueError, OSError):
+        return _empty_store()
+
+def save_sales_store(store, sales_path="data/sales.csv"):
+    """Persists the aggregation store next to the other cached data."""
+    paths = _store_paths(sales_path)
+    os.makedirs(paths['dir'], exist_ok=True)
+    write_frame(store['daily'], paths['daily'])
+    write_frame(store['hourly'], paths['hourly'])
+    tmp_path = paths['state'] + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(store['state'], f)
+    os.replace(tmp_path, paths['state'])
+
+def _tail_digest(f, offset):
+    """Bytes just before offset, used to detect a rewritten (not appended) file."""
+    start = max(0, offset - _TAIL_CHECK_BYTES)
+    f.seek(start)
+    return f.read(offset - start).hex()
+
+def _iter_line_blocks(f, start, end, block_bytes):
+    """Yields byte blocks of complete lines between start and end."""
+    f.seek(start)
+    remaining = end - start
+    carry = b''
+    while remaining > 0:
+        data = f.read(min(block_bytes, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        data = carry + data
+        cut = data.rfind(b'\n') + 1
+        carry = data[cut:]
+        if cut:
+            yield data[:cut]
+
+def _aggregate_rows(product_ids, timestamps, quantity_sold):
+    dates = timestamps.dt.normalize().rename('date')
+    rows = pd.DataFrame({'product_id': product_ids, 'quantity_sold': quantity_sold})
+    daily = rows.groupby([dates, rows['product_id']])['quantity_sold'].agg(
+        quantity_sold='sum', transaction_count='count'
+    ).reset_index()
+    hourly = rows.groupby([dates, timestamps.dt.hour.rename('hour')]).size().rename(
+        'transaction_count'
+    ).reset_index()
+    return daily, hourly, timestamps.min(), timestamps.max()
+
+def _aggregate_block(block, columns):
+    rows = pd.read_csv(io.BytesIO(block), header=None, names=columns,
+                       dtype={'product_id': 'object', 'timestamp': 'object', 'quantity_sold': 'int64'})
+    timestamps = pd.to_datetime(rows['timestamp'], format=TIMESTAMP_FORMAT)
+    return _aggregate_rows(rows['product_id'], timestamps, rows['quantity_sold'])
+
+def _aggregate_frame(sales_df):
+    """Aggregates an already parsed sales frame (e.g. from load_sales) like _aggregate_block."""
+    return _aggregate_rows(sales_df['product_id'].astype(str).to_numpy(dtype=object),
+                           sales_df['timestamp'].reset_index(drop=True),
+                           sales_df['quantity_sold'].to_numpy(dtype=np.int64))
+
+def _merge_counts(existing, new, keys):
+    """Adds new counts into existing; only rows from the earliest new date onward are regrouped."""
+    if new.empty:
+        return existing
+    boundary = new['date'].min()
+    untouched = existing[existing['date'] < boundary]
+    overlap = pd.concat([existing[existing['date'] >= boundary], new], ignore_index=True)
+    merged = overlap.groupby(keys, as_index=False).sum()
+    return pd.concat([untouched, merged], ignore_index=True)
+
+def _frame_covers_file(sales_df, sales_path, f, end):
+    """Whether sales_df (loaded by load_sales) holds every line of the open file f of size end."""
+    if sales_df is None or sales_df.empty or end == 0:
+        return False
+    f.seek(end - 1)
+    complete = f.read(1) == b'\n'
+    f.seek(0)
+    return complete and loaded_file_size(sales_path, sales_df) == end
+
+def refresh_sales_store(sales_path="data/sales.csv", block_bytes=DEFAULT_BLOCK_BYTES, persist=True, sales_df=None):
+    """
+    Folds rows appended to sales_path since the last refresh into the aggregation store.
+    Only the new bytes are parsed, so the cost scales with the appended rows. If the file
+    shrank or the bytes before the stored offset changed, the store is rebuilt from scratch.
+    A trailing line without a newline is left for the next refresh.
+    sales_df, the frame load_sales returned for sales_path, seeds a store built from
+    scratch instead of parsing the CSV a second time; it is used only if the file has
+    not grown since (same size as when it was loaded) and ends with a complete line.
+    """
+    store = load_sales_store(sales_path)
+    state = store['state']
+
+    with open(sales_path, 'rb') as f:
+        header_line = f.readline()
+        columns = header_line.decode().strip().split(',')
+        end = os.fstat(f.fileno()).st_size
+
+        offset = state.get('byte_offset') or 0
+        rewritten = (
+            offset > end
+            or state.get('columns') != columns
+            or (offset and _tail_digest(f, offset) != state.get('tail_digest'))
+        )
+        if rewritten or offset < len(header_line):
+            store = _empty_store()
+            state = store['state']
+            offset = len(header_line)
+
+        new_daily, new_hourly = [], []
+        first_timestamp = pd.Timestamp(state['first_timestamp']) if state.get('first_timestamp') else None
+        watermark = pd.Timestamp(state['watermark']) if state.get('watermark') else None
+        if offset == len(header_line) and _frame_covers_file(sales_df, sales_path, f, end):
+            daily, hourly, first_timestamp, watermark = _aggregate_frame(sales_df)
+            new_daily.append(daily)
+            new_hourly.append(hourly)
+            offset = end
+        for block in _iter_line_blocks(f, offset, end, block_bytes):
+            daily, hourly, block_min, block_max = _aggregate_block(block, columns)
+            new_daily.append(daily)
+            new_hourly.append(hourly)
+            offset += len(block)
+            first_timestamp = block_min if first_timestamp is None else min(first_timestamp, block_min)
+            watermark = block_max if watermark is None else max(watermark, block_max)
+
+        if new_daily:
+            store['daily'] = _merge_counts(store['daily'], pd.concat(new_daily, ignore_index=True),
+                                           ['date', 'product_id'])
+            store['hourly'] = _merge_counts(store['hourly'], pd.concat(new_hourly, ignore_index=True),
+                                            ['date', 'hour'])
+
+        store['state'] = {
+            'byte_offset': offset,
+            'first_timestamp': first_timestamp.strftime(TIMESTAMP_FORMAT) if first_timestamp is not None else None,
+            'watermark': watermark.strftime(TIMESTAMP_FORMAT) if watermark is not None else None,
+            'columns': columns,
+            'tail_digest': _tail_digest(f, offset)
+        }
+
+    if persist:
+        save_sales_store(store, sales_path)
+    return store
+
+def store_footfall_by_hour(store):
+    """Transactions per hour of day (0-23), as returned by infer_footfall_from_sales."""
+    hourly = store['hourly']
+    counts = np.bincount(hourly['hour'].to_numpy(dtype=np.int64),
+                         weights=hourly['transaction_count'].to_numpy(dtype=np.float64), minlength=24)
+    return pd.Series(counts.astype(np.int64), index=range(24))
+
+def store_footfall_by_weekday_hour(store):
+    """Transactions per weekday (rows, Monday first) and hour (columns), as infer_footfall_matrix."""
+    hourly = store['hourly']
+    cells = hourly['date'].dt.weekday.to_numpy(dtype=np.int64) * HOURS_PER_DAY + hourly['hour'].to_numpy(dtype=np.int64)
+    counts = np.bincount(cells, weights=hourly['transaction_count'].to_numpy(dtype=np.float64),
+                         minlength=7 * HOURS_PER_DAY)
+    return pd.DataFrame(counts.astype(np.int64).reshape(7, HOURS_PER_DAY),
+                        index=pd.Index(WEEKDAY_NAMES, name='weekday'), columns=range(HOURS_PER_DAY))
+
+def store_footfall_by_date_hour(store):
+    """Transactions per date (rows, every day from the first to the last) and hour (columns)."""
+    hourly = store['hourly']
+    if hourly.empty:
+        return pd.DataFrame(columns=range(HOURS_PER_DAY), dtype=np.int64)
+    dates = hourly['date'].dt.normalize()
+    first_date = dates.min()
+    num_days = (dates.max() - first_date).days + 1
+    cells = (dates - first_date).dt.days.to_numpy(dtype=np.int64) * HOURS_PER_DAY + hourly['hour'].to_numpy(dtype=np.int64)
+    counts = np.bincount(cells, weights=hourly['transaction_count'].to_numpy(dtype=np.float64),
+                         minlength=num_days * HOURS_PER_DAY)
+    return pd.DataFrame(counts.astype(np.int64).reshape(num_days, HOURS_PER_DAY),
+                        index=pd.date_range(first_date, periods=num_days, freq='D', name='date'),
+                        columns=range(HOURS_PER_DAY))
+
+def store_to_aggregates(store, current_date=None, velocity_window_days=VELOCITY_WINDOW_DAYS):
+    """
+    Converts the store into the aggregates dict produced by utils.sales_stream, so the
+    velocity and seasonal helpers there can be reused. The velocity window is counted
+    in whole calendar days (the last velocity_window_days days up to current_date).
+    """
+    if current_date is None:
+        current_date = datetime.now()
+    daily = store['daily']
+    window_start = pd.Timestamp(current_date).normalize() - pd.Timedelta(days=velocity_window_days - 1)
+
+    recent = daily[daily['date'] >= window_start]
+    recent_sales = recent.groupby('product_id')['quantity_sold'].sum()
+
+    month_sales = daily.groupby(['product_id', daily['date'].dt.month.rename('month')])[
+        ['quantity_sold', 'transaction_count']
+    ].sum()
+
+    first_timestamp = store['state'].get('first_timestamp')
+    watermark = store['state'].get('watermark')
+    return {
+        'recent_sales': recent_sales.rename('quantity_sold'),
+        'footfall_by_hour': store_footfall_by_hour(store),
+        'footfall_by_weekday_hour': store_footfall_by_weekday_hour(store),
+        'product_month_sales': month_sales.astype('int64'),
+        'first_timestamp': pd.Timestamp(first_timestamp) if first_timestamp else None,
+        'last_timestamp': pd.Timestamp(watermark) if watermark else None
+    }
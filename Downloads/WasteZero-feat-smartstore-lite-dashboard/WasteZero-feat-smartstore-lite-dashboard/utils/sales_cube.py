@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Product x day sales cube.
+# Quantities are laid out as a dense (product, day) array and stored as prefix sums along
+# the day axis, with a leading zero column:
+#     cumulative[p, d] = units of product p sold on days [0, d)
+# so units sold over any day range [a, b) is cumulative[p, b] - cumulative[p, a], for all
+# products at once. One extra all-zero row answers lookups for products with no sales.
+
+DEFAULT_VELOCITY_WINDOWS = (7, 14, 30, 90)
+
+def daily_sales_from_sales(sales_df):
+    """Aggregates raw sales rows to quantity_sold per (date, product_id)."""
+    dates = sales_df['timestamp'].dt.normalize().rename('date')
+    return sales_df.groupby([dates, sales_df['product_id']], observed=True)['quantity_sold'].sum().reset_index()
+
+def build_sales_cube(daily_sales):
+    """
+    Builds the cube from a (date, product_id, quantity_sold) frame, such as the daily
+    table of utils.sales_aggregates or the output of daily_sales_from_sales.
+    """
+    product_ids = pd.Index(daily_sales['product_id'].astype(str).unique())
+    dates = pd.to_datetime(daily_sales['date'])
+    if daily_sales.empty:
+        start_date = pd.Timestamp(datetime.now()).normalize()
+        num_days = 0
+    else:
+        start_date = dates.min().normalize()
+        num_days = (dates.max().normalize() - start_date).days + 1
+
+    rows = product_ids.get_indexer(daily_sales['product_id'].astype(str))
+    cols = (dates - start_date).dt.days.to_numpy()
+    quantities = np.zeros((len(product_ids) + 1, num_days), dtype=np.int64)
+    np.add.at(quantities, (rows, cols), daily_sales['quantity_sold'].to_numpy(dtype=np.int64))
+
+    total = quantities.sum()
+    dtype = np.int32 if total <= np.iinfo(np.int32).max else np.int64
+    cumulative = np.zeros((len(product_ids) + 1, num_days + 1), dtype=dtype)
+    np.cumsum(quantities, axis=1, out=cumulative[:, 1:])
+
+    return {
+        'product_ids': product_ids,
+        'start_date': start_date,
+        'num_days': num_days,
+        'cumulative': cumulative
+    }
+
+def cube_day_index(cube, dates):
+    """Day offsets of dates from the start of the cube (may fall outside the cube)."""
+    dates = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(dates))).normalize()
+    return np.asarray((dates - cube['start_date']).days, dtype=np.int64)
+
+def cube_product_rows(cube, product_ids=None):
+    """Cube rows for product_ids; products without sales map to the all-zero row."""
+    if product_ids is None:
+        return np.arange(len(cube['product_ids']))
+    rows = cube['product_ids'].get_indexer(pd.Index(product_ids).astype(str))
+    rows[rows < 0] = len(cube['product_ids'])
+    return rows
+
+def cube_sales_between(cube, start_days, end_days, product_ids=None):
+    """
+    Units sold per product over day offsets [start_days, end_days), clipped to the cube.
+    start_days/end_days broadcast against the product axis, so they can be scalars,
+    per-product arrays, or (n, 1) columns to query n ranges at once.
+    """
+    rows = cube_product_rows(cube, product_ids)
+    starts = np.clip(start_days, 0, cube['num_days'])
+    ends = np.clip(end_days, 0, cube['num_days'])
+    starts, ends = np.broadcast_arrays(starts, ends)
+    cumulative = cube['cumulative']
+    return cumulative[rows, ends] - cumulative[rows, np.minimum(starts, ends)]
+
+def _is_single_date(as_of):
+    return np.ndim(as_of) == 0 and not isinstance(as_of, (pd.DatetimeIndex, pd.Series))
+
+def cube_window_sales(cube, window_days, as_of=None, product_ids=None):
+    """
+    Units sold per product in the window_days calendar days ending on as_of (inclusive).
+    A single as_of gives a (products,) array; a sequence of dates gives (dates, products).
+    """
+    if as_of is None:
+        as_of = datetime.now()
+    scalar = _is_single_date(as_of)
+    ends = cube_day_index(cube, as_of) + 1
+    window = ends[:, None] - window_days, ends[:, None]
+    sales = cube_sales_between(cube, window[0], window[1], product_ids)
+    return sales[0] if scalar else sales
+
+def cube_velocity(cube, window_days=30, as_of=None, product_ids=None):
+    """
+    Average daily sales per product over the window ending on as_of, as a Series indexed
+    by product. as_of must be a single date; use cube_window_sales for several dates.
+    """
+    if as_of is not None and not _is_single_date(as_of):
+        raise ValueError("cube_velocity takes a single as_of date; use cube_window_sales for several")
+    rows_ids = cube['product_ids'] if product_ids is None else pd.Index(product_ids).astype(str)
+    sales = cube_window_sales(cube, window_days, as_of, product_ids)
+    return pd.Series(sales / window_days, index=rows_ids, name=f'avg_daily_sales_last_{window_days}d')
+
+def cube_daily_sales_std(cube, window_days=30, as_of=None, product_ids=None):
+    """
+    Standard deviation of daily units sold per product over the window_days calendar days
+    ending on as_of (inclusive); days outside the cube count as zero sales, as in cube_velocity.
+    """
+    if as_of is None:
+        as_of = datetime.now()
+    end = int(cube_day_index(cube, as_of)[0]) + 1
+    days = np.clip(np.arange(end - window_days, end + 1), 0, cube['num_days'])
+    daily = np.diff(cube['cumulative'][cube_product_rows(cube, product_ids)][:, days], axis=1)
+    return daily.std(axis=1)
+
+def cube_velocity_features(cube, windows=DEFAULT_VELOCITY_WINDOWS, as_of=None, product_ids=None):
+    """Velocity for several window lengths as one frame (one column per window), for a single as_of."""
+    return pd.concat([cube_velocity(cube, w, as_of, product_ids) for w in windows], axis=1)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.data_loader import SALES_DTYPES, TIMESTAMP_FORMAT
+from utils.seasonal_analytics import analyze_seasonal_trends, build_seasonal_context
+from utils.schedule_optimization import HOURS_PER_DAY, WEEKDAY_NAMES, footfall_counts
+
+DEFAULT_CHUNK_ROWS = 500_000
+VELOCITY_WINDOW_DAYS = 30
+
+# Streamed chunks keep product ids as plain strings: per-chunk categoricals would
+# each carry different categories and cannot be combined cheaply.
+_STREAM_DTYPES = {**SALES_DTYPES, 'product_id': 'object'}
+
+def iter_sales_chunks(sales_path="data/sales.csv", chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yields sales.csv in bounded chunks with parsed timestamps."""
+    for chunk in pd.read_csv(sales_path, dtype=_STREAM_DTYPES, chunksize=chunk_rows):
+        chunk['timestamp'] = pd.to_datetime(chunk['timestamp'], format=TIMESTAMP_FORMAT)
+        yield chunk
+
+def _add_counts(running, chunk_counts):
+    if running is None:
+        return chunk_counts
+    return running.add(chunk_counts, fill_value=0)
+
+def stream_sales_aggregates(sales_path="data/sales.csv", chunk_rows=DEFAULT_CHUNK_ROWS,
+                            current_date=None, velocity_window_days=VELOCITY_WINDOW_DAYS):
+    """
+    Reduces sales.csv chunk by chunk, never holding the raw table in memory.
+    Returns a dict with:
+    - 'recent_sales': quantity sold per product within the velocity window
+    - 'footfall_by_hour': transactions per hour of day (0-23)
+    - 'footfall_by_weekday_hour': transactions per weekday (rows) and hour (columns)
+    - 'product_month_sales': quantity and transaction count per (product_id, month)
+    - 'first_timestamp' / 'last_timestamp': span of the history
+    Memory is bounded by the chunk size plus the catalog size.
+    """
+    if current_date is None:
+        current_date = datetime.now()
+    recent_cutoff = pd.Timestamp(current_date) - pd.Timedelta(days=velocity_window_days)
+
+    recent_sales = None
+    product_month_sales = None
+    hourly_counts = np.zeros(24, dtype=np.int64)
+    weekday_hour_counts = np.zeros((7, HOURS_PER_DAY), dtype=np.int64)
+    first_timestamp = None
+    last_timestamp = None
+
+    for chunk in iter_sales_chunks(sales_path, chunk_rows):
+        if chunk.empty:
+            continue
+        timestamps = chunk['timestamp']
+
+        recent = chunk[timestamps >= recent_cutoff]
+        recent_sales = _add_counts(recent_sales, recent.groupby('product_id')['quantity_sold'].sum())
+
+        hourly_counts += np.bincount(timestamps.dt.hour.to_numpy(), minlength=24)
+        weekday_hour_counts += footfall_counts(timestamps.to_numpy())[0]
+
+        month_totals = chunk.groupby(['product_id', timestamps.dt.month.rename('month')])['quantity_sold'].agg(
+            quantity_sold='sum', transaction_count='count'
+        )
+        product_month_sales = _add_counts(product_month_sales, month_totals)
+
+        chunk_first, chunk_last = timestamps.min(), timestamps.max()
+        first_timestamp = chunk_first if first_timestamp is None else min(first_timestamp, chunk_first)
+        last_timestamp = chunk_last if last_timestamp is None else max(last_timestamp, chunk_last)
+
+    if recent_sales is None:
+        recent_sales = pd.Series(dtype='int64')
+    if product_month_sales is None:
+        product_month_sales = pd.DataFrame(
+            {'quantity_sold': [], 'transaction_count': []},
+            index=pd.MultiIndex.from_arrays([[], []], names=['product_id', 'month'])
+        )
+
+    return {
+        'recent_sales': recent_sales.rename('quantity_sold').rename_axis('product_id'),
+        'footfall_by_hour': pd.Series(hourly_counts, index=range(24)),
+        'footfall_by_weekday_hour': pd.DataFrame(weekday_hour_counts, index=pd.Index(WEEKDAY_NAMES, name='weekday'),
+                                                 columns=range(HOURS_PER_DAY)),
+        'product_month_sales': product_month_sales.astype('int64'),
+        'first_timestamp': first_timestamp,
+        'last_timestamp': last_timestamp
+    }
+
+def velocity_from_aggregates(aggregates, velocity_window_days=VELOCITY_WINDOW_DAYS):
+    """Average daily sales per product over the velocity window (for preprocess_for_waste_prediction)."""
+    return (aggregates['recent_sales'] / velocity_window_days).rename('avg_daily_sales_last_30d')
+
+def seasonal_trends_from_aggregates(aggregates, inventory_df):
+    """
+    Builds the same tables as analyze_seasonal_trends from streamed aggregates.
+    Products missing from the inventory count towards monthly/seasonal totals but not
+    towards category_seasonal, as with the left merge in analyze_seasonal_trends.
+    """
+    if inventory_df is None:
+        return None
+    return analyze_seasonal_trends(None, inventory_df, build_seasonal_context(inventory_df, aggregates=aggregates))
@@ -1,13 +1,34 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, time
+from utils.data_loader import load_sales
+
+HOURS_PER_DAY = 24
+MINUTES_PER_DAY = 24 * 60
+SLOT_MINUTES_OPTIONS = (15, 30, 60)  # Supported schedule resolutions
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+_EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday (Monday = 0)
+
+# Compact schedule representation: one int8 setting code per slot (hour by default)
+SETTING_MINIMAL, SETTING_REDUCED, SETTING_FULL = 0, 1, 2
+MINIMAL_POWER_SHARE = 0.1 # Share of base consumption kept for essential systems when 'Minimal/Off'
+SWITCHING_PENALTY_HOURS = 0.5 # Cost of one setting change, in hours of full-power consumption
+
+def setting_power_shares(off_peak_reduction_pct=50):
+    """
+    Share of base consumption drawn per setting code, indexed by code. The extra last
+    entry (reached with code -1) is for settings the estimate does not recognise.
+    """
+    shares = np.zeros(SETTING_FULL + 2)
+    shares[SETTING_MINIMAL] = MINIMAL_POWER_SHARE
+    shares[SETTING_REDUCED] = 1 - (off_peak_reduction_pct / 100.0)
+    shares[SETTING_FULL] = 1.0
+    return shares
 
 def load_sales_data(sales_path="data/sales.csv"):
-    """Loads sales data."""
+    """Loads the shared sales frame (parsed once per process, read-only)."""
     try:
-        sales_df = pd.read_csv(sales_path)
-        sales_df['timestamp'] = pd.to_datetime(sales_df['timestamp'])
-        return sales_df
+        return load_sales(sales_path)
     except FileNotFoundError as e:
         print(f"Error: {e}. Make sure sales data file is generated and path is correct.")
         return None
@@ -26,61 +47,263 @@ def infer_footfall_from_sales(sales_df):
 
     return footfall_by_hour
 
+def slots_per_day(slot_minutes=60):
+    """Number of schedule slots in a day at the given resolution."""
+    if slot_minutes not in SLOT_MINUTES_OPTIONS:
+        raise ValueError(f"Unsupported slot length: {slot_minutes} minutes")
+    return MINUTES_PER_DAY // slot_minutes
+
+def footfall_counts(timestamps, by='weekday', store_codes=None, num_stores=1, first_day=None, num_days=None,
+                    slot_minutes=60):
+    """
+    Transactions per (store, row, slot of day) as an int64 array of shape (num_stores, rows, slots),
+    where rows are weekdays (7, Monday first) for by='weekday' or calendar days for by='date',
+    and slots are slot_minutes long (24 hourly slots by default).
+    Every timestamp is encoded to one flat cell index and counted with a single np.bincount,
+    so the cost is one linear pass. For by='date', first_day/num_days (days since the epoch)
+    fix the date range, which lets counts from separate chunks be added together.
+    """
+    num_slots = slots_per_day(slot_minutes)
+    slots = np.asarray(timestamps).astype('datetime64[m]').astype(np.int64) // slot_minutes
+    days, slot_of_day = np.divmod(slots, num_slots)
+
+    if by == 'weekday':
+        rows = (days + _EPOCH_WEEKDAY) % 7
+        num_rows = 7
+    elif by == 'date':
+        if first_day is None:
+            first_day = int(days.min()) if len(days) else 0
+        if num_days is None:
+            num_days = int(days.max()) - first_day + 1 if len(days) else 0
+        rows = days - first_day
+        num_rows = num_days
+    else:
+        raise ValueError(f"Unknown footfall grouping: {by}")
+
+    cells = rows * num_slots + slot_of_day
+    if store_codes is not None:
+        cells += np.asarray(store_codes, dtype=np.int64) * (num_rows * num_slots)
+    counts = np.bincount(cells, minlength=num_stores * num_rows * num_slots)
+    return counts.reshape(num_stores, num_rows, num_slots)
+
+def infer_footfall_matrix(sales_df, by='weekday', store_column=None, slot_minutes=60):
+    """
+    Infers footfall per weekday (or per date) and slot of day from sales timestamps.
+    Returns a frame with one row per weekday name (or date) and slot columns numbered from 0
+    (the hours 0-23 at the default 60-minute resolution); with store_column the index is
+    (store, weekday/date).
+    """
+    num_slots = slots_per_day(slot_minutes)
+    if sales_df is None or sales_df.empty:
+        return pd.DataFrame(columns=range(num_slots), dtype=int)
+
+    timestamps = sales_df['timestamp'].to_numpy()
+    first_day = int(timestamps.min().astype('datetime64[D]').astype(np.int64))
+    store_codes, stores = None, [None]
+    if store_column is not None:
+        store_codes, stores = pd.factorize(sales_df[store_column], sort=True)
+
+    counts = footfall_counts(timestamps, by, store_codes, len(stores), first_day=first_day,
+                             slot_minutes=slot_minutes)
+    if by == 'weekday':
+        rows = pd.Index(WEEKDAY_NAMES, name='weekday')
+    else:
+        rows = pd.date_range(np.datetime64(first_day, 'D'), periods=counts.shape[1], freq='D', name='date')
+
+    if store_column is None:
+        return pd.DataFrame(counts[0], index=rows, columns=range(num_slots))
+    index = pd.MultiIndex.from_product([stores, rows], names=[store_column, rows.name])
+    return pd.DataFrame(counts.reshape(-1, num_slots), index=index, columns=range(num_slots))
+
+def smooth_footfall(footfall, window_slots):
+    """
+    Centered moving average of footfall along the last (slot) axis over window_slots slots,
+    averaging only the slots inside the day at the edges. Each window sum is a difference
+    of two cumulative sums, so the cost is linear in the number of slots for any window.
+    """
+    footfall = np.asarray(footfall, dtype=np.float64)
+    if window_slots <= 1:
+        return footfall
+    num_slots = footfall.shape[-1]
+    cumulative = np.zeros(footfall.shape[:-1] + (num_slots + 1,))
+    np.cumsum(footfall, axis=-1, out=cumulative[..., 1:])
+
+    starts = np.arange(num_slots) - window_slots // 2
+    ends = np.clip(starts + window_slots, 0, num_slots)
+    starts = np.clip(starts, 0, num_slots)
+    return (cumulative[..., ends] - cumulative[..., starts]) / (ends - starts)
+
+def _operating_slots(shape, store_open_hour, store_close_hour):
+    """Boolean mask of slots starting within opening hours, broadcast to shape."""
+    slot_start_hours = np.arange(shape[-1]) * (HOURS_PER_DAY / shape[-1])
+    operating = (
+        (slot_start_hours >= np.asarray(store_open_hour)[..., None])
+        & (slot_start_hours < np.asarray(store_close_hour)[..., None])
+    )
+    return np.broadcast_to(operating, shape)
+
+def _busy_slots(footfall, operating, peak_threshold_factor):
+    """Slots at or above peak_threshold_factor of their row's operating-hours peak."""
+    # Peak footfall within operating hours sets each row's threshold (0 if the store never opens)
+    peak = np.where(operating, footfall, 0).max(axis=-1, keepdims=True)
+    return footfall >= peak * peak_threshold_factor
+
+def schedule_codes(footfall, store_open_hour=8, store_close_hour=22, peak_threshold_factor=0.7):
+    """
+    Setting code (SETTING_MINIMAL / SETTING_REDUCED / SETTING_FULL) per slot as an int8 array.
+    footfall has slots of the day on the last axis (24 hourly slots, or 48/96 for 30/15-minute
+    slots) and any leading axes, e.g. (stores, days, 24) for a fleet-year; each leading row is
+    thresholded against its own operating-hours peak. A slot counts as operating if it starts
+    within opening hours. store_open_hour / store_close_hour may be scalars or arrays matching
+    the leading axes (e.g. shape (stores, 1) for per-store hours). Everything is computed by
+    broadcasting.
+    """
+    footfall = np.asarray(footfall)
+    operating = _operating_slots(footfall.shape, store_open_hour, store_close_hour)
+    busy = _busy_slots(footfall, operating, peak_threshold_factor)
+
+    codes = np.full(footfall.shape, SETTING_MINIMAL, dtype=np.int8)
+    codes[operating] = np.where(busy[operating], SETTING_FULL, SETTING_REDUCED)
+    return codes
+
+def optimize_schedule_codes(footfall, store_open_hour=8, store_close_hour=22, comfort_threshold_factor=0.7,
+                            off_peak_reduction_pct=50, switching_penalty_hours=SWITCHING_PENALTY_HOURS):
+    """
+    Setting codes minimizing energy plus a penalty per setting change, found exactly by
+    dynamic programming (Viterbi) over (slot x setting). Same input shapes as schedule_codes.
+
+    Comfort constraint: while the store is open a slot is never Minimal/Off, and slots at
+    or above comfort_threshold_factor of the row's peak footfall must be Full Power.
+    Outside opening hours any setting is allowed, so a short gap may stay powered when
+    switching down and back up would cost more than it saves.
+    Energy is counted in hours of full-power consumption (setting_power_shares times the
+    slot length), and switching_penalty_hours is charged for every change between
+    consecutive slots of a day. The recursion runs over slots, each step vectorized
+    across all leading rows (stores, days).
+    """
+    footfall = np.asarray(footfall)
+    num_slots = footfall.shape[-1]
+    operating = _operating_slots(footfall.shape, store_open_hour, store_close_hour)
+    busy = operating & _busy_slots(footfall, operating, comfort_threshold_factor)
+
+    settings = np.array([SETTING_MINIMAL, SETTING_REDUCED, SETTING_FULL])
+    energy = setting_power_shares(off_peak_reduction_pct)[settings] * (HOURS_PER_DAY / num_slots)
+    switching = switching_penalty_hours * (settings[:, None] != settings[None, :])  # [previous, next]
+
+    # Slot cost per setting, with infeasible settings priced out
+    slot_cost = np.broadcast_to(energy, footfall.shape + (len(settings),)).copy()
+    slot_cost[..., SETTING_MINIMAL][operating] = np.inf
+    slot_cost[..., SETTING_REDUCED][busy] = np.inf
+
+    best = slot_cost[..., 0, :]
+    backpointers = np.empty(footfall.shape + (len(settings),), dtype=np.int8)
+    for slot in range(1, num_slots):
+        candidates = best[..., :, None] + switching  # [..., previous, next]
+        backpointers[..., slot, :] = candidates.argmin(axis=-2)
+        best = candidates.min(axis=-2) + slot_cost[..., slot, :]
+
+    codes = np.empty(footfall.shape, dtype=np.int8)
+    codes[..., -1] = best.argmin(axis=-1)
+    for slot in range(num_slots - 1, 0, -1):
+        codes[..., slot - 1] = np.take_along_axis(backpointers[..., slot, :], codes[..., slot, None].astype(np.intp), axis=-1)[..., 0]
+    return settings[codes].astype(np.int8)
+
+def render_schedule(codes, footfall, off_peak_reduction_pct=50, index=None):
+    """
+    Builds the human-readable schedule (hour, setting, reason) for setting codes of shape
+    (slots,) or (rows, slots). Sub-hourly schedules get an extra 'time' column (HH:MM of
+    the slot start). index labels the rows and becomes the leading column(s).
+    The frame's attrs record 'slot_minutes' and 'days' (rows of codes), which
+    greenscore.estimate_energy_savings uses to score it per day.
+    """
+    codes = np.asarray(codes)
+    footfall = np.asarray(footfall)
+    num_slots = codes.shape[-1]
+    settings = {
+        SETTING_MINIMAL: 'Minimal/Off',
+        SETTING_REDUCED: f'Reduced Power ({off_peak_reduction_pct}% savings mode)',
+        SETTING_FULL: 'Full Power'
+    }
+    reasons = {
+        SETTING_MINIMAL: lambda visits: 'Outside operating hours',
+        SETTING_REDUCED: lambda visits: f'Low footfall ({visits} visits)',
+        SETTING_FULL: lambda visits: f'High footfall ({visits} visits)'
+    }
+
+    flat_codes = codes.reshape(-1).tolist()
+    # Smoothed footfall is fractional; show it to one decimal
+    flat_footfall = [visits if isinstance(visits, int) else round(visits, 1) for visits in footfall.reshape(-1).tolist()]
+    slot_minutes = np.tile(np.arange(num_slots) * (MINUTES_PER_DAY // num_slots), codes.size // num_slots)
+    schedule = pd.DataFrame({'hour': slot_minutes // 60})
+    if num_slots != HOURS_PER_DAY:
+        schedule['time'] = [f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in slot_minutes.tolist()]
+    schedule['setting'] = [settings[code] for code in flat_codes]
+    schedule['reason'] = [reasons[code](visits) for code, visits in zip(flat_codes, flat_footfall)]
+    if index is not None:
+        labels = index.repeat(num_slots).to_frame(index=False)
+        schedule = pd.concat([labels, schedule], axis=1)
+    schedule.attrs.update(slot_minutes=MINUTES_PER_DAY // num_slots, days=codes.size // num_slots)
+    return schedule
+
 def recommend_lighting_ac_schedule(footfall_by_hour,
                                    store_open_hour=8,
                                    store_close_hour=22,
                                    peak_threshold_factor=0.7,
-                                   off_peak_reduction_pct=50):
+                                   off_peak_reduction_pct=50,
+                                   slot_minutes=60,
+                                   smoothing_slots=1,
+                                   optimizer='threshold',
+                                   switching_penalty_hours=SWITCHING_PENALTY_HOURS):
     """
     Recommends lighting/AC schedules based on footfall.
     - Full power during operating hours with significant footfall.
     - Reduced power during operating hours with low footfall.
     - Minimal/Off outside operating hours.
+    footfall_by_hour may also be a footfall matrix (see infer_footfall_matrix); the
+    schedule then has one block of 24 hours per row (e.g. per weekday), each thresholded
+    against its own peak, with the row labels as leading columns.
+    With slot_minutes of 30 or 15 the footfall is per slot of that length (as produced by
+    infer_footfall_matrix with the same slot_minutes), and smoothing_slots > 1 applies a
+    centered moving average (smooth_footfall) before thresholding, so single quiet or busy
+    slots do not flip the setting.
+    optimizer='dp' replaces the per-slot threshold with optimize_schedule_codes, which
+    trades energy against switching_penalty_hours per setting change (peak_threshold_factor
+    then sets the comfort constraint).
+    Settings are decided by schedule_codes / optimize_schedule_codes; use them directly
+    when only the codes are needed.
     """
-    recommendations = []
+    num_slots = slots_per_day(slot_minutes)
+    if optimizer == 'threshold':
+        decide = lambda footfall: schedule_codes(footfall, store_open_hour, store_close_hour, peak_threshold_factor)
+    elif optimizer == 'dp':
+        decide = lambda footfall: optimize_schedule_codes(footfall, store_open_hour, store_close_hour, peak_threshold_factor,
+                                                          off_peak_reduction_pct, switching_penalty_hours)
+    else:
+        raise ValueError(f"Unknown schedule optimizer: {optimizer}")
+
+    if isinstance(footfall_by_hour, pd.DataFrame):
+        footfall = footfall_by_hour.reindex(columns=range(num_slots), fill_value=0)
+        if footfall.empty:
+            return pd.DataFrame(columns=['hour', 'setting', 'reason'])
+        footfall_values = smooth_footfall(footfall.to_numpy(), smoothing_slots) if smoothing_slots > 1 else footfall.to_numpy()
+        return render_schedule(decide(footfall_values), footfall_values, off_peak_reduction_pct, index=footfall.index)
 
     if footfall_by_hour.empty:
         # Default recommendation if no footfall data
+        recommendations = []
         for hour in range(24):
             if store_open_hour <= hour < store_close_hour:
                 recommendations.append({'hour': hour, 'setting': 'Standard Operation', 'reason': 'Default operating hours'})
             else:
                 recommendations.append({'hour': hour, 'setting': 'Minimal/Off', 'reason': 'Outside operating hours'})
-        return pd.DataFrame(recommendations)
-
-    # Determine peak footfall within operating hours to set a dynamic threshold
-    operating_hours_footfall = footfall_by_hour.loc[store_open_hour:store_close_hour-1]
-    if operating_hours_footfall.empty: # Should not happen if store_open_hour < store_close_hour
-         max_footfall_in_operating_hours = 0
-    else:
-        max_footfall_in_operating_hours = operating_hours_footfall.max()
+        schedule = pd.DataFrame(recommendations)
+        schedule.attrs.update(slot_minutes=60, days=1)
+        return schedule
 
-    peak_threshold = max_footfall_in_operating_hours * peak_threshold_factor
-
-    for hour in range(24):
-        current_footfall = footfall_by_hour.get(hour, 0)
-
-        if store_open_hour <= hour < store_close_hour:
-            if current_footfall >= peak_threshold:
-                recommendations.append({
-                    'hour': hour,
-                    'setting': 'Full Power',
-                    'reason': f'High footfall ({current_footfall} visits)'
-                })
-            else:
-                recommendations.append({
-                    'hour': hour,
-                    'setting': f'Reduced Power ({off_peak_reduction_pct}% savings mode)',
-                    'reason': f'Low footfall ({current_footfall} visits)'
-                })
-        else: # Outside operating hours
-            recommendations.append({
-                'hour': hour,
-                'setting': 'Minimal/Off',
-                'reason': 'Outside operating hours'
-            })
-
-    return pd.DataFrame(recommendations)
+    footfall = footfall_by_hour.reindex(range(num_slots), fill_value=0).to_numpy()
+    if smoothing_slots > 1:
+        footfall = smooth_footfall(footfall, smoothing_slots)
+    return render_schedule(decide(footfall), footfall, off_peak_reduction_pct)
 
 if __name__ == '__main__':
     # Example Usage
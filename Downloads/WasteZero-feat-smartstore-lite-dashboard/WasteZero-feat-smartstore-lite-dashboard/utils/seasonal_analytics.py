@@ -2,43 +2,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import calendar
+from utils.data_loader import ensure_datetime, TIMESTAMP_FORMAT
 
-def analyze_seasonal_trends(sales_df, inventory_df):
-    """Analyze seasonal trends in sales and inventory"""
-    if sales_df is None or inventory_df is None:
-        return None
-    
-    # Convert timestamp to datetime
-    sales_df['timestamp'] = pd.to_datetime(sales_df['timestamp'])
-    sales_df['month'] = sales_df['timestamp'].dt.month
-    sales_df['season'] = sales_df['timestamp'].dt.month.map(get_season)
-    
-    # Merge with inventory to get category information
-    merged_sales = sales_df.merge(inventory_df[['product_id', 'category', 'seasonal_demand_factor']], 
-                                 on='product_id', how='left')
-    
-    # Monthly sales analysis
-    monthly_sales = merged_sales.groupby('month').agg({
-        'quantity_sold': 'sum',
-        'product_id': 'count'
-    }).rename(columns={'product_id': 'transaction_count'})
-    
-    # Seasonal sales analysis
-    seasonal_sales = merged_sales.groupby('season').agg({
-        'quantity_sold': 'sum',
-        'product_id': 'count'
-    }).rename(columns={'product_id': 'transaction_count'})
-    
-    # Category performance by season
-    category_seasonal = merged_sales.groupby(['category', 'season']).agg({
-        'quantity_sold': 'sum'
-    }).reset_index()
-    
-    return {
-        'monthly_sales': monthly_sales,
-        'seasonal_sales': seasonal_sales,
-        'category_seasonal': category_seasonal
-    }
+SEASON_BY_MONTH = np.array([None, 'Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer',
+                            'Summer', 'Summer', 'Fall', 'Fall', 'Fall', 'Winter'], dtype=object)  # Indexed by month (1-12)
 
 def get_season(month):
     """Map month to season"""
@@ -51,34 +18,121 @@ def get_season(month):
     else:
         return 'Fall'
 
-def forecast_seasonal_demand(inventory_df, sales_df, forecast_months=3):
-    """Forecast demand for the next few months based on seasonal patterns"""
-    if sales_df is None or inventory_df is None:
+def seasons_for_months(months):
+    """Vectorized get_season for an array of months (1-12)."""
+    return SEASON_BY_MONTH[np.asarray(months, dtype=np.int64)]
+
+def product_month_sales(sales_df, as_of=None):
+    """
+    Quantity sold and transaction count per (product_id, month) in one groupby, with the
+    first and last timestamp of the history (sales after as_of are ignored).
+    """
+    timestamps = ensure_datetime(sales_df['timestamp'], TIMESTAMP_FORMAT)
+    if as_of is not None:
+        keep = (timestamps <= pd.Timestamp(as_of)).to_numpy()
+        sales_df, timestamps = sales_df[keep], timestamps[keep]
+    month_sales = sales_df.groupby([sales_df['product_id'], timestamps.dt.month.rename('month')], observed=True)[
+        'quantity_sold'].agg(quantity_sold='sum', transaction_count='count')
+    return month_sales, timestamps.min(), timestamps.max()
+
+def build_seasonal_context(inventory_df, sales_df=None, aggregates=None, as_of=None):
+    """
+    Everything the seasonal functions need from the sales history, built once per data
+    version and passed to them as seasonal_context. Built from the (product_id, month)
+    totals in aggregates (utils.sales_stream / utils.sales_aggregates) when given, else
+    from sales_df up to as_of (aggregates cover the whole history, so they cannot be
+    combined with as_of). Returns a dict with:
+    - 'monthly_sales', 'seasonal_sales', 'category_seasonal': as analyze_seasonal_trends
+    - 'category_month_sales': quantity sold per (category, month), for the forecast
+    - 'first_timestamp' / 'last_timestamp' / 'total_quantity_sold': span and volume of the history
+    - 'as_of': the as_of it was built for (None for the whole history)
+    """
+    if inventory_df is None or (sales_df is None and aggregates is None):
         return None
-    
-    # Get historical sales data
-    sales_df['timestamp'] = pd.to_datetime(sales_df['timestamp'])
-    sales_df['month'] = sales_df['timestamp'].dt.month
-    
-    # Merge with inventory
-    merged_sales = sales_df.merge(inventory_df[['product_id', 'category', 'seasonal_demand_factor']], 
-                                 on='product_id', how='left')
-    
-    # Calculate average daily sales by category and month
-    daily_sales = merged_sales.groupby(['category', 'month']).agg({
+
+    if aggregates is not None:
+        if as_of is not None:
+            raise ValueError("Sales aggregates cover the whole history; build the context from sales_df to use as_of")
+        month_sales = aggregates['product_month_sales']
+        first_timestamp, last_timestamp = aggregates['first_timestamp'], aggregates['last_timestamp']
+    else:
+        month_sales, first_timestamp, last_timestamp = product_month_sales(sales_df, as_of)
+    month_sales = month_sales.reset_index()
+    month_sales['product_id'] = month_sales['product_id'].astype(object)
+    month_sales['season'] = seasons_for_months(month_sales['month'])
+
+    monthly_sales = month_sales.groupby('month')[['quantity_sold', 'transaction_count']].sum()
+    seasonal_sales = month_sales.groupby('season')[['quantity_sold', 'transaction_count']].sum()
+
+    # Products missing from the inventory count towards the totals above but have no category
+    categories = inventory_df[['product_id', 'category']].astype({'product_id': 'object'})
+    month_sales = month_sales.merge(categories, on='product_id', how='left')
+    category_seasonal = month_sales.groupby(['category', 'season'], observed=True).agg({
         'quantity_sold': 'sum'
     }).reset_index()
-    
+    category_month_sales = month_sales.groupby(['category', 'month'], observed=True).agg({
+        'quantity_sold': 'sum'
+    }).reset_index()
+
+    return {
+        'monthly_sales': monthly_sales,
+        'seasonal_sales': seasonal_sales,
+        'category_seasonal': category_seasonal,
+        'category_month_sales': category_month_sales,
+        'first_timestamp': first_timestamp,
+        'last_timestamp': last_timestamp,
+        'total_quantity_sold': monthly_sales['quantity_sold'].sum(),
+        'as_of': None if as_of is None else pd.Timestamp(as_of)
+    }
+
+def _seasonal_context_for(inventory_df, sales_df, as_of, seasonal_context):
+    """
+    seasonal_context if it was built for as_of (ValueError otherwise), else a context built
+    from sales_df up to as_of (None without inventory or sales).
+    """
+    if seasonal_context is None:
+        if sales_df is None or inventory_df is None:
+            return None
+        return build_seasonal_context(inventory_df, sales_df, as_of=as_of)
+    expected = None if as_of is None else pd.Timestamp(as_of)
+    if seasonal_context.get('as_of') != expected:
+        raise ValueError(f"The seasonal context was built for as_of={seasonal_context.get('as_of')}, not {expected}")
+    return seasonal_context
+
+def analyze_seasonal_trends(sales_df, inventory_df, seasonal_context=None, as_of=None):
+    """Analyze seasonal trends in sales and inventory (sales after as_of are ignored)"""
+    seasonal_context = _seasonal_context_for(inventory_df, sales_df, as_of, seasonal_context)
+    if seasonal_context is None:
+        return None
+
+    return {
+        'monthly_sales': seasonal_context['monthly_sales'],
+        'seasonal_sales': seasonal_context['seasonal_sales'],
+        'category_seasonal': seasonal_context['category_seasonal']
+    }
+
+def forecast_seasonal_demand(inventory_df, sales_df, forecast_months=3, as_of=None, seasonal_context=None):
+    """
+    Forecast demand for the next few months based on seasonal patterns.
+    as_of forecasts from a past date, using only the sales history up to it (a shared
+    seasonal_context built for a different as_of raises ValueError).
+    """
+    seasonal_context = _seasonal_context_for(inventory_df, sales_df, as_of, seasonal_context)
+    if seasonal_context is None:
+        return None
+    current_date = datetime.now() if as_of is None else pd.Timestamp(as_of)
+
+    # Sales by category and month
+    daily_sales = seasonal_context['category_month_sales'].copy()
+
     # Calculate days in each month for the sales period
-    sales_start = sales_df['timestamp'].min()
-    sales_end = sales_df['timestamp'].max()
-    total_days = (sales_end - sales_start).days
-    
+    total_days = (seasonal_context['last_timestamp'] - seasonal_context['first_timestamp']).days
+
     # Estimate daily sales rate
     daily_sales['daily_rate'] = daily_sales['quantity_sold'] / (total_days / 12)  # Approximate days per month
-    
+
     # Generate forecast for next months
-    current_month = datetime.now().month
+    current_month = current_date.month
     forecast_data = []
     
     for i in range(1, forecast_months + 1):
@@ -104,7 +158,7 @@ def forecast_seasonal_demand(inventory_df, sales_df, forecast_months=3):
             ]['seasonal_demand_factor'].iloc[0]
             
             forecasted_daily_rate = base_daily_rate * seasonal_factor
-            days_in_month = calendar.monthrange(datetime.now().year, forecast_month)[1]
+            days_in_month = calendar.monthrange(current_date.year, forecast_month)[1]
             forecasted_monthly_sales = forecasted_daily_rate * days_in_month
             
             forecast_data.append({
@@ -117,19 +171,19 @@ def forecast_seasonal_demand(inventory_df, sales_df, forecast_months=3):
     
     return pd.DataFrame(forecast_data)
 
-def get_seasonal_recommendations(inventory_df, sales_df):
+def get_seasonal_recommendations(inventory_df, sales_df, as_of=None, seasonal_context=None):
     """Generate seasonal recommendations for inventory management"""
     recommendations = []
     
-    if inventory_df is None or sales_df is None:
+    if inventory_df is None or (sales_df is None and seasonal_context is None):
         return recommendations
     
     # Analyze current seasonal trends
-    seasonal_trends = analyze_seasonal_trends(sales_df, inventory_df)
+    seasonal_trends = analyze_seasonal_trends(sales_df, inventory_df, seasonal_context, as_of)
     if seasonal_trends is None:
         return recommendations
     
-    current_month = datetime.now().month
+    current_month = (datetime.now() if as_of is None else pd.Timestamp(as_of)).month
     current_season = get_season(current_month)
     
     # Get category performance for current season
@@ -172,20 +226,21 @@ def get_seasonal_recommendations(inventory_df, sales_df):
     
     return recommendations
 
-def calculate_seasonal_efficiency_score(inventory_df, sales_df):
+def calculate_seasonal_efficiency_score(inventory_df, sales_df, as_of=None, seasonal_context=None):
     """Calculate how well the store manages seasonal inventory"""
-    if inventory_df is None or sales_df is None:
+    if inventory_df is None or (sales_df is None and seasonal_context is None):
         return 0
     
     # Analyze seasonal alignment
-    seasonal_trends = analyze_seasonal_trends(sales_df, inventory_df)
+    seasonal_context = _seasonal_context_for(inventory_df, sales_df, as_of, seasonal_context)
+    seasonal_trends = analyze_seasonal_trends(sales_df, inventory_df, seasonal_context, as_of)
     if seasonal_trends is None:
         return 0
     
     score = 100  # Start with perfect score
     
     # Factor 1: Seasonal demand alignment (40 points)
-    current_month = datetime.now().month
+    current_month = (datetime.now() if as_of is None else pd.Timestamp(as_of)).month
     current_season = get_season(current_month)
     
     # Check if high seasonal factor categories have good sales
@@ -207,7 +262,7 @@ def calculate_seasonal_efficiency_score(inventory_df, sales_df):
     # Factor 2: Inventory turnover by season (30 points)
     # This is a simplified calculation
     total_inventory = inventory_df['quantity_in_stock'].sum()
-    total_sales = sales_df['quantity_sold'].sum()
+    total_sales = seasonal_context['total_quantity_sold']
     
     if total_inventory > 0:
         turnover_ratio = total_sales / total_inventory
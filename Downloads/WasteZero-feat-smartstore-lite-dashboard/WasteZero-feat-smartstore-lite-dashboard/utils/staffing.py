@@ -0,0 +1,287 @@
+import numpy as np
+import pandas as pd
+from utils.data_loader import load_employee_schedules
+from utils.schedule_optimization import HOURS_PER_DAY, MINUTES_PER_DAY, slots_per_day
+
+DEFAULT_MIN_STAFF = 1  # Headcount at which the store counts as open
+
+def load_schedule_data(schedules_path="data/employee_schedules.csv"):
+    """Loads the shared employee shift frame (parsed once per process, read-only)."""
+    try:
+        return load_employee_schedules(schedules_path)
+    except FileNotFoundError as e:
+        print(f"Error: {e}. Make sure employee schedules file is generated and path is correct.")
+        return None
+
+def shift_minutes(schedules_df):
+    """
+    Start and end of each shift in minutes after midnight of its date, as int64 arrays.
+    Shifts ending at or before their start time run overnight, so their end is past 1440.
+    """
+    start = _clock_minutes(schedules_df['shift_start_time'])
+    end = _clock_minutes(schedules_df['shift_end_time'])
+    end = np.where(end <= start, end + MINUTES_PER_DAY, end)
+    return start, end
+
+def _clock_minutes(times):
+    """Minutes after midnight for HH:MM:SS strings; only the distinct values are parsed."""
+    codes, uniques = pd.factorize(times)
+    minutes = pd.to_timedelta(uniques).to_numpy() // np.timedelta64(1, 'm')
+    return minutes.astype(np.int64)[codes]
+
+def staffing_counts(schedules_df, slot_minutes=60, store_column=None):
+    """
+    Staffed headcount per date and slot of day, from a sweep over the shift intervals.
+    Each shift adds +1 at its first slot and -1 after its last slot (a difference array
+    built with two np.bincount calls), and a cumulative sum along time turns the
+    differences into headcounts, so the cost is linear in shifts plus slots. A slot counts
+    as staffed if a shift covers any part of it; overnight shifts carry into the next day.
+
+    Returns a frame shaped like infer_footfall_matrix(by='date'): one row per date (per
+    store with store_column) and slot columns numbered from 0.
+    """
+    num_slots = slots_per_day(slot_minutes)
+    if schedules_df is None or schedules_df.empty:
+        return pd.DataFrame(columns=range(num_slots), dtype=int)
+
+    days = schedules_df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    first_day = int(days.min())
+    num_days = int(days.max()) - first_day + 1
+    store_codes, stores = np.zeros(len(days), dtype=np.int64), [None]
+    if store_column is not None:
+        store_codes, stores = pd.factorize(schedules_df[store_column], sort=True)
+
+    start, end = shift_minutes(schedules_df)
+    start_slot = start // slot_minutes
+    end_slot = np.minimum(-(-end // slot_minutes), start_slot + num_slots)  # Ceil; shifts capped at 24h
+
+    # One spare day per store absorbs overnight shifts from the last date
+    store_length = (num_days + 1) * num_slots
+    offsets = store_codes * store_length + (days - first_day) * num_slots
+    total = len(stores) * store_length
+    changes = (np.bincount(offsets + start_slot, minlength=total)
+               - np.bincount(offsets + end_slot, minlength=total))
+    headcount = np.cumsum(changes.reshape(len(stores), store_length), axis=1)
+    headcount = headcount[:, :num_days * num_slots].reshape(len(stores), num_days, num_slots)
+
+    dates = pd.date_range(np.datetime64(first_day, 'D'), periods=num_days, freq='D', name='date')
+    if store_column is None:
+        return pd.DataFrame(headcount[0], index=dates, columns=range(num_slots))
+    index = pd.MultiIndex.from_product([stores, dates], names=[store_column, 'date'])
+    return pd.DataFrame(headcount.reshape(-1, num_slots), index=index, columns=range(num_slots))
+
+def store_hours_from_staffing(staffing, min_staff=DEFAULT_MIN_STAFF):
+    """
+    Effective open and close hour per row of a staffing frame: the start of the first and
+    the end of the last slot with at least min_staff people. Rows without enough staff
+    get NaN.
+    """
+    headcount = staffing.to_numpy()
+    num_slots = headcount.shape[1]
+    staffed = headcount >= min_staff
+    any_staffed = staffed.any(axis=1)
+    first_slot = staffed.argmax(axis=1)
+    last_slot = num_slots - staffed[:, ::-1].argmax(axis=1)
+
+    hours_per_slot = HOURS_PER_DAY / num_slots
+    return pd.DataFrame({
+        'open_hour': np.where(any_staffed, first_slot * hours_per_slot, np.nan),
+        'close_hour': np.where(any_staffed, last_slot * hours_per_slot, np.nan)
+    }, index=staffing.index)
+
+def derive_store_hours(schedules_df, min_staff=DEFAULT_MIN_STAFF, slot_minutes=60, store_column=None):
+    """
+    Typical open and close hours for the energy schedule: the median over dates of the
+    staffed hours from store_hours_from_staffing. Returns (open_hour, close_hour), or a
+    frame with one row per store when store_column is given; None if there are no shifts.
+    """
+    staffing = staffing_counts(schedules_df, slot_minutes, store_column)
+    if staffing.empty:
+        return None
+    store_hours = store_hours_from_staffing(staffing, min_staff)
+    if store_column is not None:
+        return store_hours.groupby(level=store_column, observed=True).median()
+    typical = store_hours.median()
+    if typical.isna().any():
+        return None
+    return typical['open_hour'], typical['close_hour']
+
+def _align_to_staffing(staffing, footfall):
+    """Footfall (date x slot) reindexed to the staffing frame; dates without sales history
+    use the average footfall of the same weekday."""
+    footfall = footfall.reindex(columns=staffing.columns, fill_value=0)
+    weekday_profile = footfall.groupby(footfall.index.weekday).mean()
+    aligned = footfall.reindex(staffing.index)
+    missing = aligned.isna().any(axis=1).to_numpy()
+    if missing.any():
+        fallback = weekday_profile.reindex(staffing.index[missing].weekday).fillna(0)
+        aligned.iloc[missing] = fallback.to_numpy()
+    return aligned.astype(np.float64)
+
+def staff_per_customer(staffing, footfall):
+    """
+    Staffed headcount per customer for every date and slot (NaN where there were no
+    customers). staffing comes from staffing_counts and footfall from
+    infer_footfall_matrix(by='date') at the same slot length.
+    """
+    customers = _align_to_staffing(staffing, footfall).to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(customers > 0, staffing.to_numpy() / customers, np.nan)
+    return pd.DataFrame(ratio, index=staffing.index, columns=staffing.columns)
+
+def staffing_efficiency_by_slot(staffing, footfall):
+    """
+    Average staffed headcount and customers per slot of day, with customers per staff
+    member and staff per customer. Slots with neither staff nor customers are dropped.
+    """
+    customers = _align_to_staffing(staffing, footfall)
+    summary = pd.DataFrame({
+        'avg_staff': staffing.mean(),
+        'avg_customers': customers.mean()
+    })
+    summary.index.name = 'slot'
+    summary = summary[(summary['avg_staff'] > 0) | (summary['avg_customers'] > 0)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary['customers_per_staff'] = summary['avg_customers'] / summary['avg_staff'].where(summary['avg_staff'] > 0)
+        summary['staff_per_customer'] = summary['avg_staff'] / summary['avg_customers'].where(summary['avg_customers'] > 0)
+    return summary
+
+def _window_sums(values, window):
+    """
+    Sum over the `window` consecutive slots starting at every slot of the last axis
+    (cumsum difference); window may be a scalar or one length per row. Windows running
+    past the end of the day are -inf.
+    """
+    num_slots = values.shape[-1]
+    cumulative = np.zeros(values.shape[:-1] + (num_slots + 1,))
+    np.cumsum(values, axis=-1, out=cumulative[..., 1:])
+    ends = np.arange(num_slots) + np.asarray(window)[..., None]
+    sums = np.take_along_axis(cumulative, np.broadcast_to(np.minimum(ends, num_slots), values.shape), axis=-1) \
+        - cumulative[..., :num_slots]
+    return np.where(ends <= num_slots, sums, -np.inf)
+
+def greedy_shift_starts(required, shifts_per_row, shift_slots, earliest_start=None, latest_end=None):
+    """
+    Start slots for shifts_per_row[i] shifts in each row (day) of the required headcount
+    array, placed greedily: every round puts one more shift on the window that covers the
+    most still-uncovered demand (or, once demand is covered, the least overstaffed window).
+    shift_slots is the shift length in slots, either one for all shifts or an array
+    (rows, max shifts) giving the length of each row's k-th shift, placed in that order.
+    Shifts start no earlier than earliest_start and end no later than latest_end (per
+    row), where the day is long enough. Rounds are vectorized across rows, and each round
+    scores every window with one cumulative sum, so the cost is rounds x rows x slots.
+    Returns an int array (rows, max shifts) of start slots, -1 where a row has no shift.
+    """
+    deficit = np.asarray(required, dtype=np.float64).copy()
+    shifts_per_row = np.asarray(shifts_per_row, dtype=np.int64)
+    num_rows, num_slots = deficit.shape
+    max_shifts = int(shifts_per_row.max()) if len(shifts_per_row) else 0
+    lengths = np.broadcast_to(np.clip(shift_slots, 1, num_slots), (num_rows, max_shifts))
+    starts = np.full((num_rows, max_shifts), -1, dtype=np.int64)
+    slots = np.arange(num_slots)
+
+    earliest_start = np.zeros(num_rows, dtype=np.int64) if earliest_start is None else np.asarray(earliest_start)
+    latest_end = np.full(num_rows, num_slots) if latest_end is None else np.minimum(latest_end, num_slots)
+
+    for shift in range(max_shifts):
+        active = shift < shifts_per_row
+        length = lengths[:, shift]
+        latest_start = np.maximum(latest_end - length, earliest_start)  # A day shorter than a shift still gets its earliest start
+        blocked = np.where((slots >= earliest_start[:, None]) & (slots <= latest_start[:, None]), 0, -np.inf)
+        gain = _window_sums(np.clip(deficit, 0, None), length) + blocked
+        fallback = _window_sums(deficit, length) + blocked
+        covered = gain.max(axis=1) <= 0
+        best = np.where(covered, fallback.argmax(axis=1), gain.argmax(axis=1))
+        starts[active, shift] = best[active]
+        in_shift = (slots >= best[:, None]) & (slots < (best + length)[:, None]) & active[:, None]
+        deficit -= in_shift
+    return starts
+
+def recommend_shift_starts(schedules_df, footfall, slot_minutes=60, customers_per_staff=None, min_staff=DEFAULT_MIN_STAFF,
+                           shift_length_minutes=None, store_column=None):
+    """
+    Recommends a start time for every shift in the roster so staffing follows footfall.
+
+    Each date keeps its number of shifts, and each shift keeps its rostered length (or
+    shift_length_minutes for all shifts, when configured). Required headcount per slot is
+    footfall / customers_per_staff, rounded up, and at least min_staff while the store is
+    staffed today; customers_per_staff defaults to the roster's current overall ratio, so
+    the labor budget is unchanged. Shifts are placed with greedy_shift_starts, longest
+    first, then matched to employees by pairing current and recommended starts of shifts
+    of the same length in sorted order, which minimizes the total change in start time
+    for the day.
+
+    With store_column, every store is planned on its own (footfall must then be indexed
+    by (store, date), as infer_footfall_matrix(by='date', store_column=...) returns, and
+    the default customers_per_staff is each store's own ratio); otherwise the roster and
+    footfall are taken to be a single store's.
+
+    Returns the roster with recommended_start_time / recommended_end_time columns and the
+    change in minutes.
+    """
+    if schedules_df is None or schedules_df.empty:
+        return pd.DataFrame()
+    if store_column is not None:
+        return _recommend_shift_starts_per_store(schedules_df, footfall, store_column, slot_minutes,
+                                                 customers_per_staff, min_staff, shift_length_minutes)
+
+    staffing = staffing_counts(schedules_df, slot_minutes)
+    customers = _align_to_staffing(staffing, footfall).to_numpy()
+    if customers_per_staff is None:
+        customers_per_staff = customers.sum() / max(staffing.to_numpy().sum(), 1)
+    required = np.ceil(customers / max(customers_per_staff, 1e-9))
+    required = np.maximum(required, np.where(staffing.to_numpy() > 0, min_staff, 0))
+
+    roster = schedules_df.reset_index(drop=True)
+    start, end = shift_minutes(roster)
+    length = end - start if shift_length_minutes is None else np.full(len(roster), int(shift_length_minutes))
+    shift_slots = np.maximum(np.round(length / slot_minutes).astype(np.int64), 1)
+    days = roster['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    rows = days - int(days.min())
+    shifts_per_row = np.bincount(rows, minlength=len(staffing))
+
+    # Shifts stay within the hours the store is staffed today
+    store_hours = store_hours_from_staffing(staffing, min_staff)
+    slots_per_hour = len(staffing.columns) / HOURS_PER_DAY
+    earliest_start = (store_hours['open_hour'].fillna(0) * slots_per_hour).round().astype(np.int64).to_numpy()
+    latest_end = (store_hours['close_hour'].fillna(HOURS_PER_DAY) * slots_per_hour).round().astype(np.int64).to_numpy()
+
+    # Within a day, shifts are placed longest first (ties by current start)
+    order = np.lexsort((start, -shift_slots, rows))
+    rank_in_day = np.arange(len(order)) - np.repeat(np.cumsum(shifts_per_row) - shifts_per_row, shifts_per_row)
+    placement_slots = np.ones((len(staffing), max(int(shifts_per_row.max()), 1)), dtype=np.int64)
+    placement_slots[rows[order], rank_in_day] = shift_slots[order]
+    starts = greedy_shift_starts(required, shifts_per_row, placement_slots, earliest_start, latest_end)
+
+    # Pair the k-th earliest current shift of a day and length with the k-th earliest recommended start
+    placed = starts[rows[order], rank_in_day]
+    placed = placed[np.lexsort((placed, -shift_slots[order], rows[order]))]
+    recommended_start = np.empty(len(roster), dtype=np.int64)
+    recommended_start[order] = placed * slot_minutes
+    recommended_end = recommended_start + length
+
+    def clock(minutes):
+        minutes = minutes % MINUTES_PER_DAY
+        return [f"{m // 60:02d}:{m % 60:02d}:00" for m in minutes.tolist()]
+
+    return roster.assign(
+        recommended_start_time=clock(recommended_start),
+        recommended_end_time=clock(recommended_end),
+        start_change_minutes=recommended_start - start
+    )
+
+def _recommend_shift_starts_per_store(schedules_df, footfall, store_column, slot_minutes, customers_per_staff,
+                                      min_staff, shift_length_minutes):
+    """recommend_shift_starts for each store's shifts against that store's footfall, in roster order."""
+    if not isinstance(footfall.index, pd.MultiIndex):
+        raise ValueError("footfall must be indexed by (store, date) when store_column is given")
+    footfall_stores = footfall.index.get_level_values(0)
+    store_codes, stores = pd.factorize(schedules_df[store_column], use_na_sentinel=False)
+    parts = []
+    for code, store in enumerate(stores):
+        positions = np.flatnonzero(store_codes == code)
+        store_footfall = footfall[footfall_stores == store].droplevel(0)
+        part = recommend_shift_starts(schedules_df.iloc[positions], store_footfall, slot_minutes,
+                                      customers_per_staff, min_staff, shift_length_minutes)
+        parts.append(part.set_axis(positions))
+    return pd.concat(parts).sort_index()
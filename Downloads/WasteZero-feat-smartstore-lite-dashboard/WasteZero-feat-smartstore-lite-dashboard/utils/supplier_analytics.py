@@ -1,11 +1,12 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from utils.data_loader import load_suppliers
 
 def load_supplier_data(suppliers_path="data/suppliers.csv"):
     """Load supplier data from CSV file"""
     try:
-        suppliers_df = pd.read_csv(suppliers_path)
+        suppliers_df = load_suppliers(suppliers_path)
         return suppliers_df
     except FileNotFoundError:
         print(f"Supplier data file not found: {suppliers_path}")
@@ -14,79 +15,77 @@ def load_supplier_data(suppliers_path="data/suppliers.csv"):
         print(f"Error loading supplier data: {e}")
         return None
 
-def analyze_supplier_performance(inventory_df, suppliers_df):
-    """Analyze supplier performance based on inventory data"""
+EXPIRY_RISK_DAYS = 30  # Stock expiring within this many days counts as expiry risk
+
+def _expiring_soon(expiry_dates, as_of=None):
+    """Rows expiring within EXPIRY_RISK_DAYS whole days of as_of (default now)."""
+    current_date = datetime.now() if as_of is None else pd.Timestamp(as_of)
+    days_to_expiry = (pd.to_datetime(expiry_dates) - current_date).dt.days
+    return (days_to_expiry <= EXPIRY_RISK_DAYS).to_numpy()
+
+def supplier_risk_scores(reliability_score, delivery_time_days, expiry_risk_value, total_inventory_value):
+    """
+    Risk score (0-100) from supplier attributes and stock values; arguments may be
+    scalars or per-supplier arrays.
+    """
+    reliability_score = np.asarray(reliability_score, dtype=np.float64)
+    delivery_time_days = np.asarray(delivery_time_days, dtype=np.float64)
+    expiry_risk_value = np.asarray(expiry_risk_value, dtype=np.float64)
+    total_inventory_value = np.asarray(total_inventory_value, dtype=np.float64)
+
+    # Factor 1: Reliability score (lower reliability = higher risk)
+    risk_score = (1 - reliability_score) * 30
+    # Factor 2: Delivery time (longer delivery = higher risk)
+    risk_score = risk_score + np.minimum(delivery_time_days / 14, 1) * 20
+    # Factor 3: Expiry risk (share of stock value expiring soon)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expiry_risk_ratio = expiry_risk_value / total_inventory_value
+    risk_score = risk_score + np.where(total_inventory_value > 0, expiry_risk_ratio * 50, 0)
+
+    return np.minimum(risk_score, 100)  # Cap at 100
+
+def analyze_supplier_performance(inventory_df, suppliers_df, as_of=None):
+    """
+    Analyze supplier performance based on inventory data (as of a date, default now).
+    All metrics come from one groupby over the inventory; suppliers missing from
+    suppliers_df are left out.
+    """
     if inventory_df is None or suppliers_df is None:
         return None
-    
-    # Merge inventory with supplier data
-    merged_df = inventory_df.merge(suppliers_df, on='supplier_id', how='left')
-    
-    # Calculate supplier metrics
-    supplier_metrics = []
-    
-    for supplier_id in merged_df['supplier_id'].unique():
-        supplier_data = merged_df[merged_df['supplier_id'] == supplier_id]
-        supplier_info = suppliers_df[suppliers_df['supplier_id'] == supplier_id].iloc[0]
-        
-        # Calculate metrics
-        total_products = len(supplier_data)
-        total_inventory_value = (supplier_data['cost_price'] * supplier_data['quantity_in_stock']).sum()
-        avg_product_price = supplier_data['cost_price'].mean()
-        
-        # Calculate expiry risk
-        current_date = datetime.now()
-        supplier_data_copy = supplier_data.copy()
-        supplier_data_copy['expiry_date'] = pd.to_datetime(supplier_data_copy['expiry_date'])
-        supplier_data_copy['days_to_expiry'] = (supplier_data_copy['expiry_date'] - current_date).dt.days
-        
-        expiring_soon = supplier_data_copy[supplier_data_copy['days_to_expiry'] <= 30]
-        expiry_risk_value = (expiring_soon['cost_price'] * expiring_soon['quantity_in_stock']).sum()
-        
-        # Calculate stock turnover (estimated)
-        avg_stock_level = supplier_data['quantity_in_stock'].mean()
-        
-        supplier_metrics.append({
-            'supplier_id': supplier_id,
-            'supplier_name': supplier_info['supplier_name'],
-            'total_products': total_products,
-            'total_inventory_value': total_inventory_value,
-            'avg_product_price': avg_product_price,
-            'expiry_risk_value': expiry_risk_value,
-            'avg_stock_level': avg_stock_level,
-            'reliability_score': supplier_info['reliability_score'],
-            'delivery_time_days': supplier_info['delivery_time_days'],
-            'risk_score': calculate_supplier_risk_score(supplier_data, supplier_info)
-        })
-    
-    return pd.DataFrame(supplier_metrics)
 
-def calculate_supplier_risk_score(supplier_data, supplier_info):
+    stock_value = inventory_df['cost_price'] * inventory_df['quantity_in_stock']
+    per_product = pd.DataFrame({
+        'supplier_id': inventory_df['supplier_id'],
+        'cost_price': inventory_df['cost_price'],
+        'quantity_in_stock': inventory_df['quantity_in_stock'],
+        'stock_value': stock_value,
+        'expiring_value': stock_value.where(_expiring_soon(inventory_df['expiry_date'], as_of), 0)
+    })
+    metrics = per_product.groupby('supplier_id', sort=False).agg(
+        total_products=('supplier_id', 'size'),
+        total_inventory_value=('stock_value', 'sum'),
+        avg_product_price=('cost_price', 'mean'),
+        expiry_risk_value=('expiring_value', 'sum'),
+        avg_stock_level=('quantity_in_stock', 'mean')
+    )
+
+    supplier_info = suppliers_df.drop_duplicates('supplier_id').set_index('supplier_id')[
+        ['supplier_name', 'reliability_score', 'delivery_time_days']]
+    metrics = metrics.join(supplier_info, how='inner').rename_axis('supplier_id').reset_index()
+    metrics['supplier_id'] = metrics['supplier_id'].astype(str)  # Not the loader's categorical
+    metrics['risk_score'] = supplier_risk_scores(metrics['reliability_score'], metrics['delivery_time_days'],
+                                                 metrics['expiry_risk_value'], metrics['total_inventory_value'])
+
+    return metrics[['supplier_id', 'supplier_name', 'total_products', 'total_inventory_value',
+                    'avg_product_price', 'expiry_risk_value', 'avg_stock_level',
+                    'reliability_score', 'delivery_time_days', 'risk_score']]
+
+def calculate_supplier_risk_score(supplier_data, supplier_info, as_of=None):
     """Calculate a risk score for the supplier based on various factors"""
-    risk_score = 0
-    
-    # Factor 1: Reliability score (lower reliability = higher risk)
-    risk_score += (1 - supplier_info['reliability_score']) * 30
-    
-    # Factor 2: Delivery time (longer delivery = higher risk)
-    delivery_risk = min(supplier_info['delivery_time_days'] / 14, 1) * 20
-    risk_score += delivery_risk
-    
-    # Factor 3: Expiry risk (higher expiry risk = higher risk)
-    current_date = datetime.now()
-    supplier_data_copy = supplier_data.copy()
-    supplier_data_copy['expiry_date'] = pd.to_datetime(supplier_data_copy['expiry_date'])
-    supplier_data_copy['days_to_expiry'] = (supplier_data_copy['expiry_date'] - current_date).dt.days
-    
-    expiring_soon = supplier_data_copy[supplier_data_copy['days_to_expiry'] <= 30]
-    total_value = (supplier_data_copy['cost_price'] * supplier_data_copy['quantity_in_stock']).sum()
-    expiry_risk_value = (expiring_soon['cost_price'] * expiring_soon['quantity_in_stock']).sum()
-    
-    if total_value > 0:
-        expiry_risk_ratio = expiry_risk_value / total_value
-        risk_score += expiry_risk_ratio * 50
-    
-    return min(risk_score, 100)  # Cap at 100
+    stock_value = supplier_data['cost_price'] * supplier_data['quantity_in_stock']
+    expiry_risk_value = stock_value[_expiring_soon(supplier_data['expiry_date'], as_of)].sum()
+    return float(supplier_risk_scores(supplier_info['reliability_score'], supplier_info['delivery_time_days'],
+                                      expiry_risk_value, stock_value.sum()))
 
 def get_supplier_recommendations(supplier_metrics_df):
     """Generate recommendations based on supplier performance"""
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Monte Carlo delivery and stock-out simulation.
+# Each product has its current stock (expiring after days_to_expiry) and one incoming
+# order from its supplier. Per trial:
+# - the delivery is on time with probability reliability_score; otherwise it fails
+#   (FAILED_DELIVERY_SHARE of the unreliable outcomes) or arrives late
+# - the lead time is gamma-distributed around delivery_time_days, and late deliveries add
+#   an exponential delay with mean LATE_DELAY_SHARE x delivery_time_days
+# - demand is Poisson with the product's observed daily velocity
+# Stock is sold first-in first-out; current stock left at expiry is waste, and any demand
+# that finds no sellable stock within the horizon is a stock-out. The incoming batch is
+# assumed not to expire within the horizon.
+
+DEFAULT_HORIZON_DAYS = 30
+DEFAULT_NUM_TRIALS = 1000
+LEAD_TIME_CV = 0.25  # Coefficient of variation of on-time lead times
+FAILED_DELIVERY_SHARE = 0.3  # Share of unreliable deliveries that never arrive
+LATE_DELAY_SHARE = 0.5  # Mean extra delay of a late delivery, as a share of the nominal lead time
+SIMULATION_CHUNK_CELLS = 2_000_000  # Trials x products drawn at once (bounds memory per worker)
+PARALLEL_MIN_CELLS = 5_000_000  # Smaller runs are simulated in-process
+
+def default_order_quantities(velocity, horizon_days=DEFAULT_HORIZON_DAYS):
+    """Order covering the expected demand over the horizon, in whole units."""
+    return np.ceil(np.asarray(velocity, dtype=np.float64) * horizon_days)
+
+def simulate_products(rng, stock, velocity, days_to_expiry, order_quantity, reliability_score,
+                      delivery_time_days, horizon_days=DEFAULT_HORIZON_DAYS, num_trials=DEFAULT_NUM_TRIALS):
+    """
+    Simulates num_trials delivery and demand outcomes for each product (all arguments are
+    per-product arrays; suppliers' attributes are repeated per product). Returns per-product
+    arrays: stockout_probability, expiry_waste_probability and expected_waste_units.
+    """
+    shape = (num_trials, len(stock))
+    stock = np.asarray(stock, dtype=np.float64)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    order_quantity = np.asarray(order_quantity, dtype=np.float64)
+    lead_time = np.asarray(delivery_time_days, dtype=np.float64)
+    # Stock already past expiry cannot be sold
+    expiry = np.clip(np.asarray(days_to_expiry, dtype=np.float64), 0, None)
+
+    # Delivery arrival day (inf when the delivery fails)
+    outcome = rng.random(shape)
+    on_time = outcome < reliability_score
+    failed = ~on_time & (outcome >= reliability_score + (1 - reliability_score) * (1 - FAILED_DELIVERY_SHARE))
+    gamma_shape = 1 / LEAD_TIME_CV ** 2
+    arrival = rng.gamma(gamma_shape, lead_time * LEAD_TIME_CV ** 2, shape)
+    late = ~on_time & ~failed
+    arrival[late] += rng.exponential(np.broadcast_to(lead_time * LATE_DELAY_SHARE, shape)[late])
+    arrival[failed] = np.inf
+    arrived = arrival < horizon_days
+    arrival = np.minimum(arrival, horizon_days)
+    expiry = np.broadcast_to(np.minimum(expiry, horizon_days), shape)
+
+    # Cumulative demand at the earlier and later of (expiry, arrival) and at the horizon
+    first = np.minimum(expiry, arrival)
+    second = np.maximum(expiry, arrival)
+    demand_first = rng.poisson(velocity * first)
+    demand_second = demand_first + rng.poisson(velocity * (second - first))
+    demand_horizon = demand_second + rng.poisson(velocity * (horizon_days - second))
+    delivered_first = arrival <= expiry
+    demand_at_arrival = np.where(delivered_first, demand_first, demand_second)
+    demand_at_expiry = np.where(delivered_first, demand_second, demand_first)
+
+    sold_from_stock = np.minimum(stock, demand_at_expiry)
+    incoming = np.where(arrived, order_quantity, 0)
+    stockout = np.where(
+        delivered_first,
+        # Current stock alone until arrival, then both batches
+        (demand_at_arrival > stock) | (demand_horizon - sold_from_stock > incoming),
+        # Current stock until expiry, nothing until arrival, then the incoming batch
+        (demand_at_expiry > stock) | (demand_at_arrival > demand_at_expiry) | (demand_horizon - demand_at_arrival > incoming)
+    )
+    waste_units = np.where(np.asarray(days_to_expiry) <= horizon_days, stock - sold_from_stock, 0)
+
+    return {
+        'stockout_probability': stockout.mean(axis=0),
+        'expiry_waste_probability': (waste_units > 0).mean(axis=0),
+        'expected_waste_units': waste_units.mean(axis=0)
+    }
+
+def _simulate_supplier(task):
+    """Simulates one supplier's products in chunks of SIMULATION_CHUNK_CELLS (process pool worker)."""
+    seed, arrays, horizon_days, num_trials = task
+    rng = np.random.default_rng(seed)
+    chunk = max(1, SIMULATION_CHUNK_CELLS // num_trials)
+    parts = []
+    for start in range(0, len(arrays['stock']), chunk):
+        chunk_arrays = {name: values[start:start + chunk] for name, values in arrays.items()}
+        parts.append(simulate_products(rng, horizon_days=horizon_days, num_trials=num_trials, **chunk_arrays))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def simulate_supply_risk(processed_inventory, suppliers_df, horizon_days=DEFAULT_HORIZON_DAYS,
+                         num_trials=DEFAULT_NUM_TRIALS, order_quantity=None, seed=0, max_workers=None):
+    """
+    Stock-out and expiry-waste probabilities per product over the next horizon_days.
+
+    processed_inventory is the output of preprocess_for_waste_prediction (days_to_expiry and
+    avg_daily_sales_last_30d are used); order_quantity (per product, aligned with its rows)
+    defaults to default_order_quantities. Each supplier is simulated with its own random
+    stream spawned from seed, so results do not depend on max_workers; suppliers are spread
+    over a process pool unless the run is small or max_workers is 1. Products whose supplier
+    is missing from suppliers_df are left out.
+    """
+    if processed_inventory is None or suppliers_df is None:
+        return None
+
+    supplier_info = suppliers_df.drop_duplicates('supplier_id').set_index('supplier_id')
+    supplier_ids = processed_inventory['supplier_id'].astype(str)
+    velocity = processed_inventory['avg_daily_sales_last_30d'].to_numpy(dtype=np.float64)
+    if order_quantity is None:
+        order_quantity = default_order_quantities(velocity, horizon_days)
+    columns = {
+        'stock': processed_inventory['quantity_in_stock'].to_numpy(dtype=np.float64),
+        'velocity': velocity,
+        # Products without an expiry date never expire
+        'days_to_expiry': np.nan_to_num(processed_inventory['days_to_expiry'].to_numpy(dtype=np.float64), nan=np.inf),
+        'order_quantity': np.broadcast_to(np.asarray(order_quantity, dtype=np.float64), len(velocity)),
+        'reliability_score': supplier_ids.map(supplier_info['reliability_score'].astype(float)).to_numpy(dtype=np.float64),
+        'delivery_time_days': supplier_ids.map(supplier_info['delivery_time_days'].astype(float)).to_numpy(dtype=np.float64)
+    }
+    positions = np.flatnonzero(~np.isnan(columns['reliability_score']))
+    if len(positions) == 0:
+        return pd.DataFrame()
+
+    # One task per supplier, with its products' rows gathered together
+    supplier_codes, _ = pd.factorize(supplier_ids.to_numpy()[positions])
+    order = np.argsort(supplier_codes, kind='stable')
+    groups = np.split(positions[order], np.flatnonzero(np.diff(supplier_codes[order])) + 1)
+    seeds = np.random.SeedSequence(seed).spawn(len(groups))
+    tasks = [(seed_seq, {name: values[rows] for name, values in columns.items()}, horizon_days, num_trials)
+             for seed_seq, rows in zip(seeds, groups)]
+
+    if max_workers == 1 or len(positions) * num_trials < PARALLEL_MIN_CELLS:
+        results = [_simulate_supplier(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_simulate_supplier, tasks, chunksize=max(1, len(tasks) // 256)))
+
+    # Back to inventory row order
+    rows = np.concatenate(groups)
+    inverse = np.empty(len(processed_inventory), dtype=np.int64)
+    inverse[rows] = np.arange(len(rows))
+    inventory = processed_inventory.iloc[positions]
+    simulation = pd.DataFrame({'product_id': inventory['product_id'].to_numpy(),
+                               'supplier_id': supplier_ids.to_numpy()[positions]}, index=inventory.index)
+    for name in results[0]:
+        simulation[name] = np.concatenate([result[name] for result in results])[inverse[positions]]
+    simulation['expected_waste_value'] = simulation['expected_waste_units'] * inventory['cost_price'].to_numpy(dtype=np.float64)
+    return simulation
+
+def summarize_simulation_by_supplier(simulation, suppliers_df=None):
+    """Per-supplier mean stock-out / waste probabilities and total expected waste value."""
+    if simulation is None or simulation.empty:
+        return pd.DataFrame()
+    summary = simulation.groupby('supplier_id', sort=False).agg(
+        products=('product_id', 'size'),
+        avg_stockout_probability=('stockout_probability', 'mean'),
+        avg_expiry_waste_probability=('expiry_waste_probability', 'mean'),
+        expected_waste_value=('expected_waste_value', 'sum')
+    )
+    if suppliers_df is not None:
+        names = suppliers_df.drop_duplicates('supplier_id').set_index('supplier_id')['supplier_name']
+        summary.insert(0, 'supplier_name', names.reindex(summary.index.astype(str)).to_numpy())
+    return summary.sort_values('avg_stockout_probability', ascending=False).reset_index()
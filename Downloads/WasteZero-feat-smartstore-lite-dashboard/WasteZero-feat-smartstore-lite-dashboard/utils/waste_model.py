@@ -0,0 +1,111 @@
+import os
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.sales_cube import cube_day_index, cube_sales_between
+
+# Trained waste model: feature construction and batched inference.
+# Training lives in model/train_model.py; both sides build features with
+# build_feature_matrix so they cannot drift apart.
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "model", "waste_predictor.joblib")
+
+VELOCITY_WINDOWS = (7, 14, 30, 90)
+FEATURE_COLUMNS = [f'velocity_{w}d' for w in VELOCITY_WINDOWS] + [
+    'days_to_expiry', 'days_since_purchase', 'quantity_in_stock',
+    'cost_price', 'selling_price', 'category_code'
+]
+CATEGORIES = ['Groceries', 'Beauty & Health', 'Electronics', 'Clothing',
+              'Home Goods', 'Books', 'Sports & Outdoors']
+
+def category_codes(categories, known_categories=CATEGORIES):
+    """Stable integer code per category (-1 for categories unknown to the model)."""
+    return pd.Index(known_categories).get_indexer(pd.Series(categories).astype(object))
+
+def build_feature_matrix(inventory_df, cube, as_of_days, stock=None, known_categories=CATEGORIES):
+    """
+    float32 feature matrix of shape (dates, products, features) for as-of day offsets
+    as_of_days in the sales cube. Velocities use the window_days before each as-of day
+    (the as-of day itself is not yet observed). stock defaults to quantity_in_stock and
+    may be a (dates, products) array.
+    """
+    product_ids = inventory_df['product_id'].astype(str).to_numpy()
+    as_of_days = np.asarray(as_of_days, dtype=np.int64).reshape(-1, 1)
+    num_dates, num_products = len(as_of_days), len(product_ids)
+    if stock is None:
+        stock = inventory_df['quantity_in_stock'].to_numpy(dtype=np.float64)
+
+    features = np.empty((num_dates, num_products, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, window_days in enumerate(VELOCITY_WINDOWS):
+        features[:, :, i] = cube_sales_between(cube, as_of_days - window_days, as_of_days, product_ids) / window_days
+    column = len(VELOCITY_WINDOWS)
+    features[:, :, column] = cube_day_index(cube, inventory_df['expiry_date']) - as_of_days
+    features[:, :, column + 1] = as_of_days - cube_day_index(cube, inventory_df['purchase_date'])
+    features[:, :, column + 2] = stock
+    features[:, :, column + 3] = inventory_df['cost_price'].to_numpy(dtype=np.float64)
+    features[:, :, column + 4] = inventory_df['selling_price'].to_numpy(dtype=np.float64)
+    features[:, :, column + 5] = category_codes(inventory_df['category'], known_categories)
+    return features
+
+def build_training_set(inventory_df, cube, as_of_days, snapshot_day=None):
+    """
+    Training samples for every (as-of day, product) whose outcome the sales history covers:
+    the product was purchased by the as-of day and expires after it, but no later than
+    snapshot_day (default: the end of the cube). The stock on hand is the snapshot stock;
+    it is not reconstructed from later sales, which would encode the outcome. The label is 1
+    if fewer units sold from the as-of day to expiry than were in stock (units left unsold
+    at expiry), so it depends on demand the features cannot see.
+    Returns (X float32 [samples, features], y int8, sample as-of days, sample inventory rows).
+    """
+    product_ids = inventory_df['product_id'].astype(str).to_numpy()
+    as_of_days = np.asarray(as_of_days, dtype=np.int64).reshape(-1, 1)
+    if snapshot_day is None:
+        snapshot_day = cube['num_days']
+
+    expiry_day = cube_day_index(cube, inventory_df['expiry_date'])
+    purchase_day = cube_day_index(cube, inventory_df['purchase_date'])
+    stock = inventory_df['quantity_in_stock'].to_numpy(dtype=np.float64)
+
+    features = build_feature_matrix(inventory_df, cube, as_of_days, stock)
+    sold_before_expiry = cube_sales_between(cube, as_of_days, expiry_day, product_ids)
+    known = (purchase_day <= as_of_days) & (expiry_day > as_of_days) & (expiry_day <= snapshot_day)
+
+    labels = (sold_before_expiry < stock).astype(np.int8)
+    sample_days = np.broadcast_to(as_of_days, known.shape)
+    sample_rows = np.broadcast_to(np.arange(len(product_ids)), known.shape)
+    return features[known], labels[known], sample_days[known], sample_rows[known]
+
+@lru_cache(maxsize=4)
+def _load_artifact(model_path, mtime_ns, size):
+    """Loads one version of the artifact file; mtime_ns and size key the cache."""
+    import joblib
+    artifact = joblib.load(model_path)
+    if list(artifact.get('feature_columns', [])) != FEATURE_COLUMNS:
+        raise ValueError(f"Model at {model_path} was trained on different feature columns; "
+                         "retrain it with model/train_model.py")
+    return artifact
+
+def load_waste_model(model_path=DEFAULT_MODEL_PATH):
+    """Loads the persisted model artifact once per process, and again when the file changes."""
+    stat = os.stat(model_path)
+    return _load_artifact(model_path, stat.st_mtime_ns, stat.st_size)
+
+def predict_batch(inventory_df, cube, as_of=None, model_path=DEFAULT_MODEL_PATH):
+    """
+    Probability that each product's current stock is wasted, scored in one vectorized call.
+    as_of defaults to today and may not precede the artifact's trained_until date (the model
+    has seen outcomes after it); inventory_df supplies the current stock.
+    """
+    artifact = load_waste_model(model_path)
+    as_of = pd.Timestamp(datetime.now() if as_of is None else as_of)
+    if as_of.normalize() < artifact['trained_until']:
+        raise ValueError(f"as_of {as_of.date()} precedes the model's training data "
+                         f"(trained until {artifact['trained_until'].date()})")
+    as_of_day = cube_day_index(cube, as_of)
+    features = build_feature_matrix(inventory_df, cube, as_of_day,
+                                    known_categories=artifact['categories'])[0]
+    if len(features) == 0:
+        return np.zeros(0)
+    return artifact['model'].predict_proba(features)[:, 1]
@@ -1,74 +1,236 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from utils.data_loader import load_inventory, load_sales
+from utils.expiry_index import expiry_days_quantile
+from utils.waste_model import DEFAULT_MODEL_PATH, predict_batch
+
+# Expiry type used for each category when inventory has no 'expiry_type' column
+CATEGORY_EXPIRY_TYPES = {
+    'Groceries': 'Shelf Life',
+    'Beauty & Health': 'Expiration Date',
+    'Electronics': 'Warranty Period',
+    'Clothing': 'Fashion Season',
+    'Home Goods': 'Quality Period',
+    'Books': 'Obsolescence'
+}
+DEFAULT_EXPIRY_TYPE = 'Wear Period'  # Sports & Outdoors
+
+# Define expiry type categories for risk calculation
+CRITICAL_EXPIRY_TYPES = ['Shelf Life', 'Expiration Date']
+MODERATE_EXPIRY_TYPES = ['Warranty Period', 'Fashion Season']
+LOW_PRIORITY_EXPIRY_TYPES = ['Quality Period', 'Obsolescence', 'Wear Period']
+
+# Per-priority tables, indexed by priority code (0 = critical, 1 = moderate, 2 = low priority)
+PRIORITY_CRITICAL, PRIORITY_MODERATE, PRIORITY_LOW = 0, 1, 2
+PRIORITY_THRESHOLD_MULTIPLIERS = np.array([1.0, 0.5, 0.25])  # Share of a single expiry threshold
+PRIORITY_RISK_WEIGHTS = np.array([1.0, 0.7, 0.4])
+PRIORITY_HIGH_RISK_CUTOFFS = np.array([30, 50, 70])
+
+# Scorers available to predict_expiring_products
+SCORER_HEURISTIC = 'heuristic'
+SCORER_MODEL = 'model'
+MODEL_RISK_PROBABILITY = 0.5  # Waste probability above which the trained model flags a product
+
+def expiry_type_priorities(expiry_types):
+    """Priority code for each expiry type (anything unlisted is low priority)."""
+    return np.array([
+        PRIORITY_CRITICAL if t in CRITICAL_EXPIRY_TYPES
+        else PRIORITY_MODERATE if t in MODERATE_EXPIRY_TYPES
+        else PRIORITY_LOW
+        for t in expiry_types
+    ], dtype=np.int8)
+
+def risk_threshold_table(expiry_types, expiry_threshold_days):
+    """
+    Risk threshold (days) for each expiry type.
+    expiry_threshold_days is either a dict of per-type thresholds (default 30) or a single
+    number scaled down for moderate and low priority types.
+    """
+    if isinstance(expiry_threshold_days, dict):
+        return np.array([expiry_threshold_days.get(t, 30) for t in expiry_types])
+    priorities = expiry_type_priorities(expiry_types)
+    return np.array([
+        expiry_threshold_days if p == PRIORITY_CRITICAL else expiry_threshold_days * PRIORITY_THRESHOLD_MULTIPLIERS[p]
+        for p in priorities
+    ])
+
+def calculate_risk_scores(days_to_expiry, avg_daily_sales, estimated_days_stock_left, priority,
+                          stock_threshold_factor=1.5):
+    """
+    Risk score (0-100) per product from array inputs; arrays broadcast, so a column of
+    stock_threshold_factor values scores several configurations at once.
+    """
+    # Factor 1: Days to expiry (closer = higher risk)
+    base_risk = np.select(
+        [days_to_expiry <= 0, days_to_expiry <= 7, days_to_expiry <= 30, days_to_expiry <= 90],
+        [100, 80, 60, 40],
+        default=20
+    )
+
+    # Factor 2: Stock vs sales velocity
+    no_recent_sales = avg_daily_sales == 0
+    stock_outlasts_expiry = estimated_days_stock_left > days_to_expiry * stock_threshold_factor
+    base_risk = base_risk + np.where(no_recent_sales, 30, np.where(stock_outlasts_expiry, 25, 0))
+
+    # Factor 3: Expiry type priority
+    return np.minimum(base_risk * PRIORITY_RISK_WEIGHTS[priority], 100)  # Cap at 100
+
+# Stock-days estimate for products without recent sales, per category:
+# (min_days, max_days, days_per_unit_in_stock). The estimate is
+# clip(quantity_in_stock * days_per_unit_in_stock, min_days, max_days).
+STOCK_DAYS_BY_CATEGORY = {
+    'Groceries': (30, 90, 2),          # Groceries typically sell within 30-90 days
+    'Beauty & Health': (60, 180, 3),   # Beauty products sell within 60-180 days
+    'Electronics': (90, 365, 5),       # Electronics sell within 90-365 days
+    'Clothing': (30, 180, 2)           # Clothing sells within 30-180 days
+}
+DEFAULT_STOCK_DAYS = (60, 365, 4)      # Other categories: 60-365 days
+
+def load_stock_days_table(path="data/stock_days.csv"):
+    """
+    Loads a stock-days table from a CSV with columns category, min_days, max_days,
+    days_per_unit; a row with category 'default' replaces DEFAULT_STOCK_DAYS.
+    Returns None (built-in table) if the file does not exist.
+    """
+    try:
+        table_df = pd.read_csv(path)
+    except FileNotFoundError:
+        return None
+    return {
+        row['category']: (row['min_days'], row['max_days'], row['days_per_unit'])
+        for _, row in table_df.iterrows()
+    }
+
+def stock_days_parameters(categories, stock_days_table=None):
+    """Per-product (min_days, max_days, days_per_unit) arrays, looked up by category code."""
+    table = dict(STOCK_DAYS_BY_CATEGORY if stock_days_table is None else stock_days_table)
+    default = table.pop('default', DEFAULT_STOCK_DAYS)
+    table_categories = list(table)
+    # Last row of the parameter arrays holds the default for unlisted categories
+    params = np.array([table[c] for c in table_categories] + [default], dtype=np.float64)
+    codes = pd.Index(table_categories).get_indexer(pd.Series(categories).astype(object))
+    codes[codes < 0] = len(table_categories)
+    return params[codes].T
+
+def stock_days_from_arrays(stock, velocity, min_days, max_days, days_per_unit):
+    """Stock / velocity where there are sales, else the clipped category estimate (arrays broadcast)."""
+    has_sales = velocity > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sell_through_days = stock / np.where(has_sales, velocity, 1.0)
+    category_estimate = np.minimum(max_days, np.maximum(min_days, stock * days_per_unit))
+    return np.where(has_sales, sell_through_days, category_estimate)
+
+def estimate_stock_days(inventory_df, stock_days_table=None):
+    """
+    Estimated days until the stock sells out, as an array.
+    Products with recent sales use stock / velocity; the rest use the per-category
+    (min_days, max_days, days_per_unit) table, looked up by category code.
+    """
+    min_days, max_days, days_per_unit = stock_days_parameters(inventory_df['category'], stock_days_table)
+    return stock_days_from_arrays(
+        inventory_df['quantity_in_stock'].to_numpy(dtype=np.float64),
+        inventory_df['avg_daily_sales_last_30d'].to_numpy(dtype=np.float64),
+        min_days, max_days, days_per_unit
+    )
 
 def load_data(inventory_path="data/inventory.csv", sales_path="data/sales.csv"):
-    """Loads inventory and sales data."""
+    """
+    Loads inventory and sales data.
+    The sales frame is shared with other modules and must not be modified in place.
+    """
     try:
-        inventory_df = pd.read_csv(inventory_path)
-        sales_df = pd.read_csv(sales_path)
+        inventory_df = load_inventory(inventory_path)
+        sales_df = load_sales(sales_path)
     except FileNotFoundError as e:
         print(f"Error: {e}. Make sure data files are generated and paths are correct.")
         return None, None
 
-    # Convert date columns to datetime objects
-    inventory_df['purchase_date'] = pd.to_datetime(inventory_df['purchase_date'])
-    inventory_df['expiry_date'] = pd.to_datetime(inventory_df['expiry_date'])
-    sales_df['timestamp'] = pd.to_datetime(sales_df['timestamp'])
-    return inventory_df, sales_df
+    # The preprocessing steps add columns to the inventory frame, so hand out a copy
+    return inventory_df.copy(), sales_df
 
-def preprocess_for_waste_prediction(inventory_df, sales_df):
-    """Preprocesses data for waste prediction."""
-    if inventory_df is None or sales_df is None:
+def preprocess_for_waste_prediction(inventory_df, sales_df, sales_velocity=None, stock_days_table=None, as_of=None):
+    """
+    Preprocesses data for waste prediction.
+    sales_velocity optionally supplies precomputed average daily sales per product
+    (e.g. from utils.sales_stream), in which case sales_df is not scanned and may be None.
+    stock_days_table overrides STOCK_DAYS_BY_CATEGORY (see estimate_stock_days).
+    as_of evaluates the pipeline at a past date instead of now; sales after it are ignored.
+    """
+    if inventory_df is None or (sales_df is None and sales_velocity is None):
         return None
 
-    current_date = datetime.now()
+    current_date = datetime.now() if as_of is None else pd.Timestamp(as_of)
 
     # Calculate days to expiry
     inventory_df['days_to_expiry'] = (inventory_df['expiry_date'] - current_date).dt.days
 
     # Calculate sales velocity (average daily sales for each product in the last 30 days)
-    recent_sales_cutoff = current_date - pd.Timedelta(days=30)
-    recent_sales = sales_df[sales_df['timestamp'] >= recent_sales_cutoff]
+    if sales_velocity is None:
+        recent_sales_cutoff = current_date - pd.Timedelta(days=30)
+        recent_mask = sales_df['timestamp'] >= recent_sales_cutoff
+        if as_of is not None:
+            recent_mask &= sales_df['timestamp'] <= current_date
+        recent_sales = sales_df[recent_mask]
+        if not recent_sales.empty:
+            sales_velocity = recent_sales.groupby('product_id', observed=True)['quantity_sold'].sum() / 30
 
-    if not recent_sales.empty:
-        daily_sales = recent_sales.groupby('product_id')['quantity_sold'].sum() / 30
-        daily_sales = daily_sales.rename('avg_daily_sales_last_30d')
-        inventory_df = inventory_df.merge(daily_sales, on='product_id', how='left').fillna(0)
+    if sales_velocity is not None and not sales_velocity.empty:
+        # Look velocities up by product id (keeps inventory row order and dtypes)
+        daily_sales = pd.Series(sales_velocity.to_numpy(), index=sales_velocity.index.astype(str))
+        product_ids = inventory_df['product_id'].astype(str).to_numpy()
+        inventory_df['avg_daily_sales_last_30d'] = daily_sales.reindex(product_ids).fillna(0).to_numpy()
     else:
         inventory_df['avg_daily_sales_last_30d'] = 0
 
 
     # Estimate days of stock left with more realistic logic
-    def calculate_stock_days(row):
-        if row['avg_daily_sales_last_30d'] > 0:
-            return row['quantity_in_stock'] / row['avg_daily_sales_last_30d']
-        else:
-            # If no sales, estimate based on category and stock level
-            category = row['category']
-            stock_level = row['quantity_in_stock']
-            
-            # Realistic estimates based on category
-            if category == 'Groceries':
-                # Groceries typically sell within 30-90 days
-                return min(90, max(30, stock_level * 2))
-            elif category == 'Beauty & Health':
-                # Beauty products sell within 60-180 days
-                return min(180, max(60, stock_level * 3))
-            elif category == 'Electronics':
-                # Electronics sell within 90-365 days
-                return min(365, max(90, stock_level * 5))
-            elif category == 'Clothing':
-                # Clothing sells within 30-180 days
-                return min(180, max(30, stock_level * 2))
-            else:
-                # Other categories: 60-365 days
-                return min(365, max(60, stock_level * 4))
-    
-    inventory_df['estimated_days_stock_left'] = inventory_df.apply(calculate_stock_days, axis=1)
+    inventory_df['estimated_days_stock_left'] = estimate_stock_days(inventory_df, stock_days_table)
 
     return inventory_df
 
-def predict_expiring_products(processed_inventory_df, expiry_threshold_days=30, stock_threshold_factor=1.5):
+# Automatic threshold tiers: (categories, expiry types, (min, max) clamp, fallback days)
+AUTOMATIC_THRESHOLD_TIERS = [
+    (['Groceries', 'Beauty & Health'], ['Shelf Life', 'Expiration Date'], (3, 14), 7),
+    (['Electronics', 'Clothing'], ['Warranty Period', 'Fashion Season'], (30, 180), 90),
+    (['Home Goods', 'Books', 'Sports & Outdoors'], ['Quality Period', 'Obsolescence', 'Wear Period'], (90, 365), 180)
+]
+
+def calculate_automatic_thresholds(inventory_df, as_of=None, expiry_index=None):
+    """
+    Calculate intelligent thresholds based on product characteristics (as of a date, default now).
+    Each tier uses the 75th percentile of days to expiry of its categories, clamped to the
+    tier's range. With an expiry_index (utils.expiry_index) the percentiles are bisect
+    lookups instead of scans over the inventory.
+    """
+    if expiry_index is None and (inventory_df is None or inventory_df.empty):
+        return {
+            expiry_type: fallback
+            for _, expiry_types, _, fallback in AUTOMATIC_THRESHOLD_TIERS
+            for expiry_type in expiry_types
+        }
+
+    # Analyze current inventory to determine optimal thresholds
+    if expiry_index is None:
+        current_date = datetime.now() if as_of is None else pd.Timestamp(as_of)
+        days_to_expiry = (inventory_df['expiry_date'] - current_date).dt.days
+
+    thresholds = {}
+    for categories, expiry_types, (min_days, max_days), fallback in AUTOMATIC_THRESHOLD_TIERS:
+        # Use 75th percentile of days to expiry for the tier
+        if expiry_index is not None:
+            tier_days = expiry_days_quantile(expiry_index, 0.75, as_of, categories)
+        else:
+            tier_days = days_to_expiry[inventory_df['category'].isin(categories).to_numpy()].quantile(0.75)
+        threshold = fallback if pd.isna(tier_days) else max(min_days, min(max_days, int(tier_days)))
+        for expiry_type in expiry_types:
+            thresholds[expiry_type] = threshold
+
+    return thresholds
+
+def predict_expiring_products(processed_inventory_df, expiry_threshold_days=30, stock_threshold_factor=1.5,
+                              sort_results=True, scorer=SCORER_HEURISTIC, sales_cube=None, as_of=None,
+                              model_path=DEFAULT_MODEL_PATH):
     """
     Predicts products likely to expire based on days to expiry and estimated stock duration.
     Uses different logic based on expiry type:
@@ -83,111 +245,180 @@ def predict_expiring_products(processed_inventory_df, expiry_threshold_days=30,
     expiry_threshold_days can be either:
     - A single number (backward compatibility)
     - A dictionary mapping expiry types to thresholds (dynamic thresholds)
+
+    With sort_results=False the at-risk rows are returned unsorted; use
+    top_at_risk_products / page_at_risk_products to retrieve only the rows displayed.
+
+    scorer='model' replaces the heuristic risk score with the trained model's waste
+    probability (x100) from utils.waste_model; it needs the sales_cube the velocity
+    features are read from, and flags products above MODEL_RISK_PROBABILITY.
     """
     if processed_inventory_df is None:
         return pd.DataFrame()
+    if scorer not in (SCORER_HEURISTIC, SCORER_MODEL):
+        raise ValueError(f"Unknown scorer: {scorer}")
+    if scorer == SCORER_MODEL and sales_cube is None:
+        raise ValueError("The model scorer needs a sales_cube")
 
     # Check if expiry_type column exists, if not, create it based on category
     if 'expiry_type' not in processed_inventory_df.columns:
-        def get_expiry_type(row):
-            category = row['category']
-            if category == 'Groceries':
-                return 'Shelf Life'
-            elif category == 'Beauty & Health':
-                return 'Expiration Date'
-            elif category == 'Electronics':
-                return 'Warranty Period'
-            elif category == 'Clothing':
-                return 'Fashion Season'
-            elif category == 'Home Goods':
-                return 'Quality Period'
-            elif category == 'Books':
-                return 'Obsolescence'
-            else:  # Sports & Outdoors
-                return 'Wear Period'
-        
-        processed_inventory_df['expiry_type'] = processed_inventory_df.apply(get_expiry_type, axis=1)
-
-    # Define expiry type categories for risk calculation
-    critical_expiry_types = ['Shelf Life', 'Expiration Date']
-    moderate_expiry_types = ['Warranty Period', 'Fashion Season']
-    low_priority_expiry_types = ['Quality Period', 'Obsolescence', 'Wear Period']
-    
-    # Handle dynamic thresholds
-    if isinstance(expiry_threshold_days, dict):
-        # Use dynamic thresholds from dictionary
-        def get_risk_threshold(row):
-            return expiry_threshold_days.get(row['expiry_type'], 30)  # Default to 30 if not found
-    else:
-        # Backward compatibility: use single threshold with multipliers
-        def get_risk_threshold(row):
-            if row['expiry_type'] in critical_expiry_types:
-                return expiry_threshold_days  # Use full threshold for critical items
-            elif row['expiry_type'] in moderate_expiry_types:
-                return expiry_threshold_days * 0.5  # Half threshold for moderate items
-            else:
-                return expiry_threshold_days * 0.25  # Quarter threshold for low priority items
+        categories = processed_inventory_df['category'].astype(object)
+        processed_inventory_df['expiry_type'] = categories.map(CATEGORY_EXPIRY_TYPES).fillna(DEFAULT_EXPIRY_TYPE)
 
-    # Calculate risk threshold for each product
-    processed_inventory_df['risk_threshold'] = processed_inventory_df.apply(get_risk_threshold, axis=1)
-    
-    # Filter products within their respective risk thresholds
-    expiring_soon_df = processed_inventory_df[
-        processed_inventory_df['days_to_expiry'] <= processed_inventory_df['risk_threshold']
-    ].copy()
-
-    # Apply different risk logic based on expiry type
-    def calculate_risk_score(row):
-        base_risk = 0
-        
-        # Factor 1: Days to expiry (closer = higher risk)
-        if row['days_to_expiry'] <= 0:
-            base_risk += 100  # Already expired
-        elif row['days_to_expiry'] <= 7:
-            base_risk += 80   # Expiring very soon
-        elif row['days_to_expiry'] <= 30:
-            base_risk += 60   # Expiring soon
-        elif row['days_to_expiry'] <= 90:
-            base_risk += 40   # Expiring in medium term
-        else:
-            base_risk += 20   # Expiring in long term
-
-        # Factor 2: Stock vs sales velocity
-        if row['avg_daily_sales_last_30d'] == 0:
-            base_risk += 30   # No recent sales
-        elif row['estimated_days_stock_left'] > row['days_to_expiry'] * stock_threshold_factor:
-            base_risk += 25   # Stock will outlast expiry
-
-        # Factor 3: Expiry type priority
-        if row['expiry_type'] in critical_expiry_types:
-            base_risk *= 1.0   # Full weight for critical items
-        elif row['expiry_type'] in moderate_expiry_types:
-            base_risk *= 0.7   # Reduced weight for moderate items
-        else:
-            base_risk *= 0.4   # Minimal weight for low priority items
+    # Encode each row's expiry type as a priority code (critical / moderate / low priority)
+    type_codes, type_values = pd.factorize(processed_inventory_df['expiry_type'].astype(object))
+    priority = expiry_type_priorities(type_values)[type_codes]
 
-        return min(base_risk, 100)  # Cap at 100
+    # Calculate risk threshold for each product from a per-expiry-type lookup table
+    threshold_table = risk_threshold_table(type_values, expiry_threshold_days)
+    processed_inventory_df['risk_threshold'] = threshold_table[type_codes]
 
-    expiring_soon_df['risk_score'] = expiring_soon_df.apply(calculate_risk_score, axis=1)
+    # Filter products within their respective risk thresholds
+    within_threshold = (
+        processed_inventory_df['days_to_expiry'] <= processed_inventory_df['risk_threshold']
+    ).to_numpy()
+    expiring_soon_df = processed_inventory_df[within_threshold].copy()
+    priority = priority[within_threshold]
 
-    # Filter for high-risk products (risk score > 30 for critical items, > 50 for others)
-    def is_high_risk(row):
-        if row['expiry_type'] in critical_expiry_types:
-            return row['risk_score'] > 30
-        elif row['expiry_type'] in moderate_expiry_types:
-            return row['risk_score'] > 50
-        else:
-            return row['risk_score'] > 70
+    if scorer == SCORER_MODEL:
+        # All candidate SKUs are scored in one batched model call
+        waste_probability = predict_batch(expiring_soon_df, sales_cube, as_of, model_path)
+        expiring_soon_df['risk_score'] = waste_probability * 100
+        expiring_soon_df['at_risk_of_expiry'] = waste_probability > MODEL_RISK_PROBABILITY
+    else:
+        days_to_expiry = expiring_soon_df['days_to_expiry'].to_numpy(dtype=np.float64)
+        risk_score = calculate_risk_scores(
+            days_to_expiry,
+            expiring_soon_df['avg_daily_sales_last_30d'].to_numpy(dtype=np.float64),
+            expiring_soon_df['estimated_days_stock_left'].to_numpy(dtype=np.float64),
+            priority,
+            stock_threshold_factor
+        )
+        expiring_soon_df['risk_score'] = risk_score
 
-    expiring_soon_df['at_risk_of_expiry'] = expiring_soon_df.apply(is_high_risk, axis=1)
+        # Filter for high-risk products (risk score > 30 for critical items, > 50 for others)
+        expiring_soon_df['at_risk_of_expiry'] = risk_score > PRIORITY_HIGH_RISK_CUTOFFS[priority]
 
     # Filter for products that are at risk and not yet expired
     at_risk_products = expiring_soon_df[
         (expiring_soon_df['at_risk_of_expiry']) & (expiring_soon_df['days_to_expiry'] >= 0)
-    ].sort_values(by=['risk_score', 'days_to_expiry'], ascending=[False, True])
+    ]
+    if sort_results:
+        at_risk_products = at_risk_products.sort_values(by=['risk_score', 'days_to_expiry'], ascending=[False, True])
 
     return at_risk_products
 
+def _top_k_positions(risk_score, days_to_expiry, candidates, k):
+    """
+    Positions of the k best candidates ordered by risk_score desc, days_to_expiry asc,
+    then position (the order a stable full sort would give), using partial selection.
+    """
+    candidates = np.flatnonzero(candidates)
+    if k <= 0 or len(candidates) == 0:
+        return candidates[:0]
+    if len(candidates) > k:
+        # Everything strictly above the k-th best risk score is in; ties at that score
+        # are decided by days to expiry and position
+        neg_risk = -risk_score[candidates]
+        kth_neg_risk = np.partition(neg_risk, k - 1)[k - 1]
+        above = candidates[neg_risk < kth_neg_risk]
+        tied = candidates[neg_risk == kth_neg_risk]
+        tied = tied[np.lexsort((tied, days_to_expiry[tied]))][:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    order = np.lexsort((candidates, days_to_expiry[candidates], -risk_score[candidates]))
+    return candidates[order][:k]
+
+def top_at_risk_products(at_risk_products, k):
+    """Top k rows by risk_score (desc) and days_to_expiry (asc), without sorting the whole frame."""
+    risk_score = at_risk_products['risk_score'].to_numpy(dtype=np.float64)
+    days_to_expiry = at_risk_products['days_to_expiry'].to_numpy(dtype=np.float64)
+    positions = _top_k_positions(risk_score, days_to_expiry, np.ones(len(risk_score), dtype=bool), k)
+    return at_risk_products.iloc[positions]
+
+def page_at_risk_products(at_risk_products, page_size, cursor=None):
+    """
+    One page of at-risk rows in top_at_risk_products order, plus the cursor for the next page
+    (None on the last page). The cursor is the (risk_score, days_to_expiry, position) of the
+    last row shown, so pages stay consistent for the same frame without a full sort.
+    """
+    risk_score = at_risk_products['risk_score'].to_numpy(dtype=np.float64)
+    days_to_expiry = at_risk_products['days_to_expiry'].to_numpy(dtype=np.float64)
+    candidates = np.ones(len(risk_score), dtype=bool)
+    if cursor is not None:
+        last_risk, last_days, last_position = cursor
+        positions = np.arange(len(risk_score))
+        candidates = (
+            (risk_score < last_risk)
+            | ((risk_score == last_risk) & (days_to_expiry > last_days))
+            | ((risk_score == last_risk) & (days_to_expiry == last_days) & (positions > last_position))
+        )
+
+    page_positions = _top_k_positions(risk_score, days_to_expiry, candidates, page_size)
+    next_cursor = None
+    if len(page_positions) == page_size and candidates.sum() > page_size:
+        last = page_positions[-1]
+        next_cursor = (risk_score[last], days_to_expiry[last], int(last))
+    return at_risk_products.iloc[page_positions], next_cursor
+
+def sweep_waste_thresholds(processed_inventory_df, threshold_configs, stock_threshold_factors=(1.5,)):
+    """
+    Evaluates predict_expiring_products for every combination of threshold_configs
+    (each a number or a dict, as for expiry_threshold_days) and stock_threshold_factors
+    in one broadcast over a (configs x products) matrix.
+    Returns a dict with:
+    - 'summary': one row per configuration with at-risk product count, items and waste value
+    - 'masks': boolean array (configs x products), True where a product is flagged
+    - 'product_ids': product ids in mask column order
+    """
+    threshold_configs = list(threshold_configs)
+    stock_threshold_factors = list(stock_threshold_factors)
+    if processed_inventory_df is None or processed_inventory_df.empty:
+        processed_inventory_df = pd.DataFrame(columns=[
+            'product_id', 'category', 'days_to_expiry', 'avg_daily_sales_last_30d',
+            'estimated_days_stock_left', 'quantity_in_stock', 'cost_price'
+        ])
+
+    if 'expiry_type' in processed_inventory_df.columns:
+        expiry_types = processed_inventory_df['expiry_type'].astype(object)
+    else:
+        expiry_types = processed_inventory_df['category'].astype(object).map(CATEGORY_EXPIRY_TYPES).fillna(DEFAULT_EXPIRY_TYPE)
+    type_codes, type_values = pd.factorize(expiry_types)
+    priority = expiry_type_priorities(type_values)[type_codes]
+
+    days_to_expiry = processed_inventory_df['days_to_expiry'].to_numpy(dtype=np.float64)
+    velocity = processed_inventory_df['avg_daily_sales_last_30d'].to_numpy(dtype=np.float64)
+    stock_days = processed_inventory_df['estimated_days_stock_left'].to_numpy(dtype=np.float64)
+
+    # (thresholds x products) and (factors x products); the risk score does not depend on the thresholds
+    thresholds = np.zeros((len(threshold_configs), len(days_to_expiry)))
+    for i, config in enumerate(threshold_configs):
+        if len(type_values):
+            thresholds[i] = risk_threshold_table(type_values, config).astype(np.float64)[type_codes]
+    factors = np.array(stock_threshold_factors, dtype=np.float64)[:, None]
+    risk_scores = calculate_risk_scores(days_to_expiry, velocity, stock_days, priority, factors)
+    high_risk = (risk_scores > PRIORITY_HIGH_RISK_CUTOFFS[priority]) & (days_to_expiry >= 0)
+
+    within_threshold = days_to_expiry <= thresholds
+    masks = (within_threshold[:, None, :] & high_risk[None, :, :]).reshape(
+        len(threshold_configs) * len(stock_threshold_factors), len(days_to_expiry)
+    )
+
+    quantities = processed_inventory_df['quantity_in_stock'].to_numpy(dtype=np.float64)
+    values = quantities * processed_inventory_df['cost_price'].to_numpy(dtype=np.float64)
+    summary = pd.DataFrame({
+        'expiry_threshold_days': [config for config in threshold_configs for _ in stock_threshold_factors],
+        'stock_threshold_factor': stock_threshold_factors * len(threshold_configs),
+        'at_risk_products': masks.sum(axis=1),
+        'items_at_risk': masks @ quantities,
+        'predicted_waste_value': masks @ values
+    })
+
+    return {
+        'summary': summary,
+        'masks': masks,
+        'product_ids': processed_inventory_df['product_id'].to_numpy()
+    }
+
 if __name__ == '__main__':
     # Example Usage
     inventory_df, sales_df = load_data("../../data/inventory.csv", "../../data/sales.csv") # Adjusted path for direct script run